@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks - Fake CoinGecko
+
+This module is a local stand-in for the CoinGecko v3 API, to test and load
+test the CoinGecko service (sync, client concurrency) deterministically and
+offline. It replays the benchmark fixtures (``qrypt.benchmarks.fixtures``,
+recorded or synthetic) on the endpoints the service uses:
+
+* ``GET /api/v3/coins/list`` (``include_platform``)
+* ``GET /api/v3/coins/markets`` (``vs_currency``, ``ids``, ``per_page``, ``page``)
+* ``GET /api/v3/simple/supported_vs_currencies``
+
+Responses carry validators (``ETag``, ``Last-Modified``) and conditional
+requests (``If-None-Match``, ``If-Modified-Since``) are answered 304 when
+the data has not changed; bodies are gzip'd when the client accepts it.
+
+Faults are injected on every API request: latency (with jitter), 401
+invalid API key responses, 429 rate limit responses (with ``Retry-After``)
+and timeouts (the request hangs).
+The payload can be scaled (``--scale 10``: ten times the coins). Faults can
+be changed, and request counts read, while the server runs:
+
+    fake_coingecko --port 8765 --scale 10 --latency-ms 50 --rate-limit-rate 0.1
+    KE_COINGECKO_API_BASE_URL=http://127.0.0.1:8765/api/v3 pull_tokens
+
+    GET/PUT /_fake/faults, GET /_fake/stats, POST /_fake/reset
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Iterator, Optional
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+
+from qrypt.benchmarks.fixtures import (
+    FIXTURE_SEED,
+    MARKETS_PAGE_SIZE,
+    coins_list,
+    coins_markets,
+    supported_vs_currencies,
+)
+from qrypt.core.log import configure_logging, get_logger
+from qrypt.tokens.services.coingecko.constants import API_PATH_V3
+
+log = get_logger(__name__)
+
+DEFAULT_HOST: str = "127.0.0.1"
+DEFAULT_PORT: int = 8765
+DEFAULT_PER_PAGE: int = 100
+HANG_POLL_SECONDS: float = 0.05
+RATE_LIMIT_ERROR: dict = {
+    "status": {
+        "error_code": 429,
+        "error_message": "You've exceeded the Rate Limit. (fake_coingecko)",
+    }
+}
+
+UNAUTHORIZED_ERROR: dict = {
+    "status": {
+        "error_code": 10002,
+        "error_message": "Invalid API Key. (fake_coingecko)",
+    }
+}
+
+
+class Faults(BaseModel):
+    """The faults injected on API requests"""
+
+    latency_ms: float = Field(default=0.0, ge=0)
+    jitter_ms: float = Field(default=0.0, ge=0)
+    # Fraction of requests answered 401 (an invalid API key)
+    unauthorized_rate: float = Field(default=0.0, ge=0, le=1)
+    # Fraction of requests answered 429, with Retry-After (seconds)
+    rate_limit_rate: float = Field(default=0.0, ge=0, le=1)
+    retry_after: int = Field(default=1, ge=0)
+    # Fraction of requests that hang for `hang_seconds` (then 504)
+    timeout_rate: float = Field(default=0.0, ge=0, le=1)
+    hang_seconds: float = Field(default=30.0, ge=0)
+
+
+@dataclass(slots=True)
+class Payload:
+    """A JSON response body, gzip'd, and its entity tag"""
+
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+    @classmethod
+    def of(cls, data: Any) -> "Payload":
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        return cls(body, gzip.compress(body, compresslevel=6), etag)
+
+
+def scaled(item: dict[str, Any], copy: int) -> dict[str, Any]:
+    """The `copy`-th copy of a coin (list or market item), 0 is the original"""
+    if not copy:
+        return item
+    item = {**item, "id": f"{item['id']}-x{copy}", "name": f"{item['name']} x{copy}"}
+    if item.get("platforms"):
+        suffix = f"{copy:06x}"
+        item["platforms"] = {
+            platform: address[: -len(suffix)] + suffix
+            for platform, address in item["platforms"].items()
+        }
+    return item
+
+
+def scale(items: list[dict[str, Any]], factor: int) -> list[dict[str, Any]]:
+    """`factor` times the items (copies next to their original)"""
+    return [scaled(item, copy) for item in items for copy in range(factor)]
+
+
+class FakeCoinGecko:
+    """The replayed responses, the faults, and the request counts"""
+
+    def __init__(
+        self,
+        coins: Optional[list[dict[str, Any]]] = None,
+        scale_factor: int = 1,
+        faults: Optional[Faults] = None,
+        seed: int = FIXTURE_SEED,
+    ):
+        if scale_factor < 1:
+            raise ValueError("The scale factor must be at least 1")
+        coins = coins if coins is not None else coins_list()
+        markets = scale(coins_markets(coins), scale_factor)
+        for rank, market in enumerate(markets, 1):
+            market["market_cap_rank"] = rank
+        self.coins = scale(coins, scale_factor)
+        self.markets = markets
+        self.vs_currencies = supported_vs_currencies()
+        self.faults = faults or Faults()
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.stats: Counter[str] = Counter()
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+        # The coins list is large and static: rendered (and gzip'd) once
+        without_platforms = [
+            {key: value for key, value in coin.items() if key != "platforms"}
+            for coin in self.coins
+        ]
+        self.coins_list_payloads = {
+            True: Payload.of(self.coins),
+            False: Payload.of(without_platforms),
+        }
+        self.vs_currencies_payload = Payload.of(self.vs_currencies)
+
+    def reset(self) -> None:
+        """Forget the request counts, and replay the same faults again"""
+        self.stats.clear()
+        self.random = random.Random(self.seed)
+
+    def not_modified(self, request: Request, payload: Payload) -> bool:
+        """Whether a conditional request's copy of `payload` is current"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or payload.etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            return since >= parsedate_to_datetime(self.last_modified)
+        except (TypeError, ValueError):
+            return False
+
+    def respond(self, request: Request, payload: Payload) -> Response:
+        """`payload` (gzip'd if accepted), or 304 if the client's is current"""
+        headers = {
+            "ETag": payload.etag,
+            "Last-Modified": self.last_modified,
+            "Vary": "Accept-Encoding",
+        }
+        if self.not_modified(request, payload):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        body = payload.body
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            body = payload.gzipped
+            headers["Content-Encoding"] = "gzip"
+        self.stats["bytes_sent"] += len(body)
+        return Response(body, headers=headers, media_type="application/json")
+
+    async def inject_faults(self, request: Request) -> None:
+        """Delay, refuse, rate limit or hang the request (as the faults say)"""
+        faults = self.faults
+        endpoint = request.url.path.removeprefix(API_PATH_V3 + "/")
+        self.stats[f"requests.{endpoint}"] += 1
+
+        delay = faults.latency_ms + self.random.uniform(0, faults.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self.random.random() < faults.unauthorized_rate:
+            self.stats["unauthorized"] += 1
+            raise HTTPException(status_code=401, detail=UNAUTHORIZED_ERROR)
+        if self.random.random() < faults.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail=RATE_LIMIT_ERROR,
+                headers={"Retry-After": str(faults.retry_after)},
+            )
+        if self.random.random() < faults.timeout_rate:
+            self.stats["timeouts"] += 1
+            deadline = time.monotonic() + faults.hang_seconds
+            # Until the client gives up
+            while time.monotonic() < deadline:
+                if await request.is_disconnected():
+                    break
+                await asyncio.sleep(HANG_POLL_SECONDS)
+            raise HTTPException(status_code=504, detail="Gateway Timeout")
+
+
+def create_app(server: FakeCoinGecko) -> FastAPI:
+    """The fake CoinGecko API application"""
+    app = FastAPI(title="Fake CoinGecko", docs_url=None, redoc_url=None)
+    api = APIRouter(prefix=API_PATH_V3, dependencies=[Depends(server.inject_faults)])
+    control = APIRouter(prefix="/_fake")
+
+    @app.exception_handler(HTTPException)
+    async def error(_request: Request, exc: HTTPException) -> JSONResponse:
+        # CoinGecko error bodies are not wrapped in `detail`
+        content = exc.detail if isinstance(exc.detail, dict) else {"error": exc.detail}
+        return JSONResponse(content, status_code=exc.status_code, headers=exc.headers)
+
+    @api.get("/ping")
+    async def ping() -> dict:
+        return {"gecko_says": "(V3) To the Moon!"}
+
+    @api.get("/coins/list")
+    async def get_coins_list(
+        request: Request, include_platform: bool = False
+    ) -> Response:
+        return server.respond(request, server.coins_list_payloads[include_platform])
+
+    @api.get("/coins/markets")
+    def get_coins_markets(
+        request: Request,
+        vs_currency: str,
+        ids: Optional[str] = None,
+        per_page: int = Query(default=DEFAULT_PER_PAGE, ge=1, le=MARKETS_PAGE_SIZE),
+        page: int = Query(default=1, ge=1),
+    ) -> Response:
+        if vs_currency.lower() not in server.vs_currencies:
+            raise HTTPException(status_code=400, detail="invalid vs_currency")
+        markets = server.markets
+        if ids:
+            wanted = set(ids.split(","))
+            markets = [market for market in markets if market["id"] in wanted]
+        start = (page - 1) * per_page
+        return server.respond(request, Payload.of(markets[start : start + per_page]))
+
+    @api.get("/simple/supported_vs_currencies")
+    async def get_supported_vs_currencies(request: Request) -> Response:
+        return server.respond(request, server.vs_currencies_payload)
+
+    @control.get("/faults")
+    async def get_faults() -> Faults:
+        return server.faults
+
+    @control.put("/faults")
+    async def set_faults(faults: Faults) -> Faults:
+        server.faults = faults
+        return faults
+
+    @control.get("/stats")
+    async def get_stats() -> dict[str, int]:
+        return dict(server.stats)
+
+    @control.post("/reset", status_code=204)
+    async def reset() -> None:
+        server.reset()
+
+    # The control endpoints run on the event loop (as the faults injection)
+    app.include_router(api)
+    app.include_router(control)
+    return app
+
+
+@contextmanager
+def serve(
+    server: FakeCoinGecko, host: str = DEFAULT_HOST, port: int = 0
+) -> Iterator[str]:
+    """Serve the fake API in a background thread, yield its base URL
+
+    Port 0 picks a free port.
+    """
+    # pylint: disable=import-outside-toplevel
+    import uvicorn
+
+    config = uvicorn.Config(
+        create_app(server),
+        host=host,
+        port=port,
+        lifespan="off",
+        log_level="warning",
+        timeout_graceful_shutdown=1,
+    )
+    uvicorn_server = uvicorn.Server(config)
+    thread = threading.Thread(
+        target=uvicorn_server.run, name="fake-coingecko", daemon=True
+    )
+    thread.start()
+    while not uvicorn_server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"The fake CoinGecko API did not start on {host}")
+        time.sleep(0.01)
+    port = uvicorn_server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://{host}:{port}{API_PATH_V3}"
+    finally:
+        uvicorn_server.should_exit = True
+        thread.join()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command line entry point: run the fake CoinGecko API"""
+    parser = argparse.ArgumentParser(description="Run a fake CoinGecko API")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--coins", type=int, help="default: the whole fixture")
+    parser.add_argument("--scale", type=int, default=1, help="coins multiplier")
+    parser.add_argument("--seed", type=int, default=FIXTURE_SEED)
+    for name, field in Faults.model_fields.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=field.annotation, default=field.default
+        )
+    args = parser.parse_args(argv)
+
+    # pylint: disable=import-outside-toplevel
+    import uvicorn
+
+    configure_logging()
+    faults = Faults(**{name: getattr(args, name) for name in Faults.model_fields})
+    server = FakeCoinGecko(coins_list(args.coins), args.scale, faults, args.seed)
+    log.warning(
+        "Fake CoinGecko API: %d coins, set KE_COINGECKO_API_BASE_URL=http://%s:%d%s",
+        len(server.coins),
+        args.host,
+        args.port,
+        API_PATH_V3,
+    )
+    uvicorn.run(create_app(server), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
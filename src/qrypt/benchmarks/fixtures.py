@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks - Fixtures
+
+This module provides the CoinGecko responses the benchmarks (and the fake
+CoinGecko server) replay, so runs never touch the network and are
+comparable with each other.
+
+Responses recorded from the live API (``record_benchmark_fixtures``) are
+stored as gzip'd JSON next to this module and used when present. Otherwise
+synthetic responses of the same shape are generated from a fixed seed: the
+coins list (ids, symbols, names, and 0 to 3 platform addresses per coin),
+market data for every coin, and the supported vs currencies.
+
+    record_benchmark_fixtures   # needs network (and a CoinGecko API key)
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import string
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+from qrypt.core.log import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+FIXTURES_DIR: Path = Path(__file__).resolve().parent / "fixtures"
+COINS_LIST_FIXTURE: str = "coins_list"
+COINS_MARKETS_FIXTURE: str = "coins_markets"
+VS_CURRENCIES_FIXTURE: str = "simple_supported_vs_currencies"
+# About the size of the live coins list
+DEFAULT_COINS: int = 15000
+FIXTURE_SEED: int = 20240501
+# Pages of market data recorded (the API's largest page size)
+RECORD_MARKETS_PAGES: int = 4
+MARKETS_PAGE_SIZE: int = 250
+
+PLATFORMS: tuple[str, ...] = (
+    "ethereum",
+    "binance-smart-chain",
+    "polygon-pos",
+    "arbitrum-one",
+    "base",
+    "avalanche",
+    "solana",
+)
+WORDS: tuple[str, ...] = (
+    "Bit",
+    "Chain",
+    "Coin",
+    "Doge",
+    "Ether",
+    "Finance",
+    "Gold",
+    "Link",
+    "Moon",
+    "Protocol",
+    "Swap",
+    "Token",
+    "Wrapped",
+    "Yield",
+)
+VS_CURRENCIES: tuple[str, ...] = (
+    "btc",
+    "eth",
+    "ltc",
+    "bch",
+    "bnb",
+    "xrp",
+    "dot",
+    "link",
+    "usd",
+    "eur",
+    "gbp",
+    "jpy",
+    "chf",
+    "cad",
+    "aud",
+    "cny",
+    "inr",
+    "krw",
+    "sats",
+)
+
+
+def fixture_path(name: str) -> Path:
+    return FIXTURES_DIR / f"{name}.json.gz"
+
+
+def synthetic_coins_list(
+    count: int = DEFAULT_COINS, seed: int = FIXTURE_SEED
+) -> list[dict[str, Any]]:
+    """A deterministic coins list, shaped like ``coins/list?include_platform``"""
+    rng = random.Random(seed)
+    coins = []
+    for i in range(count):
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        symbol = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 6)))
+        platforms = {}
+        for platform in rng.sample(PLATFORMS, rng.choice((0, 0, 1, 1, 2, 3))):
+            if platform == "solana":
+                address = "".join(rng.choices(string.ascii_letters + "123456789", k=44))
+            else:
+                address = "0x" + "".join(rng.choices("0123456789abcdef", k=40))
+            platforms[platform] = address
+        coins.append(
+            {
+                "id": f"{'-'.join(words).lower()}-{i}",
+                "symbol": symbol,
+                "name": f"{' '.join(words)} {i}",
+                "platforms": platforms,
+            }
+        )
+    return coins
+
+
+def synthetic_coins_markets(
+    coins: list[dict[str, Any]], seed: int = FIXTURE_SEED
+) -> list[dict[str, Any]]:
+    """Market data for `coins`, shaped like ``coins/markets`` (by market cap)"""
+    rng = random.Random(seed)
+    markets = []
+    for i, coin in enumerate(coins):
+        price = round(rng.lognormvariate(0, 3), 8)
+        supply = round(rng.lognormvariate(18, 2))
+        change = round(rng.gauss(0, 5), 5)
+        markets.append(
+            {
+                "id": coin["id"],
+                "symbol": coin["symbol"],
+                "name": coin["name"],
+                "image": f"https://coin-images.coingecko.com/coins/images/{i}/large/{coin['id']}.png",
+                "current_price": price,
+                "market_cap": round(price * supply),
+                "market_cap_rank": None,
+                "total_volume": round(price * supply * rng.uniform(0.001, 0.2)),
+                "high_24h": round(price * (1 + abs(change) / 100), 8),
+                "low_24h": round(price * (1 - abs(change) / 100), 8),
+                "price_change_24h": round(price * change / 100, 8),
+                "price_change_percentage_24h": change,
+                "circulating_supply": supply,
+                "total_supply": supply,
+                "max_supply": None,
+                "last_updated": "2024-05-01T00:00:00.000Z",
+            }
+        )
+    markets.sort(key=lambda market: market["market_cap"], reverse=True)
+    for rank, market in enumerate(markets, 1):
+        market["market_cap_rank"] = rank
+    return markets
+
+
+def read_fixture(name: str) -> Optional[Any]:
+    """A recorded fixture, None if there is none"""
+    path = fixture_path(name)
+    if not path.exists():
+        return None
+    with gzip.open(path, "rt", encoding="utf8") as f:
+        return json.load(f)
+
+
+def coins_list(count: Optional[int] = None) -> list[dict[str, Any]]:
+    """The recorded coins list (its first `count` coins), or a synthetic one"""
+    coins = read_fixture(COINS_LIST_FIXTURE)
+    if coins is not None:
+        return coins[:count] if count else coins
+    return synthetic_coins_list(count or DEFAULT_COINS)
+
+
+def coins_markets(coins: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """The recorded market data of `coins`, or synthetic market data for all"""
+    markets = read_fixture(COINS_MARKETS_FIXTURE)
+    if markets is not None:
+        ids = {coin["id"] for coin in coins}
+        return [market for market in markets if market["id"] in ids]
+    return synthetic_coins_markets(coins)
+
+
+def supported_vs_currencies() -> list[str]:
+    """The recorded supported vs currencies, or the common ones"""
+    return read_fixture(VS_CURRENCIES_FIXTURE) or list(VS_CURRENCIES)
+
+
+def write_fixture(name: str, data: Any) -> Path:
+    path = fixture_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    return path
+
+
+async def record_responses(markets_pages: int) -> dict[str, Any]:
+    """Fetch the live responses (bypassing the response cache)"""
+    # pylint: disable=import-outside-toplevel
+    from qrypt.tokens.services.coingecko.adapter import CoinGeckoAdapter
+    from qrypt.tokens.services.coingecko.config import CoinGeckoConfig
+
+    config = CoinGeckoConfig()
+    api = CoinGeckoAdapter(
+        base_url=config.base_url, timeout=config.timeout, headers=config.headers
+    ).api
+
+    async def get(endpoint, **params) -> Any:
+        return await endpoint._get(
+            params={**endpoint.params, **params},
+            timeout=endpoint.timeout,
+            headers=config.headers,
+        )
+
+    markets = []
+    for page in range(1, markets_pages + 1):
+        markets += await get(
+            api.coins_markets_data, per_page=MARKETS_PAGE_SIZE, page=page
+        )
+    return {
+        COINS_LIST_FIXTURE: await get(api.coins_list),
+        COINS_MARKETS_FIXTURE: markets,
+        VS_CURRENCIES_FIXTURE: await get(api.simple_supported_vs_currencies),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command line entry point: record the fixtures from the live API"""
+    parser = argparse.ArgumentParser(description="Record the benchmark fixtures")
+    parser.add_argument(
+        "--markets-pages",
+        type=int,
+        default=RECORD_MARKETS_PAGES,
+        help=f"pages of {MARKETS_PAGE_SIZE} coins of market data",
+    )
+    args = parser.parse_args(argv)
+    configure_logging()
+    responses = asyncio.run(record_responses(args.markets_pages))
+    if not responses[COINS_LIST_FIXTURE]:
+        log.error("The CoinGecko API returned no coins")
+        return 1
+    for name, data in responses.items():
+        path = write_fixture(name, data)
+        log.info("Recorded %d items to %s", len(data), path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
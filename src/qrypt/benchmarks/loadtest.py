@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks - Load Test
+
+This module load tests the token API: `concurrency` clients send a mix of
+list, detail, search, create and update requests, each as soon as its
+previous one is answered (a closed loop), for `duration` seconds. It
+reports the throughput, latency percentiles and errors per request kind,
+and over time (every `interval` seconds), live and as JSON.
+
+Unless ``--url`` points at a running API, a local one is started: the
+catalog is seeded (a scratch SQLite database, from the benchmark fixtures)
+and served by ``uvicorn qrypt.main:app`` with ``--workers`` processes, so
+the load generator and the server do not share an interpreter:
+
+    load_test --concurrency 32 --duration 60 --workers 1
+    load_test --mix list=70,detail=30 --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import httpx
+
+from qrypt.benchmarks.fixtures import FIXTURE_SEED, coins_list
+from qrypt.benchmarks.runner import environment
+from qrypt.core.log import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+KINDS: tuple[str, ...] = ("list", "detail", "search", "create", "update")
+DEFAULT_MIX: str = "list=40,detail=35,search=15,create=5,update=5"
+DEFAULT_CONCURRENCY: int = 16
+DEFAULT_DURATION: float = 30.0
+DEFAULT_WARMUP: float = 5.0
+DEFAULT_INTERVAL: float = 1.0
+DEFAULT_COINS: int = 5000
+DEFAULT_OUTPUT: str = "load-test-results.json"
+PERCENTILES: tuple[float, ...] = (0.5, 0.9, 0.95, 0.99)
+PAGE_SIZE: int = 100
+SEARCH_LIMIT: int = 20
+# Ids and names sampled from the catalog for detail / search / update traffic
+SAMPLE_TOKENS: int = 1000
+TOKENS_URL: str = "/api/v1/tokens/"
+STARTUP_TIMEOUT: float = 60.0
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Request kind weights, from "list=40,detail=35,..." """
+    weights = {}
+    for item in mix.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Unknown request kind {kind!r}, expected {KINDS}")
+        try:
+            weights[kind] = float(weight)
+        except ValueError as e:
+            raise ValueError(f"Invalid weight for {kind!r}: {weight!r}") from e
+    if not any(weight > 0 for weight in weights.values()):
+        raise ValueError(f"No request kind in the mix: {mix!r}")
+    return weights
+
+
+@dataclass(slots=True)
+class Sample:
+    """A request: its kind, start (seconds into the run), latency and status
+
+    Status 0 is a request that failed without a response (eg. a timeout).
+    """
+
+    kind: str
+    start: float
+    latency: float
+    status: int
+    error: Optional[str] = None
+
+
+class Workload:
+    """The requests to send: kinds drawn from the mix (from a fixed seed)"""
+
+    def __init__(
+        self,
+        mix: dict[str, float],
+        token_ids: list[int],
+        words: list[str],
+        total: int,
+        seed: int = FIXTURE_SEED,
+    ):
+        if not token_ids and ({"detail", "update"} & mix.keys()):
+            raise ValueError("Detail and update requests need tokens in the catalog")
+        self.kinds = list(mix)
+        self.weights = list(mix.values())
+        self.token_ids = token_ids
+        self.words = words or ["coin"]
+        self.pages = max(math.ceil(total / PAGE_SIZE), 1)
+        self.random = random.Random(seed)
+        self.created = 0
+
+    def next(self) -> tuple[str, str, str, Optional[dict[str, Any]]]:
+        """The next request: kind, method, URL and JSON body"""
+        rng = self.random
+        kind = rng.choices(self.kinds, self.weights)[0]
+        if kind == "list":
+            # Skewed to the first pages, as browsing is
+            page = min(int(rng.paretovariate(1.2)) - 1, self.pages - 1)
+            url = f"{TOKENS_URL}?offset={page * PAGE_SIZE}&limit={PAGE_SIZE}"
+            return kind, "GET", url, None
+        if kind == "detail":
+            return kind, "GET", f"{TOKENS_URL}{rng.choice(self.token_ids)}", None
+        if kind == "search":
+            url = f"{TOKENS_URL}?q={rng.choice(self.words)}&limit={SEARCH_LIMIT}"
+            return kind, "GET", url, None
+        if kind == "create":
+            self.created += 1
+            address = "0x" + "".join(rng.choices("0123456789abcdef", k=40))
+            body = {
+                "symbol": f"lt{self.created}",
+                "name": f"Load Test {self.created}",
+                "platforms": {"ethereum": address},
+            }
+            return kind, "POST", TOKENS_URL, body
+        token_id = rng.choice(self.token_ids)
+        body = {"name": f"Load Test Update {rng.randrange(1 << 30)}"}
+        return kind, "PUT", f"{TOKENS_URL}{token_id}", body
+
+
+async def discover(client: httpx.AsyncClient) -> tuple[list[int], list[str], int]:
+    """Token ids, search words and the token count of the catalog under test"""
+    response = await client.get(
+        TOKENS_URL, params={"limit": SAMPLE_TOKENS, "fields": "id,name"}
+    )
+    response.raise_for_status()
+    tokens = response.json()
+    total = int(response.headers.get("x-total-count", len(tokens)))
+    words = Counter(
+        word.lower()
+        for token in tokens
+        for word in token["name"].split()
+        if len(word) > 2 and word.isalpha()
+    )
+    return (
+        [token["id"] for token in tokens],
+        [w for w, _ in words.most_common(50)],
+        total,
+    )
+
+
+def percentile(latencies: list[float], q: float) -> float:
+    """The `q` percentile (nearest rank) of sorted latencies"""
+    if not latencies:
+        return 0.0
+    return latencies[min(max(math.ceil(q * len(latencies)) - 1, 0), len(latencies) - 1)]
+
+
+def latency_stats(samples: list[Sample], seconds: float) -> dict[str, Any]:
+    """Throughput, errors and latency percentiles (ms) of samples"""
+    latencies = sorted(sample.latency for sample in samples)
+    errors = Counter(sample.error for sample in samples if sample.error)
+    stats = {
+        "requests": len(samples),
+        "rps": len(samples) / seconds if seconds else 0.0,
+        "errors": sum(errors.values()),
+        "error_kinds": dict(errors),
+    }
+    for q in PERCENTILES:
+        stats[f"p{q * 100:g}_ms"] = percentile(latencies, q) * 1000
+    stats["max_ms"] = latencies[-1] * 1000 if latencies else 0.0
+    return stats
+
+
+def summarize(
+    samples: list[Sample], warmup: float, duration: float, interval: float
+) -> dict[str, Any]:
+    """The report: overall, per request kind, and over time (after warmup)"""
+    measured = [sample for sample in samples if sample.start >= warmup]
+    seconds = duration - warmup
+    by_kind = defaultdict(list)
+    by_interval = defaultdict(list)
+    for sample in measured:
+        by_kind[sample.kind].append(sample)
+        by_interval[int((sample.start - warmup) // interval)].append(sample)
+    timeline = []
+    for i in range(math.ceil(seconds / interval)):
+        stats = latency_stats(by_interval[i], interval)
+        timeline.append({"t": round(i * interval, 3), **stats})
+    return {
+        "overall": latency_stats(measured, seconds),
+        "kinds": {
+            kind: latency_stats(by_kind[kind], seconds) for kind in sorted(by_kind)
+        },
+        "timeline": timeline,
+    }
+
+
+async def run_load(
+    base_url: str,
+    mix: dict[str, float],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    duration: float = DEFAULT_DURATION,
+    interval: float = DEFAULT_INTERVAL,
+    seed: int = FIXTURE_SEED,
+    timeout: float = 30.0,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> list[Sample]:
+    """Send the workload for `duration` seconds, with `concurrency` clients
+
+    `transport` replaces the network (eg. an in-process ASGI app).
+    """
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout, transport=transport
+    ) as client:
+        workload = Workload(mix, *await discover(client), seed=seed)
+        samples: list[Sample] = []
+        started = time.perf_counter()
+        deadline = started + duration
+
+        async def user() -> None:
+            while (start := time.perf_counter()) < deadline:
+                kind, method, url, body = workload.next()
+                try:
+                    response = await client.request(method, url, json=body)
+                    status = response.status_code
+                    error = f"HTTP {status}" if status >= 400 else None
+                except httpx.HTTPError as e:
+                    status, error = 0, type(e).__name__
+                end = time.perf_counter()
+                samples.append(
+                    Sample(kind, start - started, end - start, status, error)
+                )
+
+        async def progress() -> None:
+            reported = 0
+            while True:
+                await asyncio.sleep(interval)
+                recent = samples[reported:]
+                reported += len(recent)
+                stats = latency_stats(recent, interval)
+                print(
+                    f"{time.perf_counter() - started:7.1f}s "
+                    f"{stats['rps']:9.1f} req/s  p50 {stats['p50_ms']:8.2f} ms  "
+                    f"p99 {stats['p99_ms']:8.2f} ms  errors {stats['errors']}"
+                )
+
+        reporter = asyncio.create_task(progress())
+        try:
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+        finally:
+            reporter.cancel()
+    return samples
+
+
+def free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_api(
+    workdir: Path, coins: int, workers: int, host: str = "127.0.0.1"
+) -> Iterator[str]:
+    """Seed a catalog in `workdir`, serve the API on it, yield its base URL"""
+    # pylint: disable=import-outside-toplevel
+    from qrypt.benchmarks.suite import seed_catalog
+
+    cwd = Path.cwd()
+    database_url = f"sqlite:///{workdir / 'catalog.db'}"
+    os.chdir(workdir)
+    try:
+        seed_catalog(database_url, coins_list(coins))
+    finally:
+        os.chdir(cwd)
+
+    port = free_port(host)
+    src = str(Path(__file__).resolve().parents[2])
+    env = {
+        **os.environ,
+        "KE_DATABASE_URL": database_url,
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [src, os.environ.get("PYTHONPATH")])
+        ),
+    }
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "qrypt.main:app",
+        f"--host={host}",
+        f"--port={port}",
+        f"--workers={workers}",
+        "--log-level=warning",
+        "--no-access-log",
+    ]
+    base_url = f"http://{host}:{port}"
+    server = subprocess.Popen(command, cwd=workdir, env=env)
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"The API exited with status {server.returncode}")
+            try:
+                httpx.get(
+                    f"{base_url}{TOKENS_URL}", params={"limit": 1}
+                ).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def format_report(report: dict[str, Any]) -> str:
+    rows = [("all", report["overall"]), *report["kinds"].items()]
+    lines = [
+        f"{'kind':<8} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} "
+        f"{'p99 ms':>9} {'max ms':>9} {'errors':>7}"
+    ]
+    for kind, stats in rows:
+        lines.append(
+            f"{kind:<8} {stats['requests']:>9} {stats['rps']:>9.1f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f} {stats['errors']:>7}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command line entry point: load test the token API"""
+    parser = argparse.ArgumentParser(description="Load test the token API")
+    parser.add_argument("--url", help="a running API (default: start one)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="kind=weight,...")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    parser.add_argument(
+        "--warmup", type=float, default=DEFAULT_WARMUP, help="seconds not reported"
+    )
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    parser.add_argument("--seed", type=int, default=FIXTURE_SEED)
+    parser.add_argument("--coins", type=int, default=DEFAULT_COINS)
+    parser.add_argument("--workers", type=int, default=1, help="API processes")
+    parser.add_argument("--workdir", type=Path, help="default: a temporary one")
+    parser.add_argument("--output", type=Path, default=Path(DEFAULT_OUTPUT))
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.warmup >= args.duration:
+        parser.error("--warmup must be shorter than --duration")
+
+    # Seeding logs are not the point
+    os.environ.setdefault("KE_LOG_LEVEL", "ERROR")
+    configure_logging()
+    output = args.output.absolute()
+    duration = args.warmup + args.duration
+
+    with tempfile.TemporaryDirectory(prefix="qrypt-load-") as tmp:
+        workdir = (args.workdir or Path(tmp)).absolute()
+        workdir.mkdir(parents=True, exist_ok=True)
+        with (
+            local_api(workdir, args.coins, args.workers)
+            if args.url is None
+            else nullcontext(args.url.rstrip("/"))
+        ) as base_url:
+            samples = asyncio.run(
+                run_load(
+                    base_url, mix, args.concurrency, duration, args.interval, args.seed
+                )
+            )
+
+    report = summarize(samples, args.warmup, duration, args.interval)
+    print(format_report(report))
+    data = {
+        "environment": environment(),
+        "meta": {
+            "url": args.url,
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "workers": None if args.url else args.workers,
+            "coins": None if args.url else args.coins,
+        },
+        **report,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(data, indent=2) + "\n", encoding="utf8")
+    print(f"Results written to {output}")
+    return 1 if report["overall"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
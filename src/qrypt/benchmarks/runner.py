@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks - Runner
+
+This module times benchmarks, stores their results as JSON and compares two
+result files:
+
+    compare_benchmarks baseline.json current.json [--threshold 0.1]
+
+A benchmark runs `repeat` times (after `warmup` untimed runs), each run
+preceded by an untimed setup. Results keep every run time; comparisons use
+the median, and a benchmark slower than the baseline by more than the
+threshold is a regression (exit status 1).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+DEFAULT_REPEAT: int = 5
+DEFAULT_WARMUP: int = 1
+DEFAULT_THRESHOLD: float = 0.10
+RESULTS_VERSION: int = 1
+
+
+@dataclass(slots=True)
+class Benchmark:
+    """A timed operation
+
+    `run` is called with what the (untimed) `setup` returns, and performs
+    `ops` operations (for throughput).
+    """
+
+    name: str
+    run: Callable[[Any], Any]
+    setup: Optional[Callable[[], Any]] = None
+    ops: int = 1
+
+
+@dataclass(slots=True)
+class Result:
+    """The run times (seconds) of a benchmark"""
+
+    name: str
+    ops: int
+    times: list[float] = field(default_factory=list)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.ops / self.median if self.median else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "ops": self.ops,
+            "times": self.times,
+            "min": min(self.times),
+            "median": self.median,
+            "mean": statistics.fmean(self.times),
+            "stdev": statistics.stdev(self.times) if len(self.times) > 1 else 0.0,
+            "ops_per_second": self.ops_per_second,
+        }
+
+
+def measure(
+    benchmark: Benchmark, repeat: int = DEFAULT_REPEAT, warmup: int = DEFAULT_WARMUP
+) -> Result:
+    result = Result(benchmark.name, benchmark.ops)
+    for i in range(warmup + repeat):
+        arg = benchmark.setup() if benchmark.setup is not None else None
+        start = time.perf_counter()
+        benchmark.run(arg)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            result.times.append(elapsed)
+    return result
+
+
+def environment() -> dict[str, Any]:
+    """Where the results were measured"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_results(
+    results: list[Result], path: Path, meta: Optional[dict[str, Any]] = None
+) -> None:
+    data = {
+        "version": RESULTS_VERSION,
+        "environment": environment(),
+        "meta": meta or {},
+        "results": {result.name: result.as_dict() for result in results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf8")
+
+
+def read_results(path: Path) -> dict[str, Any]:
+    data = json.loads(path.read_text(encoding="utf8"))
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results file: {path}")
+    return data
+
+
+@dataclass(frozen=True, slots=True)
+class Comparison:
+    """A benchmark's median time in two result files"""
+
+    name: str
+    baseline: Optional[float]
+    current: Optional[float]
+
+    @property
+    def change(self) -> Optional[float]:
+        """Relative change of the median time (positive: slower)"""
+        if not self.baseline or self.current is None:
+            return None
+        return self.current / self.baseline - 1
+
+    def regressed(self, threshold: float) -> bool:
+        return self.change is not None and self.change > threshold
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any]) -> list[Comparison]:
+    """Compare the benchmarks of two result files (by name)"""
+    old, new = baseline["results"], current["results"]
+    return [
+        Comparison(
+            name,
+            old[name]["median"] if name in old else None,
+            new[name]["median"] if name in new else None,
+        )
+        for name in sorted(old.keys() | new.keys())
+    ]
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.3f}"
+
+
+def format_comparisons(comparisons: list[Comparison], threshold: float) -> str:
+    width = max([len(c.name) for c in comparisons] + [9])
+    lines = [f"{'benchmark':<{width}}  {'base ms':>11}  {'ms':>11}  change"]
+    for c in comparisons:
+        change = "" if c.change is None else f"{c.change:+.1%}"
+        flag = "  REGRESSION" if c.regressed(threshold) else ""
+        lines.append(
+            f"{c.name:<{width}}  {_ms(c.baseline):>11}  {_ms(c.current):>11}  "
+            f"{change}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def compare_main(argv: Optional[list[str]] = None) -> int:
+    """Command line entry point: compare two benchmark result files"""
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown of the median flagged as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    comparisons = compare(read_results(args.baseline), read_results(args.current))
+    print(format_comparisons(comparisons, args.threshold))
+    regressions = [c.name for c in comparisons if c.regressed(args.threshold)]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(compare_main())
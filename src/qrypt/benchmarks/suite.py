@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks
+
+This module is the benchmark suite of the sync, cache and API hot paths. It
+replays recorded CoinGecko responses (``qrypt.benchmarks.fixtures``), so it
+needs no network:
+
+* ``pull_tokens``: end-to-end sync (fetch from the response cache + load),
+  into an empty catalog and again over a full one, on SQLite (and
+  PostgreSQL with ``--postgres-url``, a scratch database: it is dropped)
+* ``cached_token``: response cache hits and misses, the coins list as payload
+* ``api``: list / detail / search / autocomplete requests through an ASGI
+  client (the full app, middlewares included)
+* ``serialize``: token responses, ORM to models to JSON (and gzip)
+
+The suite runs in a scratch directory (databases, response cache, catalog
+version) and writes the results as JSON, to compare with a baseline:
+
+    run_benchmarks [--coins N] [--repeat N] [--only api serialize ...]
+    compare_benchmarks baseline.json benchmark-results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from itertools import cycle, islice
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import httpx
+
+from qrypt.benchmarks.fixtures import DEFAULT_COINS, WORDS, coins_list
+from qrypt.benchmarks.runner import (
+    DEFAULT_REPEAT,
+    DEFAULT_WARMUP,
+    Benchmark,
+    Result,
+    measure,
+    write_results,
+)
+from qrypt.core.db import SessionLocal, reset_engines
+from qrypt.core.log import configure_logging, get_logger
+from qrypt.core.ops.db import drop_db, init_db
+from qrypt.tokens import crud
+from qrypt.tokens.services.coingecko.ops.admin import pull_tokens
+from qrypt.tokens.services.coingecko.strategies import cached_token
+
+log = get_logger(__name__)
+
+GROUPS: tuple[str, ...] = ("pull_tokens", "cached_token", "api", "serialize")
+DEFAULT_OUTPUT: str = "benchmark-results.json"
+DEFAULT_REQUESTS: int = 200
+CACHE_CALLS: int = 10
+SERIALIZE_TOKENS: int = 1000
+PAGE_SIZE: int = 100
+
+# The response cache file and key the coins list endpoint reads
+COINS_CACHE_FILE: Path = Path("./localcache/service_coingecko.json")
+COINS_CACHE_KEY: str = "coins_list"
+
+
+def use_database(url: str) -> None:
+    """Point the application at a database (from the next session on)"""
+    os.environ["KE_DATABASE_URL"] = url
+    reset_engines()
+
+
+def seed_response_cache(coins: list[dict[str, Any]]) -> None:
+    """Serve the coins list endpoint from the (fresh) response cache"""
+    COINS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    entry = {"data": coins, "ctime": time.time()}
+    COINS_CACHE_FILE.write_text(json.dumps({COINS_CACHE_KEY: entry}), "utf8")
+
+
+def seed_catalog(url: str, coins: list[dict[str, Any]]) -> None:
+    """Create a database at `url` and sync `coins` into it"""
+    seed_response_cache(coins)
+    use_database(url)
+    init_db()
+    pull_tokens()
+
+
+def pull_benchmarks(
+    engine: str, url: Callable[[str], str], coins: int, fresh: bool
+) -> list[Benchmark]:
+    """The sync into an empty catalog, and again over the full catalog
+
+    `url` names a database; `fresh` ones are new (SQLite files), others are
+    dropped first.
+    """
+    runs = iter(range(sys.maxsize))
+    loaded = False
+
+    def create(name: str) -> None:
+        use_database(url(name))
+        if not fresh:
+            drop_db()
+        init_db()
+
+    def empty_catalog() -> None:
+        create(f"run-{next(runs)}")
+
+    def full_catalog() -> None:
+        nonlocal loaded
+        if loaded:
+            use_database(url("full"))
+            return
+        create("full")
+        pull_tokens()
+        loaded = True
+
+    def run(_) -> None:
+        pull_tokens()
+
+    return [
+        Benchmark(f"pull_tokens.{engine}.initial", run, empty_catalog, ops=coins),
+        Benchmark(f"pull_tokens.{engine}.resync", run, full_catalog, ops=coins),
+    ]
+
+
+def cache_benchmarks(coins: list[dict[str, Any]]) -> list[Benchmark]:
+    """Response cache lookups with the coins list as payload"""
+    path = Path("./localcache/benchmark_cache.json")
+
+    async def fetch() -> list[dict[str, Any]]:
+        return coins
+
+    hit = cached_token("benchmark", path)(fetch)
+    # Always expired: fetched and saved again
+    miss = cached_token("benchmark", path, ttl=0)(fetch)
+
+    def calls(fn) -> Callable[[Any], None]:
+        async def repeat() -> None:
+            for _ in range(CACHE_CALLS):
+                await fn()
+
+        return lambda _: asyncio.run(repeat())
+
+    def warm() -> None:
+        if not path.exists():
+            asyncio.run(miss())
+
+    return [
+        Benchmark("cached_token.hit", calls(hit), warm, ops=CACHE_CALLS),
+        Benchmark("cached_token.miss", calls(miss), ops=CACHE_CALLS),
+    ]
+
+
+def api_benchmarks(catalog_url: str, coins: int, requests: int) -> list[Benchmark]:
+    """Requests through an ASGI client (sequential, one client per run)"""
+    use_database(catalog_url)
+    # pylint: disable=import-outside-toplevel
+    from qrypt.main import app, build_token_index
+
+    build_token_index()
+    hot_pages = max(min(coins, 1000) // PAGE_SIZE, 1)
+    words = [word.lower() for word in WORDS]
+    paths = {
+        "api.list_page": [
+            f"/api/v1/tokens/?offset={page * PAGE_SIZE}&limit={PAGE_SIZE}"
+            for page in range(hot_pages)
+        ],
+        "api.detail": [
+            f"/api/v1/tokens/{token_id}"
+            for token_id in range(1, coins + 1, max(coins // requests, 1))
+        ],
+        "api.search": [f"/api/v1/tokens/?q={word}&limit=20" for word in words],
+        "api.autocomplete": [
+            f"/api/v1/tokens/autocomplete?q={word[:2]}" for word in words
+        ],
+    }
+
+    def requests_to(urls: list[str]) -> Callable[[Any], None]:
+        urls = list(islice(cycle(urls), requests))
+
+        async def get_all() -> None:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark"
+            ) as client:
+                for url in urls:
+                    response = await client.get(url)
+                    response.raise_for_status()
+
+        return lambda _: asyncio.run(get_all())
+
+    return [
+        Benchmark(name, requests_to(urls), ops=requests) for name, urls in paths.items()
+    ]
+
+
+def serialize_benchmarks(catalog_url: str) -> list[Benchmark]:
+    """Token responses: ORM to API models, to JSON, to a gzip'd snapshot"""
+    use_database(catalog_url)
+    # pylint: disable=import-outside-toplevel
+    from qrypt.tokens.api import TOKEN_LIST_ADAPTER
+    from qrypt.tokens.snapshots import render_snapshot
+
+    db = SessionLocal()
+    tokens = crud.list_tokens(db, limit=SERIALIZE_TOKENS)
+    models = [crud.token_out(token) for token in tokens]
+    count = len(tokens)
+    return [
+        Benchmark(
+            "serialize.token_out",
+            lambda _: [crud.token_out(token) for token in tokens],
+            ops=count,
+        ),
+        Benchmark(
+            "serialize.json", lambda _: TOKEN_LIST_ADAPTER.dump_json(models), ops=count
+        ),
+        Benchmark(
+            "serialize.snapshot",
+            lambda _: render_snapshot(TOKEN_LIST_ADAPTER, models, {}),
+            ops=count,
+        ),
+    ]
+
+
+def run_suite(
+    workdir: Path,
+    coins: int = DEFAULT_COINS,
+    repeat: int = DEFAULT_REPEAT,
+    warmup: int = DEFAULT_WARMUP,
+    requests: int = DEFAULT_REQUESTS,
+    groups: tuple[str, ...] = GROUPS,
+    postgres_url: Optional[str] = None,
+) -> list[Result]:
+    """Run the benchmark groups in `workdir` (the working directory)"""
+    os.chdir(workdir)
+    fixture = coins_list(coins)
+    coins = len(fixture)
+    seed_response_cache(fixture)
+
+    def sqlite(name: str) -> str:
+        return f"sqlite:///{workdir / f'pull-{name}.db'}"
+
+    # A loaded catalog for the API and serialization benchmarks
+    catalog_url = f"sqlite:///{workdir / 'catalog.db'}"
+    if {"api", "serialize"} & set(groups):
+        seed_catalog(catalog_url, fixture)
+
+    benchmarks: list[Benchmark] = []
+    if "pull_tokens" in groups:
+        benchmarks += pull_benchmarks("sqlite", sqlite, coins, fresh=True)
+        if postgres_url:
+            benchmarks += pull_benchmarks(
+                "postgresql", lambda _: postgres_url, coins, fresh=False
+            )
+    if "cached_token" in groups:
+        benchmarks += cache_benchmarks(fixture)
+    if "api" in groups:
+        benchmarks += api_benchmarks(catalog_url, coins, requests)
+    if "serialize" in groups:
+        benchmarks += serialize_benchmarks(catalog_url)
+
+    results = []
+    for benchmark in benchmarks:
+        result = measure(benchmark, repeat, warmup)
+        print(
+            f"{result.name:<32} {result.median * 1000:>10.3f} ms "
+            f"{result.ops_per_second:>12.1f} ops/s"
+        )
+        results.append(result)
+    reset_engines()
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command line entry point: run the benchmarks, write the results"""
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--coins", type=int, default=DEFAULT_COINS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument(
+        "--requests", type=int, default=DEFAULT_REQUESTS, help="per API benchmark"
+    )
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--postgres-url", help="scratch PostgreSQL database")
+    parser.add_argument("--workdir", type=Path, help="default: a temporary one")
+    parser.add_argument("--output", type=Path, default=Path(DEFAULT_OUTPUT))
+    args = parser.parse_args(argv)
+
+    # Benchmark the code, not the log output
+    os.environ.setdefault("KE_LOG_LEVEL", "ERROR")
+    configure_logging()
+    output = args.output.absolute()
+    cwd = Path.cwd()
+    with tempfile.TemporaryDirectory(prefix="qrypt-bench-") as tmp:
+        workdir = (args.workdir or Path(tmp)).absolute()
+        workdir.mkdir(parents=True, exist_ok=True)
+        try:
+            results = run_suite(
+                workdir,
+                coins=args.coins,
+                repeat=args.repeat,
+                warmup=args.warmup,
+                requests=args.requests,
+                groups=tuple(args.only),
+                postgres_url=args.postgres_url,
+            )
+        finally:
+            os.chdir(cwd)
+
+    meta = {
+        "coins": args.coins,
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "requests": args.requests,
+        "groups": list(args.only),
+        "postgresql": bool(args.postgres_url),
+    }
+    write_results(results, output, meta)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks - Tests
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from qrypt.benchmarks.fixtures import synthetic_coins_list
+from qrypt.benchmarks.runner import (
+    Benchmark,
+    Result,
+    compare,
+    compare_main,
+    measure,
+    read_results,
+    write_results,
+)
+
+SRC_DIR = Path(__file__).resolve().parents[3]
+
+
+def test_measure_runs_setup_untimed_and_skips_warmup():
+    calls = []
+    benchmark = Benchmark(
+        "count", lambda arg: calls.append(arg), setup=lambda: len(calls), ops=10
+    )
+    result = measure(benchmark, repeat=3, warmup=2)
+    assert calls == [0, 1, 2, 3, 4]
+    assert len(result.times) == 3
+    assert result.as_dict()["ops"] == 10
+
+
+def test_compare_flags_regressions(tmp_path, capsys):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    write_results(
+        [Result("a", 1, [1.0, 1.0]), Result("b", 1, [1.0]), Result("gone", 1, [1.0])],
+        baseline,
+    )
+    write_results(
+        [Result("a", 1, [1.05, 1.05]), Result("b", 1, [1.5]), Result("new", 1, [1.0])],
+        current,
+    )
+
+    comparisons = {
+        c.name: c for c in compare(read_results(baseline), read_results(current))
+    }
+    assert comparisons["a"].change == pytest.approx(0.05)
+    assert not comparisons["a"].regressed(0.10)
+    assert comparisons["b"].regressed(0.10)
+    assert comparisons["gone"].change is None and comparisons["new"].change is None
+
+    assert compare_main([str(baseline), str(current)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    assert compare_main([str(baseline), str(current), "--threshold", "0.6"]) == 0
+
+
+def test_synthetic_coins_list_is_deterministic():
+    coins = synthetic_coins_list(50)
+    assert coins == synthetic_coins_list(50)
+    assert {"id", "symbol", "name", "platforms"} == set(coins[0])
+    assert len({coin["id"] for coin in coins}) == 50
+
+
+@pytest.mark.performance
+def test_suite_runs_and_writes_results(tmp_path):
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR)}
+    env.pop("KE_DATABASE_URL", None)
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "qrypt.benchmarks.suite",
+            "--coins=300",
+            "--repeat=1",
+            "--warmup=0",
+            "--requests=20",
+            "--output=results.json",
+        ],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+        check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+
+    results = json.loads((tmp_path / "results.json").read_text())["results"]
+    assert {
+        "pull_tokens.sqlite.initial",
+        "pull_tokens.sqlite.resync",
+        "cached_token.hit",
+        "cached_token.miss",
+        "api.list_page",
+        "api.detail",
+        "api.search",
+        "api.autocomplete",
+        "serialize.json",
+    } <= set(results)
+    assert all(result["median"] > 0 for result in results.values())
+    # The scratch files stay in the (temporary) working directory
+    assert [path.name for path in tmp_path.iterdir()] == ["results.json"]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks - Fake CoinGecko - Tests
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from qrypt.benchmarks.fake_coingecko import FakeCoinGecko, Faults, create_app
+from qrypt.benchmarks.fixtures import synthetic_coins_list
+
+API = "/api/v3"
+
+
+@pytest.fixture
+def fake():
+    return FakeCoinGecko(synthetic_coins_list(30))
+
+
+def test_replays_the_endpoints(fake):
+    client = TestClient(create_app(fake))
+
+    coins = client.get(f"{API}/coins/list", params={"include_platform": "true"})
+    assert len(coins.json()) == 30 and "platforms" in coins.json()[0]
+    assert "platforms" not in client.get(f"{API}/coins/list").json()[0]
+    assert "usd" in client.get(f"{API}/simple/supported_vs_currencies").json()
+
+    url = f"{API}/coins/markets"
+    page = client.get(url, params={"vs_currency": "usd", "per_page": 10, "page": 3})
+    assert [market["market_cap_rank"] for market in page.json()] == list(range(21, 31))
+    assert client.get(url, params={"vs_currency": "usd", "page": 4}).json() == []
+    some = client.get(url, params={"vs_currency": "usd", "ids": coins.json()[0]["id"]})
+    assert [market["id"] for market in some.json()] == [coins.json()[0]["id"]]
+    assert client.get(url, params={"vs_currency": "xyz"}).status_code == 400
+    assert (
+        client.get(url, params={"vs_currency": "usd", "per_page": 251}).status_code
+        == 422
+    )
+
+
+def test_scales_the_payload():
+    fake = FakeCoinGecko(synthetic_coins_list(30), scale_factor=10)
+    assert len(fake.coins) == len(fake.markets) == 300
+    assert len({coin["id"] for coin in fake.coins}) == 300
+    addresses = [a for coin in fake.coins for a in coin["platforms"].values()]
+    assert len(set(addresses)) == len(addresses)
+
+
+def test_injects_faults(fake):
+    client = TestClient(create_app(fake))
+    faults = {"rate_limit_rate": 1.0, "retry_after": 7}
+    assert client.put("/_fake/faults", json=faults).json()["rate_limit_rate"] == 1.0
+
+    response = client.get(f"{API}/coins/list")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
+    assert response.json()["status"]["error_code"] == 429
+
+    # Deterministic: the same faults after a reset
+    fake.faults = Faults(rate_limit_rate=0.5)
+    client.post("/_fake/reset")
+    first = [client.get(f"{API}/ping").status_code for _ in range(20)]
+    client.post("/_fake/reset")
+    assert [client.get(f"{API}/ping").status_code for _ in range(20)] == first
+    assert {200, 429} == set(first)
+    assert client.get("/_fake/stats").json() == {
+        "requests.ping": 20,
+        "rate_limited": first.count(429),
+    }
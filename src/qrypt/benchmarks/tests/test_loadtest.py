@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Benchmarks - Load Test - Tests
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from qrypt.benchmarks.fixtures import synthetic_coins_list
+from qrypt.benchmarks.loadtest import (
+    Sample,
+    Workload,
+    parse_mix,
+    percentile,
+    run_load,
+    summarize,
+)
+from qrypt.benchmarks.suite import seed_catalog
+from qrypt.core.db import reset_engines
+
+
+def test_parse_mix():
+    assert parse_mix("list=3, detail=1") == {"list": 3.0, "detail": 1.0}
+    with pytest.raises(ValueError, match="Unknown request kind"):
+        parse_mix("list=1,delete=1")
+    with pytest.raises(ValueError, match="No request kind"):
+        parse_mix("list=0")
+
+
+def test_workload_is_deterministic():
+    mix = parse_mix("list=1,detail=1,search=1,create=1,update=1")
+
+    def requests(seed):
+        workload = Workload(mix, [1, 2, 3], ["coin"], total=250, seed=seed)
+        return [workload.next() for _ in range(50)]
+
+    assert requests(1) == requests(1) != requests(2)
+    assert {kind for kind, *_ in requests(1)} == set(mix)
+    with pytest.raises(ValueError, match="need tokens"):
+        Workload(mix, [], [], total=0)
+
+
+def test_summarize_percentiles_and_timeline():
+    assert percentile([], 0.99) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0
+    samples = [
+        Sample("list", start=0.5, latency=9.0, status=200),  # warmup
+        *(Sample("list", 1 + i / 100, (i + 1) / 1000, 200) for i in range(100)),
+        Sample("detail", 2.5, 0.5, 0, "ReadTimeout"),
+    ]
+    report = summarize(samples, warmup=1, duration=3, interval=1)
+
+    overall = report["overall"]
+    assert (overall["requests"], overall["errors"]) == (101, 1)
+    assert overall["rps"] == pytest.approx(50.5)
+    assert report["kinds"]["list"]["p99_ms"] == pytest.approx(99)
+    assert report["kinds"]["detail"]["error_kinds"] == {"ReadTimeout": 1}
+    assert [t["requests"] for t in report["timeline"]] == [100, 1]
+
+
+def test_run_load_on_the_api(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("KE_DATABASE_URL", f"sqlite:///{tmp_path / 'catalog.db'}")
+    # pylint: disable=import-outside-toplevel
+    from qrypt.main import app
+
+    try:
+        seed_catalog(f"sqlite:///{tmp_path / 'catalog.db'}", synthetic_coins_list(300))
+        mix = parse_mix("list=4,detail=3,search=2,create=1,update=1")
+        samples = asyncio.run(
+            run_load(
+                "http://loadtest",
+                mix,
+                concurrency=4,
+                duration=1.0,
+                interval=0.5,
+                transport=httpx.ASGITransport(app=app),
+            )
+        )
+    finally:
+        monkeypatch.undo()
+        reset_engines()
+
+    assert samples and {sample.kind for sample in samples} <= set(mix)
+    assert [sample for sample in samples if sample.error] == []
+    created = [sample for sample in samples if sample.kind == "create"]
+    assert all(sample.status == 201 for sample in created)
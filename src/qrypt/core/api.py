@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - System API
+
+This module contains the system / diagnostics endpoints of the Qrypto
+application (database connection pool metrics, read replica health, query
+statistics, request profiles, upstream circuit breakers, ...), and the
+Prometheus metrics endpoint.
+
+The diagnostics expose SQL, replica URLs and upstream state: they require
+the admin key. ``/metrics`` stays public for Prometheus scrapers (counters
+by route, no SQL); restrict it at the network level if needed.
+
+"""
+
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from qrypt.core.auth import require_admin
+from qrypt.core.breaker import circuit_breakers, data_freshness
+from qrypt.core.db import get_pool_stats, get_read_router
+from qrypt.core.metrics import CONTENT_TYPE, registry
+from qrypt.core.profiling import PROFILE_CPROFILE, profile_store
+from qrypt.core.queries import DEFAULT_TOP, query_log
+
+# Initialize the FastAPI router
+router = APIRouter(prefix="/api/v1/system", tags=["system"])
+# Prometheus scrapes /metrics (at the root, by convention)
+metrics_router = APIRouter(tags=["system"])
+ADMIN = [Depends(require_admin)]
+
+
+@router.get("/db/pool", dependencies=ADMIN)
+async def db_pool_stats() -> dict:
+    """
+    Get the database connection pool metrics (admin only).
+
+    Returns checkout counts, connections in use (current and peak), pool
+    capacity and utilization, checkout wait times and checkout timeouts.
+    """
+    return get_pool_stats()
+
+
+@router.get("/db/replicas", dependencies=ADMIN)
+async def db_replica_status() -> dict:
+    """
+    Get the read replica routing status (admin only).
+
+    Returns each replica's health (from the periodic health checks), the
+    sessions routed to it and its pool metrics, and the number of reads that
+    fell back to the primary.
+    """
+    return get_read_router().status()
+
+
+@router.get("/upstream", dependencies=ADMIN)
+async def upstream_status() -> dict:
+    """
+    Get the upstream (CoinGecko) circuit breakers and data freshness (admin
+    only).
+
+    Returns each circuit's state (closed, open or half open), its recent
+    failure rate, calls, failures and fast-failed calls; and for each kind
+    of upstream data, where it was last served from (live, cache or stale:
+    an expired cache entry served while the upstream failed) and its age.
+    """
+    return {"circuits": circuit_breakers.status(), "data": data_freshness.status()}
+
+
+@router.get("/queries", dependencies=ADMIN)
+async def query_stats(
+    limit: int = Query(DEFAULT_TOP, ge=1, le=200, description="Statements listed")
+) -> dict:
+    """
+    Get the slowest (by max duration) and most frequent SQL statements since
+    startup (admin only), by fingerprint: counts, total / mean / max durations, rows,
+    slow executions, the routes that ran them and the last slow plan.
+    """
+    return query_log.top(limit)
+
+
+@router.get("/profiles", dependencies=ADMIN)
+async def list_profiles() -> list[dict]:
+    """
+    List the latest request profiles (admin only), latest first.
+    """
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", dependencies=ADMIN)
+async def get_profile(
+    profile_id: str,
+    format: Optional[Literal["text", "pstats", "speedscope"]] = Query(
+        None, description="Default: text (cProfile), speedscope (sampled)"
+    ),
+) -> Response:
+    """
+    Get a request profile (admin only): the top functions as text, a pstats
+    file (cProfile profiles) or a speedscope file (sampled profiles).
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    format = format or ("text" if profile.kind == PROFILE_CPROFILE else "speedscope")
+    try:
+        if format == "pstats":
+            return Response(
+                profile.pstats(),
+                media_type="application/octet-stream",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{profile_id}.pstats"'
+                },
+            )
+        if format == "speedscope":
+            return JSONResponse(
+                profile.speedscope(),
+                headers={
+                    "Content-Disposition": (
+                        f'attachment; filename="{profile_id}.speedscope.json"'
+                    )
+                },
+            )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from e
+    return PlainTextResponse(profile.text())
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Get the application metrics, in the Prometheus text format.
+
+    HTTP request counts and latencies by route, requests in flight, database
+    query counts and durations, CoinGecko call latencies and cache lookups.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
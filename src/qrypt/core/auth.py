@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Admin Authentication
+
+Admin endpoints (and on-demand request profiling) require the admin API key
+(``KE_ADMIN_API_KEY``) in the ``X-Admin-Key`` header. Without a configured
+key they are disabled.
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from qrypt.core.db import get_config
+
+ADMIN_KEY_HEADER: str = "X-Admin-Key"
+
+
+def admin_key_matches(provided: Optional[str], expected: Optional[str]) -> bool:
+    """Whether a key is the admin key (constant time; no key never matches)"""
+    if not provided or not expected:
+        return False
+    return hmac.compare_digest(provided.encode(), expected.encode())
+
+
+def require_admin(
+    x_admin_key: Optional[str] = Header(None, alias=ADMIN_KEY_HEADER)
+) -> None:
+    """Dependency: the request carries the admin API key"""
+    expected = get_config().api.admin_api_key
+    if expected is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled (KE_ADMIN_API_KEY is not set)",
+        )
+    if not admin_key_matches(x_admin_key, expected):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin key"
+        )
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Circuit Breakers
+
+This module keeps upstream outages (eg. the CoinGecko API down or rate
+limiting) from tying up the application: calls through a circuit breaker
+fail fast while the upstream is failing, instead of each waiting for its
+timeout.
+
+A breaker is closed (calls go through) until, over its last `window` calls
+(at least `min_calls` of them), the failure rate reaches `failure_rate`. It
+then opens: calls raise `CircuitOpenError` at once, for `open_seconds`.
+After that it is half open: `half_open_probes` calls go through as probes,
+a success closes it, a failure opens it again.
+
+Callers that can, fall back to the data they have (eg. an expired response
+cache entry); `data_freshness` records where the data served last came from
+(live, cache or stale) and how old it is. Both are reported at
+``GET /api/v1/system/upstream``.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from qrypt.core.log import get_logger
+from qrypt.core.metrics import registry
+
+log = get_logger(__name__)
+
+CIRCUIT_CLOSED: str = "closed"
+CIRCUIT_HALF_OPEN: str = "half_open"
+CIRCUIT_OPEN: str = "open"
+STATE_CODES: dict[str, int] = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+DEFAULT_FAILURE_RATE: float = 0.5
+DEFAULT_WINDOW: int = 20
+DEFAULT_MIN_CALLS: int = 5
+DEFAULT_OPEN_SECONDS: float = 30.0
+DEFAULT_HALF_OPEN_PROBES: int = 1
+
+DATA_LIVE: str = "live"
+DATA_CACHE: str = "cache"
+DATA_STALE: str = "stale"
+
+circuit_state = registry.gauge(
+    "qrypt_upstream_circuit_state",
+    "Upstream circuit breaker state (0 closed, 1 half open, 2 open)",
+    ("circuit",),
+)
+circuit_rejected = registry.counter(
+    "qrypt_upstream_circuit_rejected_total",
+    "Upstream calls failed fast by an open circuit breaker",
+    ("circuit",),
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """A call refused by an open circuit breaker"""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit {name} is open (retry in {retry_after:.1f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """A circuit breaker over the failure rate of the last calls
+
+    `is_failure` tells the errors that count against the upstream (eg. a
+    timeout) from the ones that do not (eg. a bad request).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        window: int = DEFAULT_WINDOW,
+        min_calls: int = DEFAULT_MIN_CALLS,
+        open_seconds: float = DEFAULT_OPEN_SECONDS,
+        half_open_probes: int = DEFAULT_HALF_OPEN_PROBES,
+        is_failure: Callable[[Exception], bool] = lambda _: True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 0 < failure_rate <= 1:
+            raise ValueError("The failure rate must be in (0, 1]")
+        if not 1 <= min_calls <= window:
+            raise ValueError("The minimum calls must be in [1, window]")
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.is_failure = is_failure
+        self._clock = clock
+        self._results: deque[bool] = deque(maxlen=window)
+        self._state = CIRCUIT_CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self.last_error: Optional[str] = None
+        circuit_state.inc(name, amount=0)
+
+    def _transition(self, state: str) -> None:
+        circuit_state.inc(
+            self.name, amount=STATE_CODES[state] - STATE_CODES[self._state]
+        )
+        log.log(
+            logging.WARNING if state == CIRCUIT_OPEN else logging.INFO,
+            "Circuit %s: %s -> %s",
+            self.name,
+            self._state,
+            state,
+        )
+        self._state = state
+        if state == CIRCUIT_OPEN:
+            self._opened_at = self._clock()
+            self.opened += 1
+        elif state == CIRCUIT_HALF_OPEN:
+            self._probes = 0
+        else:
+            self._results.clear()
+
+    def _current_state(self) -> str:
+        if (
+            self._state == CIRCUIT_OPEN
+            and self._clock() - self._opened_at >= self.open_seconds
+        ):
+            self._transition(CIRCUIT_HALF_OPEN)
+        return self._state
+
+    def _retry_after(self) -> float:
+        return max(self._opened_at + self.open_seconds - self._clock(), 0.0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def acquire(self) -> None:
+        """Let a call through, or raise `CircuitOpenError`"""
+        with self._lock:
+            state = self._current_state()
+            if state == CIRCUIT_HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+            elif state != CIRCUIT_CLOSED:
+                self.rejected += 1
+                circuit_rejected.inc(self.name)
+                raise CircuitOpenError(self.name, self._retry_after())
+            self.calls += 1
+
+    def record(self, success: bool, error: Optional[Exception] = None) -> None:
+        """The outcome of a call let through"""
+        with self._lock:
+            if not success:
+                self.failures += 1
+                self.last_error = f"{type(error).__name__}: {error}" if error else None
+            if self._state == CIRCUIT_HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                self._transition(CIRCUIT_CLOSED if success else CIRCUIT_OPEN)
+                return
+            if self._state == CIRCUIT_OPEN:
+                # A call started before the circuit opened
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if (
+                len(self._results) >= self.min_calls
+                and failures / len(self._results) >= self.failure_rate
+            ):
+                self._transition(CIRCUIT_OPEN)
+
+    def release(self) -> None:
+        """A call let through ended without an outcome (eg. cancelled)"""
+        with self._lock:
+            if self._state == CIRCUIT_HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run a call through the breaker (raises `CircuitOpenError`)"""
+        self.acquire()
+        try:
+            yield
+        except Exception as e:
+            failed = self.is_failure(e)
+            self.record(not failed, e if failed else None)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record(True)
+
+    def status(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            results = list(self._results)
+            return {
+                "state": state,
+                "retry_after": self._retry_after() if state == CIRCUIT_OPEN else None,
+                "window_calls": len(results),
+                "window_failure_rate": (
+                    results.count(False) / len(results) if results else 0.0
+                ),
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "opened": self.opened,
+                "last_error": self.last_error,
+            }
+
+
+class CircuitBreakers:
+    """The circuit breakers of the process, by name"""
+
+    def __init__(self) -> None:
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, **settings) -> CircuitBreaker:
+        """The named breaker, created with `settings` on first use"""
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **settings)
+            return breaker
+
+    def status(self) -> dict[str, dict]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.status() for breaker in breakers}
+
+    def clear(self) -> None:
+        """Forget every breaker (tests)"""
+        with self._lock:
+            self._breakers.clear()
+
+
+@dataclass(slots=True)
+class Freshness:
+    """Where the data served last came from, and when it was fetched"""
+
+    source: str
+    fetched: float
+    error: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        return max(time.time() - self.fetched, 0.0)
+
+    def status(self) -> dict:
+        return {
+            "source": self.source,
+            "stale": self.source == DATA_STALE,
+            "fetched": self.fetched,
+            "age_seconds": self.age,
+            "error": self.error,
+        }
+
+
+class FreshnessLog:
+    """The freshness of the upstream data served, by key"""
+
+    def __init__(self) -> None:
+        self._entries: dict[str, Freshness] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, key: str, source: str, fetched: float, error: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            self._entries[key] = Freshness(source, fetched, error)
+
+    def get(self, key: str) -> Optional[Freshness]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def status(self) -> dict[str, dict]:
+        with self._lock:
+            entries = dict(self._entries)
+        return {key: entry.status() for key, entry in sorted(entries.items())}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+circuit_breakers = CircuitBreakers()
+data_freshness = FreshnessLog()
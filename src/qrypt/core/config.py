@@ -10,13 +10,78 @@ This module contains the constants used throughout the Qrypto application.
 # SQLite settings
 # sqlite_check_same_thread: bool = False
 
+import logging
 import os
 from abc import ABC, abstractmethod
+from functools import cache
 from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
 
 DEFAULT_DATABASE_URL = "sqlite:///./qrypt.db"
+DEFAULT_TOKEN_INDEX_REFRESH_SECONDS = 300
+DEFAULT_CACHE_MAX_AGE_SECONDS = 60
+DEFAULT_SNAPSHOT_MAX_ENTRIES = 1024
+DEFAULT_SNAPSHOT_HOT_ROWS = 1000
+DEFAULT_LOGO_CONCURRENCY = 8
+DEFAULT_LOGO_MAX_BYTES = 2 * 1024 * 1024
+# Logos are decoded in memory (4 bytes per pixel): 2048 x 2048 is 16 MB
+DEFAULT_LOGO_MAX_PIXELS = 2048 * 2048
+DEFAULT_PROFILE_SAMPLE_RATE = 0.0
+DEFAULT_PROFILE_HISTORY = 20
+
+# Streamlit UI -> API client defaults
+DEFAULT_UI_API_URL = "http://127.0.0.1:8000"
+DEFAULT_UI_API_TIMEOUT_SECONDS = 10
+DEFAULT_UI_API_MAX_CONNECTIONS = 10
+DEFAULT_UI_CACHE_TTL_SECONDS = 30
+DEFAULT_UI_CACHE_MAX_ENTRIES = 1024
+
+# Logging defaults
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_FORMAT = "text"
+DEFAULT_LOG_QUEUE_SIZE = 10000
+DEFAULT_LOG_SAMPLE_RATE = 1
+
+LOG_FORMATS = {"text", "json"}
+
+# Connection pool defaults
+DEFAULT_POOL_SIZE = 5
+DEFAULT_POOL_MAX_OVERFLOW = 10
+DEFAULT_POOL_TIMEOUT_SECONDS = 30
+DEFAULT_POOL_RECYCLE_SECONDS = 1800
+
+# Slow query log default (0 disables it)
+DEFAULT_SLOW_QUERY_MS = 200
+
+# Read replica defaults
+DEFAULT_REPLICA_HEALTH_CHECK_SECONDS = 10
+DEFAULT_READ_YOUR_WRITES_SECONDS = 5
+
+# SQLite defaults (WAL lets readers and a writer work concurrently)
+DEFAULT_SQLITE_JOURNAL_MODE = "WAL"
+DEFAULT_SQLITE_SYNCHRONOUS = "NORMAL"
+DEFAULT_SQLITE_BUSY_TIMEOUT_MS = 5000
+DEFAULT_SQLITE_CACHE_SIZE = -64000  # negative = KiB, ie. 64MB
+DEFAULT_SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+SQLITE_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SQLITE_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+@cache
+def load_env() -> None:
+    """Load the .env file into the environment (once per process)"""
+    load_dotenv()
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment"""
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
 
 
 class ConfigBase(ABC):
@@ -24,7 +89,7 @@ class ConfigBase(ABC):
 
     def __init__(self, validate: bool = True) -> None:
         # Load .env variables
-        load_dotenv()
+        load_env()
 
         if validate:
             self.validate()
@@ -39,13 +104,64 @@ class DBConfigBase(ABC):
     """Database configuration base class"""
 
     database_url: str = ""
+    pool_size: int
+    pool_max_overflow: int
+    pool_timeout: int
+    pool_recycle: int
+    pool_pre_ping: bool
+    replica_urls: list[str]
+    replica_health_check_seconds: int
+    read_your_writes_seconds: int
+    slow_query_ms: int
+    slow_query_explain: bool
 
     def __init__(self, validate: bool = True) -> None:
         # Load .env variables
-        load_dotenv()
+        load_env()
 
         self.database_url = os.environ.get("KE_DATABASE_URL", DEFAULT_DATABASE_URL)
 
+        # Optional read replicas (comma separated URLs) for read-only sessions
+        self.replica_urls = [
+            url.strip()
+            for url in os.environ.get("KE_DATABASE_REPLICA_URLS", "").split(",")
+            if url.strip()
+        ]
+        self.replica_health_check_seconds = int(
+            os.environ.get(
+                "KE_DATABASE_REPLICA_HEALTH_CHECK_SECONDS",
+                DEFAULT_REPLICA_HEALTH_CHECK_SECONDS,
+            )
+        )
+        # Reads go to the primary for this long after a write (by the same
+        # client, or to the catalog), so they see the write before it has
+        # replicated
+        self.read_your_writes_seconds = int(
+            os.environ.get(
+                "KE_DATABASE_READ_YOUR_WRITES_SECONDS",
+                DEFAULT_READ_YOUR_WRITES_SECONDS,
+            )
+        )
+
+        # Connection pool tuning
+        self.pool_size = int(os.environ.get("KE_DATABASE_POOL_SIZE", DEFAULT_POOL_SIZE))
+        self.pool_max_overflow = int(
+            os.environ.get("KE_DATABASE_POOL_MAX_OVERFLOW", DEFAULT_POOL_MAX_OVERFLOW)
+        )
+        self.pool_timeout = int(
+            os.environ.get("KE_DATABASE_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT_SECONDS)
+        )
+        self.pool_recycle = int(
+            os.environ.get("KE_DATABASE_POOL_RECYCLE", DEFAULT_POOL_RECYCLE_SECONDS)
+        )
+        self.pool_pre_ping = env_bool("KE_DATABASE_POOL_PRE_PING", True)
+
+        # Log queries slower than this (and their plan, if explain is set)
+        self.slow_query_ms = int(
+            os.environ.get("KE_DATABASE_SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS)
+        )
+        self.slow_query_explain = env_bool("KE_DATABASE_SLOW_QUERY_EXPLAIN", False)
+
         # Validate the config setup
         if validate:
             self.validate()
@@ -55,21 +171,119 @@ class DBConfigBase(ABC):
         """Validate the configuration"""
         raise NotImplementedError("Subclasses must implement this method")
 
+    def validate_pool(self) -> None:
+        """Validate the connection pool settings"""
+        if self.pool_size < 1:
+            raise ValueError("Database pool size must be at least 1")
+        if self.pool_max_overflow < 0:
+            raise ValueError("Database pool max overflow must be 0 or greater")
+        if self.pool_timeout <= 0:
+            raise ValueError("Database pool timeout must be greater than 0")
+
+    def validate_replicas(self) -> None:
+        """Validate the read replica settings"""
+        if self.replica_health_check_seconds < 0:
+            raise ValueError("Replica health check interval must be 0 or greater")
+        if self.read_your_writes_seconds < 0:
+            raise ValueError("Read-your-writes window must be 0 or greater")
+
+    def validate_query_log(self) -> None:
+        """Validate the slow query log settings"""
+        if self.slow_query_ms < 0:
+            raise ValueError("Slow query threshold must be 0 or greater")
+
     @property
     @abstractmethod
     def url(self) -> str:
         """Construct the database URL"""
         raise NotImplementedError("Subclasses must implement this method")
 
+    def engine_options(self) -> dict:
+        """Keyword arguments for `sqlalchemy.create_engine`"""
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.pool_max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+
 
 class DBConfigSQLite(DBConfigBase):
     """SQLite database configuration class"""
 
+    journal_mode: str
+    synchronous: str
+    busy_timeout_ms: int
+    cache_size: int
+    mmap_size: int
+
+    def __init__(self, validate: bool = True) -> None:
+        load_env()
+        # PRAGMAs applied to every new connection
+        self.journal_mode = os.environ.get(
+            "KE_SQLITE_JOURNAL_MODE", DEFAULT_SQLITE_JOURNAL_MODE
+        ).upper()
+        self.synchronous = os.environ.get(
+            "KE_SQLITE_SYNCHRONOUS", DEFAULT_SQLITE_SYNCHRONOUS
+        ).upper()
+        self.busy_timeout_ms = int(
+            os.environ.get("KE_SQLITE_BUSY_TIMEOUT_MS", DEFAULT_SQLITE_BUSY_TIMEOUT_MS)
+        )
+        self.cache_size = int(
+            os.environ.get("KE_SQLITE_CACHE_SIZE", DEFAULT_SQLITE_CACHE_SIZE)
+        )
+        self.mmap_size = int(
+            os.environ.get("KE_SQLITE_MMAP_SIZE", DEFAULT_SQLITE_MMAP_SIZE)
+        )
+        super().__init__(validate=validate)
+
     def validate(self):
         if not self.database_url:
             raise ValueError("Database URL is required")
         if not self.database_url.startswith("sqlite:///"):
             raise ValueError("Database URL must start with 'sqlite:///'")
+        if self.journal_mode not in SQLITE_JOURNAL_MODES:
+            raise ValueError(
+                f"SQLite journal mode must be one of {SQLITE_JOURNAL_MODES}"
+            )
+        if self.synchronous not in SQLITE_SYNCHRONOUS_MODES:
+            raise ValueError(
+                f"SQLite synchronous mode must be one of {SQLITE_SYNCHRONOUS_MODES}"
+            )
+        if self.busy_timeout_ms < 0:
+            raise ValueError("SQLite busy timeout must be 0 or greater")
+        for url in self.replica_urls:
+            if not url.startswith("sqlite:///"):
+                raise ValueError("SQLite replica URLs must start with 'sqlite:///'")
+        self.validate_pool()
+        self.validate_replicas()
+        self.validate_query_log()
+
+    @property
+    def in_memory(self) -> bool:
+        """Whether the database lives in memory (and can't use a QueuePool)"""
+        return self.database_url in ("sqlite://", "sqlite:///:memory:")
+
+    @property
+    def pragmas(self) -> dict[str, object]:
+        """PRAGMAs applied to every new connection"""
+        pragmas: dict[str, object] = {
+            "busy_timeout": self.busy_timeout_ms,
+            "synchronous": self.synchronous,
+            "cache_size": self.cache_size,
+            "mmap_size": self.mmap_size,
+        }
+        if not self.in_memory:
+            pragmas = {"journal_mode": self.journal_mode, **pragmas}
+        return pragmas
+
+    def engine_options(self) -> dict:
+        """Keyword arguments for `sqlalchemy.create_engine`"""
+        options: dict = {"connect_args": {"check_same_thread": False}}
+        if not self.in_memory:
+            options.update(super().engine_options())
+        return options
 
     @property
     def url(self) -> str:
@@ -87,6 +301,7 @@ class DBConfigPostgreSQL(DBConfigBase):
     database_name: str = ""
 
     def __init__(self, validate: bool = True) -> None:
+        load_env()
         self.database_pw = os.environ.get("KE_DATABASE_PASSWORD", "")
         self.database_user = os.environ.get("KE_DATABASE_USERNAME", "")
         self.database_host = os.environ.get("KE_DATABASE_HOST", "")
@@ -107,6 +322,12 @@ class DBConfigPostgreSQL(DBConfigBase):
             raise ValueError("Database port is required")
         if not self.database_name:
             raise ValueError("Database name is required")
+        for url in self.replica_urls:
+            if not url.startswith("postgresql"):
+                raise ValueError("PostgreSQL replica URLs must start with 'postgresql'")
+        self.validate_pool()
+        self.validate_replicas()
+        self.validate_query_log()
 
     @property
     def url(self) -> str:
@@ -121,16 +342,71 @@ class APIConfigBase(ABC):
     """API configuration base class"""
 
     static_dir: Path
+    token_index_refresh_seconds: int
+    cache_max_age: int
+    snapshot_max_entries: int
+    snapshot_hot_rows: int
+    logo_concurrency: int
+    logo_max_bytes: int
+    logo_max_pixels: int
+    metrics_enabled: bool
+    admin_api_key: Optional[str]
+    profiling_enabled: bool
+    profile_sample_rate: float
+    profile_history: int
 
     def __init__(self, validate: bool = True) -> None:
+        load_env()
         self.static_dir = (
             Path(os.environ.get("KE_API_STATIC_DIR", "./staticserve"))
             .expanduser()
             .absolute()
         )
-        if not self.static_dir.exists():
-            self.static_dir.mkdir(parents=True, exist_ok=True)
-
+        # Rebuild the token autocomplete index periodically (0 disables) to
+        # pick up tokens written by other processes (eg. the UI or CLI sync)
+        self.token_index_refresh_seconds = int(
+            os.environ.get(
+                "KE_API_TOKEN_INDEX_REFRESH_SECONDS",
+                DEFAULT_TOKEN_INDEX_REFRESH_SECONDS,
+            )
+        )
+        # Cache-Control max-age (seconds) for token read responses
+        self.cache_max_age = int(
+            os.environ.get("KE_API_CACHE_MAX_AGE", DEFAULT_CACHE_MAX_AGE_SECONDS)
+        )
+        # Pre-rendered response snapshots (0 disables), kept for the full
+        # list, list pages within the first N rows and token detail pages
+        self.snapshot_max_entries = int(
+            os.environ.get("KE_API_SNAPSHOT_MAX_ENTRIES", DEFAULT_SNAPSHOT_MAX_ENTRIES)
+        )
+        self.snapshot_hot_rows = int(
+            os.environ.get("KE_API_SNAPSHOT_HOT_ROWS", DEFAULT_SNAPSHOT_HOT_ROWS)
+        )
+        # Logo mirroring: concurrent downloads and the largest image accepted
+        # (file size, and width x height once decoded)
+        self.logo_concurrency = int(
+            os.environ.get("KE_API_LOGO_CONCURRENCY", DEFAULT_LOGO_CONCURRENCY)
+        )
+        self.logo_max_bytes = int(
+            os.environ.get("KE_API_LOGO_MAX_BYTES", DEFAULT_LOGO_MAX_BYTES)
+        )
+        self.logo_max_pixels = int(
+            os.environ.get("KE_API_LOGO_MAX_PIXELS", DEFAULT_LOGO_MAX_PIXELS)
+        )
+        # Request timing middleware and the /metrics endpoint
+        self.metrics_enabled = env_bool("KE_API_METRICS", True)
+        # Admin endpoints and on-demand profiling require this key (unset:
+        # disabled), sent in the X-Admin-Key header
+        self.admin_api_key = os.environ.get("KE_ADMIN_API_KEY") or None
+        # Request profiling middleware: on demand (admins), and a fraction of
+        # requests sampled automatically; the latest profiles are kept
+        self.profiling_enabled = env_bool("KE_API_PROFILING", False)
+        self.profile_sample_rate = float(
+            os.environ.get("KE_API_PROFILE_SAMPLE_RATE", DEFAULT_PROFILE_SAMPLE_RATE)
+        )
+        self.profile_history = int(
+            os.environ.get("KE_API_PROFILE_HISTORY", DEFAULT_PROFILE_HISTORY)
+        )
         if validate:
             self.validate()
 
@@ -139,6 +415,11 @@ class APIConfigBase(ABC):
         """Validate the configuration"""
         raise NotImplementedError("Subclasses must implement this method")
 
+    def ensure_static_dir(self) -> Path:
+        """Create the static directory (if missing)"""
+        self.static_dir.mkdir(parents=True, exist_ok=True)
+        return self.static_dir
+
 
 class FastAPIConfig(APIConfigBase):
     """FastAPI configuration class"""
@@ -146,8 +427,115 @@ class FastAPIConfig(APIConfigBase):
     def validate(self) -> None:
         if not self.static_dir:
             raise ValueError("Static directory is required")
-        if not os.path.isdir(self.static_dir):
-            raise ValueError(f"Static directory does not exist: {self.static_dir}")
+        if self.static_dir.exists() and not self.static_dir.is_dir():
+            raise ValueError(f"Static directory is not a directory: {self.static_dir}")
+        if self.token_index_refresh_seconds < 0:
+            raise ValueError("Token index refresh interval must be 0 or greater")
+        if self.cache_max_age < 0:
+            raise ValueError("Cache max-age must be 0 or greater")
+        if self.snapshot_max_entries < 0:
+            raise ValueError("Snapshot max entries must be 0 or greater")
+        if self.logo_concurrency < 1:
+            raise ValueError("Logo concurrency must be 1 or greater")
+        if self.logo_max_bytes < 1:
+            raise ValueError("Logo max bytes must be 1 or greater")
+        if self.logo_max_pixels < 1:
+            raise ValueError("Logo max pixels must be 1 or greater")
+        if not 0 <= self.profile_sample_rate <= 1:
+            raise ValueError("Profile sample rate must be between 0 and 1")
+        if self.profile_history < 1:
+            raise ValueError("Profile history must be 1 or greater")
+
+
+class UIConfig(ConfigBase):
+    """Streamlit UI configuration class (the UI reads through the API)"""
+
+    api_url: str
+    api_timeout: float
+    api_max_connections: int
+    cache_ttl: int
+    cache_max_entries: int
+    admin_api_key: Optional[str]
+
+    def __init__(self, validate: bool = True) -> None:
+        load_env()
+        self.api_url = os.environ.get("KE_UI_API_URL", DEFAULT_UI_API_URL).rstrip("/")
+        self.api_timeout = float(
+            os.environ.get("KE_UI_API_TIMEOUT", DEFAULT_UI_API_TIMEOUT_SECONDS)
+        )
+        # Pooled keep-alive connections to the API (per UI process)
+        self.api_max_connections = int(
+            os.environ.get("KE_UI_API_MAX_CONNECTIONS", DEFAULT_UI_API_MAX_CONNECTIONS)
+        )
+        # API responses are reused for this long, then revalidated (ETag)
+        self.cache_ttl = int(
+            os.environ.get("KE_UI_CACHE_TTL", DEFAULT_UI_CACHE_TTL_SECONDS)
+        )
+        self.cache_max_entries = int(
+            os.environ.get("KE_UI_CACHE_MAX_ENTRIES", DEFAULT_UI_CACHE_MAX_ENTRIES)
+        )
+        # Sent to the API's admin endpoints (background jobs)
+        self.admin_api_key = (
+            os.environ.get("KE_UI_ADMIN_API_KEY")
+            or os.environ.get("KE_ADMIN_API_KEY")
+            or None
+        )
+        super().__init__(validate)
+
+    def validate(self) -> None:
+        if not self.api_url.startswith(("http://", "https://")):
+            raise ValueError(f"API URL must be http(s): {self.api_url}")
+        if self.api_timeout <= 0:
+            raise ValueError("API timeout must be greater than 0")
+        if self.api_max_connections < 1:
+            raise ValueError("API max connections must be 1 or greater")
+        if self.cache_ttl < 0:
+            raise ValueError("Cache TTL must be 0 or greater")
+        if self.cache_max_entries < 1:
+            raise ValueError("Cache max entries must be 1 or greater")
+
+
+class LogConfig(ConfigBase):
+    """Logging configuration class"""
+
+    level: str
+    levels: dict[str, str]
+    format: str
+    queue: bool
+    queue_size: int
+    sample_rate: int
+
+    def __init__(self, validate: bool = True) -> None:
+        load_env()
+        self.level = os.environ.get("KE_LOG_LEVEL", DEFAULT_LOG_LEVEL).upper()
+        # Per subsystem (logger name) levels: "qrypt.tokens=DEBUG,..."
+        self.levels = {}
+        for item in os.environ.get("KE_LOG_LEVELS", "").split(","):
+            name, _, level = item.partition("=")
+            if name.strip():
+                self.levels[name.strip()] = level.strip().upper()
+        self.format = os.environ.get("KE_LOG_FORMAT", DEFAULT_LOG_FORMAT).lower()
+        # Write records from a background thread (callers never block on I/O)
+        self.queue = env_bool("KE_LOG_QUEUE", True)
+        self.queue_size = int(
+            os.environ.get("KE_LOG_QUEUE_SIZE", DEFAULT_LOG_QUEUE_SIZE)
+        )
+        # Keep 1 in N DEBUG records per call site
+        self.sample_rate = int(
+            os.environ.get("KE_LOG_SAMPLE_RATE", DEFAULT_LOG_SAMPLE_RATE)
+        )
+        super().__init__(validate)
+
+    def validate(self) -> None:
+        for name, level in {"KE_LOG_LEVEL": self.level, **self.levels}.items():
+            if not isinstance(logging.getLevelName(level), int):
+                raise ValueError(f"Invalid log level for {name}: {level}")
+        if self.format not in LOG_FORMATS:
+            raise ValueError(f"Log format must be one of {sorted(LOG_FORMATS)}")
+        if self.queue_size < 1:
+            raise ValueError("Log queue size must be 1 or greater")
+        if self.sample_rate < 1:
+            raise ValueError("Log sample rate must be 1 or greater")
 
 
 class AppConfig:
@@ -158,6 +546,7 @@ class AppConfig:
 
     def __init__(self) -> None:
         """Initialize the application configuration"""
+        load_env()
         if os.environ.get("KE_DATABASE_URL", "").startswith("postgresql"):
             self.db = DBConfigPostgreSQL()
         else:
@@ -5,32 +5,141 @@ Qrypto - Database Module
 
 This module contains the database setup and configuration for the Qrypto application.
 
+Importing it has no side effects: the config, engine and read replica router
+are created (once) on first use, see `get_config` / `get_engine`.
+
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Optional
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+
+from qrypt.core.config import AppConfig, DBConfigPostgreSQL, DBConfigSQLite
+from qrypt.core.log import get_logger
+from qrypt.core.pool import InstrumentedQueuePool, PoolMetrics
+from qrypt.core.queries import instrument_engine
+
+log = get_logger(__name__)
+
+if TYPE_CHECKING:
+    from qrypt.core.replicas import ReplicaRouter
+
+
+@lru_cache(maxsize=1)
+def get_config() -> AppConfig:
+    """The application config (read from the environment on first use)"""
+    config = AppConfig()
+    if not config.db.url:
+        raise ValueError(
+            "Database URL is not set. Please set the KE_DATABASE_URL environment variable."
+        )
+    return config
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: dict[str, object]) -> None:
+    """Apply PRAGMAs to every new SQLite connection of the engine"""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def create_db_engine(
+    db_config: DBConfigSQLite | DBConfigPostgreSQL,
+    url: Optional[str] = None,
+) -> tuple[Engine, PoolMetrics]:
+    """Create a tuned engine (and its pool metrics) for a database config
+
+    `url` overrides the config's database URL (eg. for a read replica).
+    """
+    options = db_config.engine_options()
+    if "pool_size" in options:
+        options["poolclass"] = InstrumentedQueuePool
+
+    engine = create_engine(url or db_config.url, **options)
+    if isinstance(db_config, DBConfigSQLite):
+        apply_sqlite_pragmas(engine, db_config.pragmas)
+
+    metrics = PoolMetrics()
+    metrics.attach(engine)
+    instrument_engine(engine, db_config.slow_query_ms, db_config.slow_query_explain)
+    return engine, metrics
+
+
+@lru_cache(maxsize=1)
+def _primary() -> tuple[Engine, PoolMetrics]:
+    config = get_config()
+    if isinstance(config.db, DBConfigSQLite):
+        log.debug("Using SQLite database.")
+    else:
+        log.debug("Using PostgreSQL database.")
+    return create_db_engine(config.db)
+
+
+def get_engine() -> Engine:
+    """The application (primary) engine, created on first use"""
+    return _primary()[0]
 
-from qrypt.core.config import AppConfig, DBConfigSQLite
-from qrypt.core.log import logger as log
 
-config = AppConfig()
+def get_pool_metrics() -> PoolMetrics:
+    """Connection pool metrics of the application engine"""
+    return _primary()[1]
 
-if not config.db.url:
-    raise ValueError(
-        "Database URL is not set. Please set the KE_DATABASE_URL environment variable."
-    )
 
-# Setup engine
-if isinstance(config.db, DBConfigSQLite):
-    log.debug("Using SQLite database.")
-    engine = create_engine(config.db.url, connect_args={"check_same_thread": False})
-else:
-    log.debug("Using PostgreSQL database.")
-    engine = create_engine(config.db.url)
+def create_replica_router(
+    db_config: DBConfigSQLite | DBConfigPostgreSQL, primary: Engine
+) -> "ReplicaRouter":
+    """Router of read sessions over the configured read replicas"""
+    # pylint: disable=import-outside-toplevel
+    from qrypt.core.replicas import Replica, ReplicaRouter
+
+    replicas = []
+    for url in db_config.replica_urls:
+        replica_engine, metrics = create_db_engine(db_config, url)
+        name = replica_engine.url.render_as_string(hide_password=True)
+        log.debug("Using read replica %s", name)
+        replicas.append(Replica(name=name, engine=replica_engine, metrics=metrics))
+    return ReplicaRouter(primary, replicas)
+
+
+@lru_cache(maxsize=1)
+def get_read_router() -> "ReplicaRouter":
+    """The read replica router, created on first use"""
+    return create_replica_router(get_config().db, get_engine())
+
+
+def reset_engines() -> None:
+    """Dispose the engines and forget the config (read again on next use)
+
+    For processes that switch databases by changing the environment, eg.
+    the benchmarks.
+    """
+    if get_read_router.cache_info().currsize:
+        get_read_router().dispose()
+    if _primary.cache_info().currsize:
+        get_engine().dispose()
+    get_read_router.cache_clear()
+    _primary.cache_clear()
+    get_config.cache_clear()
+
+
+class LazySessionMaker(sessionmaker):
+    """Session factory bound to the application engine on first use"""
+
+    def __call__(self, **local_kw: Any) -> Session:
+        local_kw.setdefault("bind", get_engine())
+        return super().__call__(**local_kw)
+
 
-log.debug("Setting up SQLAlchemy Session + Base.")
 # Session + Base
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = LazySessionMaker(autocommit=False, autoflush=False)
 
 
 class Base(DeclarativeBase):
@@ -47,3 +156,32 @@ def get_db():
     finally:
         log.debug("Closing database session")
         db.close()
+
+
+def read_session(primary: bool = False) -> Session:
+    """A session for reads: on a healthy read replica, unless `primary`"""
+    return SessionLocal(bind=get_engine() if primary else get_read_router().choose())
+
+
+def get_pool_stats() -> dict:
+    """Connection pool metrics for the application engine"""
+    stats = get_pool_metrics().stats(get_engine().pool)
+    read_router = get_read_router()
+    if read_router.replicas:
+        stats["replicas"] = read_router.status()
+    return stats
+
+
+_LAZY_ATTRIBUTES = {
+    "config": get_config,
+    "engine": get_engine,
+    "pool_metrics": get_pool_metrics,
+    "read_router": get_read_router,
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Lazily created module attributes (`engine`, `config`, ...)"""
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
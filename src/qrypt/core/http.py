@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - HTTP Caching Helpers
+
+This module contains helpers for HTTP caching: ETag validators,
+Cache-Control headers and conditional request handling (If-None-Match ->
+304 Not Modified), and static files whose content never changes under a
+name (content addressed) served as immutable.
+
+There is no Last-Modified: a one second HTTP date misses writes within the
+same second, while ETags (tied to the catalog version) change with every
+write.
+"""
+
+from fastapi import Request, Response, status
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Scope
+
+
+def cache_headers(etag: str, max_age: int) -> dict[str, str]:
+    """Build the caching headers for a response"""
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches the ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    """A 304 Not Modified response carrying the caching headers"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files, with the content addressed ones cached for good"""
+
+    def __init__(
+        self, *args, immutable: tuple[str, ...] = (), max_age: int = 0, **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.immutable = tuple(prefix.rstrip("/") + "/" for prefix in immutable)
+        self.max_age = max_age
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304) and path.startswith(self.immutable):
+            response.headers["Cache-Control"] = (
+                f"public, max-age={self.max_age}, immutable"
+            )
+        return response
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Background Jobs
+
+This module runs long operations (a CoinGecko sync) in a background thread,
+so a UI worker submits them and polls for progress instead of blocking.
+
+A job reports its phases (with timings) and rows done against an expected
+total, from which the rows per second and an ETA are derived. Cancellation
+is cooperative: the job function calls ``Job.advance`` / ``Job.check`` and
+a cancelled job raises ``JobCancelled`` at the next call.
+
+Only one job of a name runs at a time (per process): submitting a second
+one returns the running job.
+"""
+
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+from uuid import uuid4
+
+from qrypt.core.log import get_logger
+
+log = get_logger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# Finished jobs kept (per name) for their status
+JOB_HISTORY: int = 5
+
+
+class JobCancelled(Exception):
+    """The job was cancelled"""
+
+
+@dataclass(slots=True)
+class Phase:
+    """A step of a job, and how long it took"""
+
+    name: str
+    started: float
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+
+@dataclass(slots=True)
+class Job:
+    """A background job and its progress"""
+
+    name: str
+    id: str = field(default_factory=lambda: uuid4().hex)
+    state: str = JOB_PENDING
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    phases: list[Phase] = field(default_factory=list)
+    done: int = 0
+    total: Optional[int] = None
+    result: Any = None
+    error: Optional[str] = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _rate_start: Optional[float] = field(default=None, repr=False)
+    _rate_done: int = field(default=0, repr=False)
+
+    @property
+    def running(self) -> bool:
+        return self.state in (JOB_PENDING, JOB_RUNNING)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation was requested"""
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """Request cancellation (at the job's next progress report)"""
+        self._cancel.set()
+
+    def check(self) -> None:
+        """Raise ``JobCancelled`` if cancellation was requested"""
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Phase]:
+        """Time a step of the job"""
+        self.check()
+        phase = Phase(name, time.time())
+        self.phases.append(phase)
+        try:
+            yield phase
+        finally:
+            phase.finished = time.time()
+
+    def expect(self, total: int) -> None:
+        """Set the number of rows to process (and restart the rate)"""
+        self.total = total
+        self.done = 0
+        self._rate_start = time.time()
+        self._rate_done = 0
+
+    def advance(self, rows: int = 1) -> None:
+        """Record processed rows (raises ``JobCancelled`` if cancelled)"""
+        self.check()
+        if self._rate_start is None:
+            self._rate_start = time.time()
+        self.done += rows
+        self._rate_done += rows
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        if self._rate_start is None or not self._rate_done:
+            return None
+        elapsed = time.time() - self._rate_start
+        return self._rate_done / elapsed if elapsed > 0 else None
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Seconds until all expected rows are processed"""
+        rate = self.rows_per_second
+        if self.total is None or not rate or not self.running:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def status(self) -> dict:
+        """Progress snapshot"""
+        rate = self.rows_per_second
+        eta = self.eta_seconds
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "cancel_requested": self.cancelled,
+            "phase": self.phases[-1].name if self.phases else None,
+            "phases": {p.name: round(p.seconds, 3) for p in self.phases},
+            "done": self.done,
+            "total": self.total,
+            "rows_per_second": round(rate, 1) if rate else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs jobs in background threads, one at a time per name"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._jobs: dict[str, list[Job]] = {}
+
+    def submit(self, name: str, target: Callable[[Job], Any]) -> tuple[Job, bool]:
+        """Start `target(job)` in the background
+
+        Returns the job and whether it was started: if a job of the same
+        name is still running, that job is returned instead.
+        """
+        with self._lock:
+            current = self.current(name)
+            if current is not None and current.running:
+                return current, False
+            job = Job(name)
+            history = self._jobs.setdefault(name, [])
+            history.append(job)
+            del history[:-JOB_HISTORY]
+
+        thread = threading.Thread(
+            target=self._run, args=(job, target), name=f"job-{name}", daemon=True
+        )
+        thread.start()
+        return job, True
+
+    def _run(self, job: Job, target: Callable[[Job], Any]) -> None:
+        job.state = JOB_RUNNING
+        job.started = time.time()
+        log.info("Job %s (%s) started", job.name, job.id)
+        try:
+            job.result = target(job)
+        except JobCancelled:
+            job.state = JOB_CANCELLED
+            log.info("Job %s (%s) cancelled", job.name, job.id)
+        except Exception as e:  # pylint: disable=broad-except
+            job.state = JOB_FAILED
+            job.error = f"{type(e).__name__}: {e}"
+            log.error(
+                "Job %s (%s) failed\n%s", job.name, job.id, traceback.format_exc()
+            )
+        else:
+            job.state = JOB_SUCCEEDED
+            log.info("Job %s (%s) finished in %.1fs", job.name, job.id, job.elapsed)
+        finally:
+            job.finished = time.time()
+
+    def current(self, name: str) -> Optional[Job]:
+        """The latest job of a name"""
+        history = self._jobs.get(name)
+        return history[-1] if history else None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        for history in list(self._jobs.values()):
+            for job in history:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def cancel(self, name: str) -> bool:
+        """Request cancellation of the running job of a name"""
+        job = self.current(name)
+        if job is None or not job.running:
+            return False
+        job.cancel()
+        return True
+
+
+jobs = JobManager()
@@ -1,14 +1,173 @@
 # -*- coding: utf-8 -*-
 
 """
-Qrypto - CoinGecko Service - Core: Logging
+Qrypto - Core: Logging
+
+Every module logs to its own logger (``get_logger(__name__)``) under the
+``qrypt`` logger, so levels are set per subsystem, eg.:
+
+    KE_LOG_LEVEL=INFO
+    KE_LOG_LEVELS=qrypt.tokens.services=DEBUG,sqlalchemy.engine=INFO
+
+Nothing is configured on import: the entry points (the API app, the UI and
+the command line tools) call ``configure_logging``, which:
+
+* formats records as text or JSON lines (``KE_LOG_FORMAT``)
+* writes them from a background thread: callers only put the record on a
+  bounded queue, which drops records rather than block when it is full
+  (``KE_LOG_QUEUE``, ``KE_LOG_QUEUE_SIZE``)
+* keeps 1 in N DEBUG records per call site (``KE_LOG_SAMPLE_RATE``), for
+  high-frequency events
+
+Hot paths guard multi-line debug output with
+``log.isEnabledFor(logging.DEBUG)``.
 """
 
+import atexit
+import copy
+import json
 import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(name)s - %(levelname)s - %(message)s",
-)
+from qrypt.core.config import LogConfig
+
+TEXT_FORMAT: str = "%(asctime)s %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord attributes (anything else on a record was passed in `extra`)
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None))
+) | {"message", "asctime", "taskName"}
 
 logger = logging.getLogger("qrypt")
+
+
+def get_logger(name: str) -> logging.Logger:
+    """The logger of a module (``qrypt.*`` names inherit the qrypt level)"""
+    return logging.getLogger(name)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with `extra` fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in `rate` records per call site, up to `level`"""
+
+    def __init__(self, rate: int, level: int = logging.DEBUG) -> None:
+        super().__init__()
+        self.rate = rate
+        self.level = level
+        # Call site -> records seen (racy increments only skew the sample)
+        self._seen: dict[tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+        site = (record.pathname, record.lineno)
+        seen = self._seen.get(site, 0)
+        self._seen[site] = seen + 1
+        return seen % self.rate == 0
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the writer thread; drops them when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue is in-process: only merge the arguments (they may change
+        # after the call), formatting happens on the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+
+
+def stop_logging() -> None:
+    """Flush the queued records and remove the handler"""
+    global _handler, _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        if _handler is not None:
+            logging.getLogger().removeHandler(_handler)
+            _handler = None
+
+
+def configure_logging(
+    config: Optional[LogConfig] = None, force: bool = False
+) -> logging.Handler:
+    """Set up the log levels and handler (once, unless forced)
+
+    Returns the handler records are submitted to.
+    """
+    global _handler, _listener
+    if _handler is not None and not force:
+        return _handler
+    stop_logging()
+    config = config or LogConfig()
+
+    output = logging.StreamHandler()
+    if config.format == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    with _lock:
+        if config.queue:
+            handler: logging.Handler = DroppingQueueHandler(
+                queue.Queue(config.queue_size)
+            )
+            _listener = QueueListener(handler.queue, output)
+            _listener.start()
+        else:
+            handler = output
+        if config.sample_rate > 1:
+            handler.addFilter(SamplingFilter(config.sample_rate))
+
+        # Third party libraries only speak up on warnings, unless configured
+        root = logging.getLogger()
+        root.setLevel(logging.WARNING)
+        root.addHandler(handler)
+        logger.setLevel(config.level)
+        for name, level in config.levels.items():
+            logging.getLogger(name).setLevel(level)
+        _handler = handler
+    return handler
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Metrics
+
+This module contains the performance telemetry of the application, exposed
+at ``/metrics`` in the Prometheus text format:
+
+* HTTP requests: count by route and status, latency histogram by route and
+  requests in flight (``MetricsMiddleware``)
+* Database queries: count and duration histogram by statement type
+  (recorded by ``qrypt.core.queries``)
+* CoinGecko API calls: latency histogram by endpoint and status, and the
+  response cache hits / misses / expirations
+
+Counters and histograms are sharded per thread: a thread only ever writes
+its own shard, so recording takes no lock; a scrape sums the shards.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Iterable, Iterator, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets (seconds)
+HTTP_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+DB_BUCKETS: tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    1.0,
+)
+UPSTREAM_BUCKETS: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+type Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Sharded:
+    """Per-thread shards of a metric's values"""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: dict = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshots(self) -> list[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic: the owning thread may be writing meanwhile
+        return [shard.copy() for shard in shards]
+
+    def clear(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Metric(_Sharded):
+    """A named metric family with labels"""
+
+    kind: str = ""
+
+    def __init__(self, name: str, documentation: str, labels: Labels = ()) -> None:
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError("Subclasses must implement this method")
+
+
+class Counter(Metric):
+    """A monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> dict[Labels, float]:
+        totals: dict[Labels, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.values().items()):
+            yield (
+                f"{self.name}{_format_labels(self.labels, labels)} "
+                f"{_format_value(value)}"
+            )
+
+
+class Gauge(Counter):
+    """A value that goes up and down (eg. requests in flight)"""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Labels = (),
+        buckets: Iterable[float] = HTTP_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        # [count per bucket..., count above the last bucket, sum]
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def values(self) -> dict[Labels, list]:
+        totals: dict[Labels, list] = {}
+        for shard in self._snapshots():
+            for labels, cells in shard.items():
+                total = totals.setdefault(labels, [0] * len(cells[:-1]) + [0.0])
+                for i, value in enumerate(cells):
+                    total[i] += value
+        return totals
+
+    def samples(self) -> Iterator[str]:
+        for labels, cells in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), cells[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labels, labels, le)} "
+                    f"{cumulative}"
+                )
+            label_text = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(cells[-1])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Registry:
+    """The metrics of the process"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register[M: Metric](self, metric: M) -> M:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Labels = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Labels = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Labels = (),
+        buckets: Iterable[float] = HTTP_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: list[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Reset every metric (tests)"""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "qrypt_http_requests_total",
+    "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+http_duration = registry.histogram(
+    "qrypt_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route"),
+)
+http_in_flight = registry.gauge(
+    "qrypt_http_requests_in_flight", "HTTP requests being handled"
+)
+db_queries = registry.counter(
+    "qrypt_db_queries_total", "Database queries by statement type", ("statement",)
+)
+db_duration = registry.histogram(
+    "qrypt_db_query_duration_seconds",
+    "Database query duration by statement type",
+    ("statement",),
+    DB_BUCKETS,
+)
+upstream_duration = registry.histogram(
+    "qrypt_coingecko_request_duration_seconds",
+    "CoinGecko API call latency by endpoint and status",
+    ("endpoint", "status"),
+    UPSTREAM_BUCKETS,
+)
+upstream_cache = registry.counter(
+    "qrypt_coingecko_cache_total",
+    "CoinGecko response cache lookups by key and result"
+    " (hit, miss, expired, revalidated, stale)",
+    ("key", "result"),
+)
+upstream_bytes = registry.counter(
+    "qrypt_coingecko_response_bytes_total",
+    "CoinGecko response body bytes by endpoint, on the wire and decoded",
+    ("endpoint", "kind"),
+)
+upstream_bytes_saved = registry.counter(
+    "qrypt_coingecko_bytes_saved_total",
+    "CoinGecko response bytes not downloaded, by endpoint and reason"
+    " (compression, not_modified)",
+    ("endpoint", "reason"),
+)
+
+
+def route_label(scope: Scope) -> str:
+    """The route template of a request (not its path: bounded cardinality)"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    # Mounted apps (eg. /static) set the root path
+    return scope.get("root_path") or "unmatched"
+
+
+# The request being handled (for the query log: which route ran a query)
+request_scope: ContextVar[Optional[Scope]] = ContextVar(
+    "qrypt_request_scope", default=None
+)
+
+
+def current_route() -> Optional[str]:
+    """Method and route template of the request being handled (if any)"""
+    scope = request_scope.get()
+    if scope is None:
+        return None
+    return f"{scope['method']} {route_label(scope)}"
+
+
+class MetricsMiddleware:
+    """Counts and times HTTP requests (pure ASGI: no per-request tasks)"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_in_flight.inc()
+        token = request_scope.set(scope)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_scope.reset(token)
+            http_in_flight.dec()
+            method, route = scope["method"], route_label(scope)
+            http_requests.inc(method, route, status)
+            http_duration.observe(elapsed, method, route)
@@ -2,23 +2,35 @@
 
 """
 Qrypto - Database Management Functions
+
+The schema is managed with Alembic migrations (see `qrypt/migrations`);
+`init_db` brings a database up to the latest revision.
 """
 
+from pathlib import Path
 from typing import Optional
 
-from sqlalchemy import inspect
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import Connection, inspect, text
 
-from qrypt.core.db import Base, engine
-from qrypt.core.log import logger as log
+from qrypt.core.db import Base, get_engine
+from qrypt.core.log import configure_logging, get_logger
 from qrypt.tokens.models import Token  # noqa pylint: disable=unused-import
 from qrypt.users.models import User  # noqa pylint: disable=unused-import
 
+log = get_logger(__name__)
+
 TARGET_TABLES: set = {"tokens", "users"}
+MIGRATIONS_DIR: Path = Path(__file__).resolve().parents[2] / "migrations"
+# The revision matching the schema `create_all` used to produce
+BASELINE_REVISION: str = "0001"
+VERSION_TABLE: str = "alembic_version"
 
 
 def check_tables(tables: set = TARGET_TABLES) -> Optional[set]:
     """Check if the required tables exist in the database"""
-    inspector = inspect(engine)
+    inspector = inspect(get_engine())
     db_tables = set(inspector.get_table_names())
     if not tables.issubset(db_tables):
         log.warning("Missing tables in the database: %s", tables - db_tables)
@@ -26,23 +38,48 @@ def check_tables(tables: set = TARGET_TABLES) -> Optional[set]:
     return db_tables
 
 
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+    """Alembic config for the application migrations"""
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_db(connection: Connection, revision: str = "head") -> None:
+    """Migrate the database (on a connection) to a revision"""
+    config = alembic_config(connection)
+    db_tables = set(inspect(connection).get_table_names())
+    # Let the migrations manage their own transactions (Postgres builds the
+    # indexes concurrently, outside of a transaction)
+    connection.commit()
+    if VERSION_TABLE not in db_tables and TARGET_TABLES.issubset(db_tables):
+        # Created with `create_all` before migrations existed
+        log.info("Stamping existing database at revision %s", BASELINE_REVISION)
+        command.stamp(config, BASELINE_REVISION)
+        connection.commit()
+    command.upgrade(config, revision)
+    connection.commit()
+
+
 def init_db() -> None:
     """Initialize the database"""
-    # Import all models here to ensure they are registered with SQLAlchemy
-    # from qrypt.tokens.models import Token  # noqa: F401
-    # from qrypt.users.models import User  # noqa: F401
-
-    # Create the database tables
+    configure_logging()
     log.debug("Initializing Database...")
-    Base.metadata.create_all(bind=engine)
+    with get_engine().connect() as connection:
+        upgrade_db(connection)
     check_tables()
     log.debug("Database initialized successfully.")
 
 
 def drop_db() -> None:
     """Drop the database tables"""
+    configure_logging()
     log.debug("Dropping Database...")
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=get_engine())
+    with get_engine().begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {VERSION_TABLE}"))
     try:
         tables = check_tables()
     except RuntimeError:
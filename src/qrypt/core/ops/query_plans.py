@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Query Plan Checks
+
+A small benchmark of the key token queries on a seeded dataset. Every query
+must be answered with an index (checked with EXPLAIN) - a sequential scan
+means a migration is missing or an index is not usable by the query.
+
+Run it against a scratch database (it seeds one when the catalog is empty):
+
+    check_query_plans                          # temporary SQLite database
+    check_query_plans --url postgresql://...   # empty PostgreSQL database
+"""
+
+import argparse
+import re
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import (
+    Connection,
+    Select,
+    create_engine,
+    func,
+    insert,
+    select,
+    text,
+)
+
+from qrypt.core.log import configure_logging, get_logger
+from qrypt.core.ops.db import upgrade_db
+from qrypt.tokens.models import BlockchainPlatform, Token
+
+log = get_logger(__name__)
+
+DEFAULT_SEED_TOKENS: int = 5000
+PLATFORMS_PER_TOKEN: int = 2
+DEFAULT_REPEAT: int = 20
+SEED_CHUNK: int = 1000
+
+SQLITE_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+POSTGRES_INDEX_SCANS: set = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+@dataclass(frozen=True, slots=True)
+class KeyQuery:
+    """A query that must be answered with an index"""
+
+    name: str
+    index: str
+    build: Callable[[], Select]
+
+
+# Only queries the application runs. Its name search (``ILIKE '%q%'``)
+# cannot use an index, so it is not one of them.
+KEY_QUERIES: tuple[KeyQuery, ...] = (
+    KeyQuery(
+        "platforms_by_token",
+        "ix_blockchain_platforms_token_id",
+        lambda: select(BlockchainPlatform).where(
+            BlockchainPlatform.token_id.in_([11, 22, 33])
+        ),
+    ),
+    KeyQuery(
+        "token_by_address",
+        "ix_blockchain_platforms_address",
+        lambda: select(BlockchainPlatform.token_id).where(
+            BlockchainPlatform.address == f"0x{42:040x}"
+        ),
+    ),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class PlanResult:
+    """The plan (and timing) of a key query"""
+
+    name: str
+    index: str
+    indexes_used: tuple[str, ...]
+    plan: str
+    avg_ms: float
+
+    @property
+    def ok(self) -> bool:
+        return self.index in self.indexes_used
+
+
+def seed_tokens(connection: Connection, count: int = DEFAULT_SEED_TOKENS) -> None:
+    """Insert `count` synthetic tokens (with platforms) and refresh statistics"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for start in range(0, count, SEED_CHUNK):
+        ids = range(start + 1, min(start + SEED_CHUNK, count) + 1)
+        connection.execute(
+            insert(Token),
+            [
+                {
+                    "id": i,
+                    "ext_id": f"token-{i}",
+                    "symbol": f"T{i}",
+                    "name": f"Token {i}",
+                    "last_updated": now - timedelta(minutes=i),
+                }
+                for i in ids
+            ],
+        )
+        connection.execute(
+            insert(BlockchainPlatform),
+            [
+                {
+                    "name": f"chain-{p}",
+                    "address": f"0x{i * PLATFORMS_PER_TOKEN + p:040x}",
+                    "token_id": i,
+                    "last_updated": now,
+                }
+                for i in ids
+                for p in range(PLATFORMS_PER_TOKEN)
+            ],
+        )
+    connection.commit()
+    connection.execute(text("ANALYZE"))
+    connection.commit()
+
+
+def _walk_postgres_plan(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _walk_postgres_plan(child)
+
+
+def explain(connection: Connection, query: Select) -> tuple[tuple[str, ...], str]:
+    """The indexes a query uses (and its plan, as text)"""
+    dialect = connection.dialect
+    sql = str(query.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+        nodes = list(_walk_postgres_plan(plan[0]["Plan"]))
+        used = tuple(
+            node["Index Name"]
+            for node in nodes
+            if node.get("Node Type") in POSTGRES_INDEX_SCANS
+        )
+        lines = [
+            f"{node['Node Type']} {node.get('Index Name', node.get('Relation Name', ''))}"
+            for node in nodes
+        ]
+        return used, "; ".join(lines)
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    details = [row[-1] for row in rows]
+    used = tuple(m.group(1) for d in details for m in SQLITE_INDEX.finditer(d))
+    return used, "; ".join(details)
+
+
+def check_query_plans(
+    connection: Connection, repeat: int = DEFAULT_REPEAT
+) -> list[PlanResult]:
+    """EXPLAIN and time the key queries"""
+    results = []
+    for key_query in KEY_QUERIES:
+        query = key_query.build()
+        used, plan = explain(connection, query)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            connection.execute(query).all()
+        avg_ms = (time.perf_counter() - start) * 1000 / max(repeat, 1)
+        results.append(
+            PlanResult(key_query.name, key_query.index, used, plan, round(avg_ms, 3))
+        )
+    return results
+
+
+def run(
+    url: Optional[str] = None,
+    rows: int = DEFAULT_SEED_TOKENS,
+    repeat: int = DEFAULT_REPEAT,
+) -> list[PlanResult]:
+    """Migrate and seed a scratch database, then check the key query plans"""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = url or f"sqlite:///{Path(tmp) / 'query_plans.db'}"
+        engine = create_engine(url)
+        try:
+            with engine.connect() as connection:
+                upgrade_db(connection)
+                count = connection.execute(select(func.count(Token.id))).scalar_one()
+                if count:
+                    log.info("Catalog has %s tokens, not seeding", count)
+                else:
+                    log.info("Seeding %s tokens", rows)
+                    seed_tokens(connection, rows)
+                return check_query_plans(connection, repeat)
+        finally:
+            engine.dispose()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="scratch database (default: temporary SQLite)")
+    parser.add_argument("--rows", type=int, default=DEFAULT_SEED_TOKENS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    results = run(args.url, args.rows, args.repeat)
+    for result in results:
+        status = "ok" if result.ok else "NO INDEX"
+        print(f"{result.name:<20} {status:<9} {result.avg_ms:>9.3f} ms  {result.plan}")
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Database Connection Pool Metrics
+
+This module contains the connection pool instrumentation: how long callers
+wait to check out a connection, how many connections are in use (and the
+peak), and how often checkouts time out.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class PoolMetrics:
+    """Connection pool counters for one engine"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        """Record the time a caller waited for a connection"""
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_connect(self, *_args) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, *_args) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self, *_args) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def on_invalidate(self, *_args) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def attach(self, engine: Engine) -> None:
+        """Listen to the engine's pool events"""
+        event.listen(engine, "connect", self.on_connect)
+        event.listen(engine, "checkout", self.on_checkout)
+        event.listen(engine, "checkin", self.on_checkin)
+        event.listen(engine, "invalidate", self.on_invalidate)
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.metrics = self
+
+    def stats(self, pool: Optional[Pool] = None) -> dict:
+        """Snapshot of the counters (and the pool's capacity, if known)"""
+        with self._lock:
+            stats: dict = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_count": self.wait_count,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+                "wait_seconds_avg": round(
+                    self.wait_total / self.wait_count if self.wait_count else 0.0, 6
+                ),
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update(
+                {
+                    "pool": pool.__class__.__name__,
+                    "size": pool.size(),
+                    "max_overflow": pool._max_overflow,
+                    "capacity": capacity,
+                    "utilization": (
+                        round(stats["checked_out"] / capacity, 4) if capacity else None
+                    ),
+                    "status": pool.status(),
+                }
+            )
+        elif pool is not None:
+            stats.update({"pool": pool.__class__.__name__, "status": pool.status()})
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long checkouts wait for a connection"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        if self.metrics is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> QueuePool:
+        pool = super().recreate()
+        if isinstance(pool, InstrumentedQueuePool):
+            pool.metrics = self.metrics
+        return pool
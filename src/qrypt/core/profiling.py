@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Request Profiling
+
+This module profiles single API requests in production, without a redeploy
+(``KE_API_PROFILING``):
+
+* on demand: an admin (``X-Admin-Key``) adds ``X-Profile: 1`` or
+  ``?profile=1`` for a deterministic profile (cProfile), or ``sample`` for a
+  sampling one (stacks of every thread, every millisecond)
+* automatically: a fraction of requests is profiled with cProfile
+  (``KE_API_PROFILE_SAMPLE_RATE``)
+
+Profiled responses carry an ``X-Profile-Id`` header. The latest profiles
+(``KE_API_PROFILE_HISTORY``) are kept in memory and served at
+``/api/v1/system/profiles/<id>``: as text, as a pstats file (snakeviz,
+``python -m pstats``) or as a speedscope file.
+
+One request is profiled at a time, and both profilers see the whole process:
+concurrent requests show up in a profile.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional, Union
+from urllib.parse import parse_qs
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from qrypt.core.auth import ADMIN_KEY_HEADER, admin_key_matches
+from qrypt.core.log import get_logger
+from qrypt.core.metrics import route_label
+
+log = get_logger(__name__)
+
+PROFILE_HEADER: str = "x-profile"
+PROFILE_QUERY: str = "profile"
+PROFILE_ID_HEADER: str = "x-profile-id"
+
+PROFILE_CPROFILE: str = "cprofile"
+PROFILE_SAMPLE: str = "sample"
+# Values of the header / query flag, by profiler
+PROFILE_FLAGS: dict[str, str] = {
+    "1": PROFILE_CPROFILE,
+    "true": PROFILE_CPROFILE,
+    PROFILE_CPROFILE: PROFILE_CPROFILE,
+    PROFILE_SAMPLE: PROFILE_SAMPLE,
+}
+
+SAMPLE_INTERVAL_SECONDS: float = 0.001
+TEXT_FUNCTIONS: int = 40
+DEFAULT_PROFILE_HISTORY: int = 20
+
+SPEEDSCOPE_SCHEMA: str = "https://www.speedscope.app/file-format-schema.json"
+
+
+class StackSampler:
+    """Samples the stacks of every thread (but its own) at an interval"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS) -> None:
+        self.interval = interval
+        self.frames: list[tuple[str, str, int]] = []
+        self._frame_ids: dict[tuple[str, str, int], int] = {}
+        # Thread name -> (stack of frame ids, root first; weight in seconds)
+        self.samples: dict[str, list[tuple[tuple[int, ...], float]]] = {}
+        self.seconds = 0.0
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append(key)
+        return frame_id
+
+    def _sample(self, weight: float) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            name = names.get(ident, str(ident))
+            self.samples.setdefault(name, []).append((tuple(reversed(stack)), weight))
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self._sample(now - last)
+            last = now
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+
+
+Profiler = Union[cProfile.Profile, StackSampler]
+
+
+@dataclass(slots=True)
+class RequestProfile:
+    """A profiled request"""
+
+    method: str
+    path: str
+    kind: str
+    trigger: str
+    profiler: Profiler = field(repr=False)
+    id: str = field(default_factory=lambda: uuid4().hex[:16])
+    started: float = field(default_factory=time.time)
+    route: Optional[str] = None
+    status: Optional[int] = None
+    seconds: float = 0.0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "kind": self.kind,
+            "trigger": self.trigger,
+            "started": self.started,
+            "seconds": round(self.seconds, 6),
+        }
+
+    def text(self, limit: int = TEXT_FUNCTIONS) -> str:
+        """The top functions (by cumulative time, or by samples)"""
+        header = f"{self.method} {self.path} -> {self.status} in {self.seconds:.3f}s\n"
+        if isinstance(self.profiler, cProfile.Profile):
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=stream)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+            return header + stream.getvalue()
+
+        # Samples a function is on the stack of (inclusive), in seconds
+        inclusive: dict[int, float] = {}
+        for samples in self.profiler.samples.values():
+            for stack, weight in samples:
+                for frame_id in set(stack):
+                    inclusive[frame_id] = inclusive.get(frame_id, 0.0) + weight
+        lines = [header, "  seconds  function"]
+        for frame_id, seconds in sorted(inclusive.items(), key=lambda i: -i[1])[:limit]:
+            name, filename, line = self.profiler.frames[frame_id]
+            lines.append(f"{seconds:9.4f}  {name} ({filename}:{line})")
+        return "\n".join(lines) + "\n"
+
+    def pstats(self) -> bytes:
+        """The profile as a pstats file (cProfile profiles only)"""
+        if not isinstance(self.profiler, cProfile.Profile):
+            raise ValueError("Only cProfile profiles have pstats")
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def speedscope(self) -> dict[str, Any]:
+        """The profile in the speedscope format (sampled profiles only)"""
+        if not isinstance(self.profiler, StackSampler):
+            raise ValueError("Only sampled profiles have a speedscope format")
+        sampler = self.profiler
+        profiles = [
+            {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weight for _, weight in samples),
+                "samples": [list(stack) for stack, _ in samples],
+                "weights": [weight for _, weight in samples],
+            }
+            for thread, samples in sampler.samples.items()
+        ]
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": f"{self.method} {self.path}",
+            "exporter": "qrypt",
+            "shared": {
+                "frames": [
+                    {"name": name, "file": filename, "line": line}
+                    for name, filename, line in sampler.frames
+                ]
+            },
+            "profiles": profiles,
+        }
+
+
+class ProfileStore:
+    """The latest request profiles (thread safe)"""
+
+    def __init__(self, history: int = DEFAULT_PROFILE_HISTORY) -> None:
+        self._profiles: deque[RequestProfile] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def resize(self, history: int) -> None:
+        with self._lock:
+            self._profiles = deque(self._profiles, maxlen=history)
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def list(self) -> list[dict[str, Any]]:
+        """Summaries, latest first"""
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+def _start(kind: str) -> Profiler:
+    if kind == PROFILE_SAMPLE:
+        profiler: Profiler = StackSampler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop(profiler: Profiler) -> None:
+    if isinstance(profiler, StackSampler):
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+class ProfilingMiddleware:
+    """Profiles requests asked for by admins, and a sample of the others"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        admin_key: Optional[str] = None,
+        sample_rate: float = 0.0,
+        store: ProfileStore = profile_store,
+    ) -> None:
+        self.app = app
+        self.admin_key = admin_key
+        self.sample_rate = sample_rate
+        self.store = store
+        # One profile at a time (cProfile is process wide)
+        self._busy = threading.Lock()
+
+    def requested(self, scope: Scope) -> Optional[str]:
+        """The profiler an admin asked for (if any)"""
+        headers = dict(scope["headers"])
+        flag = headers.get(PROFILE_HEADER.encode(), b"").decode("latin-1")
+        if not flag and PROFILE_QUERY.encode() in scope["query_string"]:
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            flag = query.get(PROFILE_QUERY, [""])[-1]
+        kind = PROFILE_FLAGS.get(flag.lower())
+        if kind is None:
+            return None
+        key = headers.get(ADMIN_KEY_HEADER.lower().encode(), b"").decode("latin-1")
+        if not admin_key_matches(key, self.admin_key):
+            log.warning("Profiling refused: missing or invalid admin key")
+            return None
+        return kind
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        kind, trigger = self.requested(scope), "requested"
+        if kind is None and self.sample_rate and random.random() < self.sample_rate:
+            kind, trigger = PROFILE_CPROFILE, "sampled"
+        if kind is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profiler = _start(kind)
+        except ValueError as e:
+            # Eg. another profiler (a debugger, coverage) is active
+            self._busy.release()
+            log.warning("Could not profile %s: %s", scope["path"], e)
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            scope["method"], scope["path"], kind, trigger, profiler=profiler
+        )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (PROFILE_ID_HEADER.encode(), profile.id.encode()),
+                ]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.seconds = time.perf_counter() - start
+            _stop(profiler)
+            self._busy.release()
+
+        profile.route = route_label(scope)
+        self.store.add(profile)
+        log.info(
+            "Profiled %s %s (%s, %s): %s",
+            profile.method,
+            profile.path,
+            kind,
+            trigger,
+            profile.id,
+        )
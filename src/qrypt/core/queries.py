@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Query Log
+
+This module instruments the SQLAlchemy engines (cursor events):
+
+* query counts and durations by statement type, at ``/metrics``
+* statistics per statement fingerprint (the SQL with its literals and
+  parameters normalized) and the routes that ran it: the slowest and most
+  frequent statements since startup are at ``GET /api/v1/system/queries``
+* a warning for every query slower than ``KE_DATABASE_SLOW_QUERY_MS``, with
+  its plan when ``KE_DATABASE_SLOW_QUERY_EXPLAIN`` is set
+
+Row counts are the driver's cursor row count: DML statements everywhere,
+SELECTs on PostgreSQL only (SQLite does not count them).
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
+
+from sqlalchemy import Engine, event
+
+from qrypt.core.log import get_logger
+from qrypt.core.metrics import current_route, db_duration, db_queries
+
+log = get_logger(__name__)
+
+# Statements tracked (new fingerprints are counted, not tracked, beyond it)
+QUERY_LOG_MAX_STATEMENTS: int = 1000
+# Routes kept per statement
+QUERY_ROUTES: int = 5
+DEFAULT_TOP: int = 20
+NO_ROUTE: str = "-"
+
+EXPLAIN_PREFIXES: dict[str, str] = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|\?|(?<!:):\w+|\$\d+")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_LIST = re.compile(r"\(\?(?:, \?)+\)")
+_ROWS = re.compile(r"(\(\?\.\.\.\))(?:, \(\?(?:\.\.\.)?\))+")
+
+
+def statement_label(statement: str) -> str:
+    """The type of an SQL statement (SELECT, INSERT, ...)"""
+    word = statement.lstrip(" \n\t(").split(None, 1)
+    return word[0].upper() if word else "OTHER"
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """The statement with literals, parameters and lists normalized
+
+    ``WHERE id IN (?, ?, ?)`` and ``WHERE id IN (?, ?)`` share a fingerprint,
+    as do the multi-row VALUES of batched inserts.
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _PARAMETER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _SPACE.sub(" ", sql).strip()
+    sql = _LIST.sub("(?...)", sql)
+    return _ROWS.sub(r"\1, ...", sql)
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """Aggregated executions of a statement fingerprint"""
+
+    fingerprint: str
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    slow: int = 0
+    routes: dict[str, int] = field(default_factory=dict)
+    plan: Optional[str] = None
+
+    def add(self, seconds: float, rows: Optional[int], route: str, slow: bool):
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows or 0
+        self.slow += slow
+        if route in self.routes or len(self.routes) < QUERY_ROUTES:
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.seconds * 1000, 3),
+            "mean_ms": round(self.seconds * 1000 / self.count, 3),
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "rows": self.rows,
+            "slow": self.slow,
+            "routes": dict(sorted(self.routes.items(), key=lambda item: -item[1])),
+            "plan": self.plan,
+        }
+
+
+class QueryLog:
+    """Statistics of the statements run since startup (thread safe)"""
+
+    def __init__(self, max_statements: int = QUERY_LOG_MAX_STATEMENTS) -> None:
+        self.max_statements = max_statements
+        self._stats: dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+        self.since = time.time()
+        self.untracked = 0
+
+    def record(
+        self,
+        statement: str,
+        seconds: float,
+        rows: Optional[int] = None,
+        route: Optional[str] = None,
+        slow: bool = False,
+    ) -> Optional[QueryStats]:
+        """Add an execution, returns the statement's stats (if tracked)"""
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_statements:
+                    self.untracked += 1
+                    return None
+                stats = self._stats[key] = QueryStats(key)
+            stats.add(seconds, rows, route or NO_ROUTE, slow)
+        return stats
+
+    def top(self, limit: int = DEFAULT_TOP) -> dict[str, Any]:
+        """The slowest (by max duration) and most frequent statements"""
+        with self._lock:
+            stats = [s.as_dict() for s in self._stats.values()]
+            untracked = self.untracked
+        return {
+            "since": self.since,
+            "statements": len(stats),
+            "untracked": untracked,
+            "slowest": sorted(stats, key=lambda s: -s["max_ms"])[:limit],
+            "frequent": sorted(stats, key=lambda s: -s["count"])[:limit],
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.untracked = 0
+            self.since = time.time()
+
+
+query_log = QueryLog()
+
+
+# EXPLAIN runs in the request's transaction: in a savepoint, so that a failed
+# EXPLAIN (which aborts a PostgreSQL transaction) is rolled back on its own
+_EXPLAIN_SAVEPOINT = "qrypt_explain"
+
+
+def explain_statement(cursor, dialect: str, statement: str, parameters) -> str:
+    """The plan of a statement, run again with EXPLAIN on its connection"""
+    explain = cursor.connection.cursor()
+    try:
+        explain.execute(f"SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+        try:
+            explain.execute(EXPLAIN_PREFIXES[dialect] + statement, parameters)
+            plan = "; ".join(str(row[-1]) for row in explain.fetchall())
+        except Exception:
+            explain.execute(f"ROLLBACK TO SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+            raise
+        finally:
+            explain.execute(f"RELEASE SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+        return plan
+    finally:
+        explain.close()
+
+
+# Queries on a connection run one at a time: one start time per connection
+_QUERY_START = "qrypt_query_start"
+
+
+def instrument_engine(
+    engine: Engine, slow_query_ms: Optional[float] = None, explain: bool = False
+) -> None:
+    """Count, time and log the engine's queries
+
+    Queries taking `slow_query_ms` or more are logged (and EXPLAINed when
+    `explain` is set); None or 0 disables the slow query log.
+    """
+    threshold = slow_query_ms / 1000 if slow_query_ms else None
+    explain = explain and engine.dialect.name in EXPLAIN_PREFIXES
+
+    def before_cursor_execute(conn, _cursor, _statement, *_args) -> None:
+        conn.info[_QUERY_START] = time.perf_counter()
+
+    def after_cursor_execute(
+        conn, cursor, statement, parameters, _context, executemany
+    ) -> None:
+        start = conn.info.pop(_QUERY_START, None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        label = statement_label(statement)
+        db_queries.inc(label)
+        db_duration.observe(elapsed, label)
+
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        route = current_route()
+        slow = threshold is not None and elapsed >= threshold
+        stats = query_log.record(statement, elapsed, rows, route, slow)
+        if not slow:
+            return
+
+        plan = None
+        if explain and label == "SELECT" and not executemany:
+            try:
+                plan = explain_statement(
+                    cursor, engine.dialect.name, statement, parameters
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                log.debug("Could not EXPLAIN the slow query: %s", e)
+            if stats is not None and plan:
+                stats.plan = plan
+        log.warning(
+            "Slow query: %.1f ms, %s rows, %s: %s%s",
+            elapsed * 1000,
+            "?" if rows is None else rows,
+            route or NO_ROUTE,
+            fingerprint(statement),
+            f" [plan: {plan}]" if plan else "",
+        )
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Database Read Replicas
+
+This module routes read-only sessions to read replicas: round-robin over the
+replicas that passed their last health check, falling back to the primary
+when there are none (or none are healthy). Writes always use the primary.
+
+Read-your-writes: after a write, a client's reads go to the primary for a
+while (``KE_DATABASE_READ_YOUR_WRITES_SECONDS``), tracked with a cookie
+(see ``wants_primary``; the token API's ``get_catalog_db`` dependency).
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import Engine, event, text
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.exc import SQLAlchemyError
+
+from qrypt.core.db import get_config, get_read_router
+from qrypt.core.log import get_logger
+from qrypt.core.pool import PoolMetrics
+
+log = get_logger(__name__)
+
+
+@dataclass(slots=True)
+class Replica:
+    """A read replica and its health"""
+
+    name: str
+    engine: Engine
+    metrics: PoolMetrics
+    healthy: bool = True
+    failures: int = 0
+    last_check: Optional[float] = None
+    last_error: Optional[str] = None
+    sessions: int = 0
+
+    def status(self) -> dict:
+        """Health and pool metrics of the replica"""
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "sessions": self.sessions,
+            "pool": self.metrics.stats(self.engine.pool),
+        }
+
+
+class ReplicaRouter:
+    """Round-robin routing of read sessions over healthy replicas"""
+
+    def __init__(self, primary: Engine, replicas: list[Replica]) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self._lock = threading.Lock()
+        self._next = 0
+        self.primary_reads = 0
+        for replica in replicas:
+            self._watch(replica)
+
+    def _watch(self, replica: Replica) -> None:
+        """Take a replica out of rotation when it loses its connection"""
+
+        @event.listens_for(replica.engine, "handle_error")
+        def on_error(context: ExceptionContext) -> None:
+            if context.is_disconnect:
+                self.mark_unhealthy(replica, context.original_exception)
+
+    def choose(self) -> Engine:
+        """The engine for the next read session"""
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                self.primary_reads += 1
+                return self.primary
+            replica = healthy[self._next % len(healthy)]
+            self._next += 1
+            replica.sessions += 1
+            return replica.engine
+
+    def mark_unhealthy(self, replica: Replica, error: object) -> None:
+        """Take a replica out of rotation (until its next good health check)"""
+        with self._lock:
+            if replica.healthy:
+                log.warning("Read replica %s is unhealthy: %s", replica.name, error)
+            replica.healthy = False
+            replica.failures += 1
+            replica.last_error = str(error)
+
+    def check_health(self) -> None:
+        """Check every replica with a trivial query"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+            except SQLAlchemyError as e:
+                self.mark_unhealthy(replica, e)
+            else:
+                with self._lock:
+                    if not replica.healthy:
+                        log.info("Read replica %s is healthy again", replica.name)
+                    replica.healthy = True
+                    replica.last_error = None
+            replica.last_check = time.time()
+
+    def status(self) -> dict:
+        """Routing and health status"""
+        return {
+            "replicas": [replica.status() for replica in self.replicas],
+            "healthy": sum(replica.healthy for replica in self.replicas),
+            "primary_reads": self.primary_reads,
+        }
+
+    def dispose(self) -> None:
+        """Close the replica connection pools"""
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+
+# A client that wrote reads from the primary until then (epoch seconds)
+READ_YOUR_WRITES_COOKIE = "ke_read_primary_until"
+
+
+def read_your_writes(response: Response) -> None:
+    """Route the client's reads to the primary for a while (after a write)"""
+    seconds = get_config().db.read_your_writes_seconds
+    if get_read_router().replicas and seconds:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            f"{time.time() + seconds:.3f}",
+            max_age=seconds,
+            httponly=True,
+            samesite="lax",
+        )
+
+
+def wants_primary(request: Request) -> bool:
+    """Whether the client recently wrote (and should read from the primary)"""
+    until = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    if not until:
+        return False
+    try:
+        return float(until) > time.time()
+    except ValueError:
+        return False
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Circuit Breakers - Tests
+"""
+
+import pytest
+
+from qrypt.core.breaker import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _call(breaker: CircuitBreaker, error: Exception | None = None) -> None:
+    with breaker.guard():
+        if error is not None:
+            raise error
+
+
+def _fail(breaker: CircuitBreaker, error: Exception | None = None) -> None:
+    with pytest.raises(type(error or TimeoutError())):
+        _call(breaker, error or TimeoutError("upstream"))
+
+
+def test_opens_on_failure_rate_and_probes_when_half_open():
+    clock = Clock()
+    breaker = CircuitBreaker(
+        "test", failure_rate=0.5, window=4, min_calls=4, open_seconds=10, clock=clock
+    )
+    _call(breaker)
+    _fail(breaker)
+    _call(breaker)
+    assert breaker.state == CIRCUIT_CLOSED  # Not enough calls yet
+    _fail(breaker)
+    assert breaker.state == CIRCUIT_OPEN
+
+    # Fail fast, without calling
+    with pytest.raises(CircuitOpenError) as error:
+        _call(breaker)
+    assert error.value.retry_after == 10
+    clock.now = 10
+    assert breaker.state == CIRCUIT_HALF_OPEN
+
+    # One probe at a time, a failed probe opens the circuit again
+    with pytest.raises(TimeoutError):
+        with breaker.guard():
+            with pytest.raises(CircuitOpenError):
+                _call(breaker)
+            raise TimeoutError("still down")
+    assert breaker.state == CIRCUIT_OPEN
+    clock.now = 20
+    _call(breaker)
+    assert breaker.state == CIRCUIT_CLOSED
+
+    status = breaker.status()
+    assert (status["opened"], status["rejected"]) == (2, 2)
+    assert status["last_error"] == "TimeoutError: still down"
+
+
+def test_only_upstream_failures_count():
+    breaker = CircuitBreaker(
+        "test",
+        failure_rate=1.0,
+        window=2,
+        min_calls=2,
+        is_failure=lambda e: not isinstance(e, ValueError),
+    )
+    _fail(breaker, ValueError("bad request"))
+    _fail(breaker, ValueError("bad request"))
+    assert breaker.state == CIRCUIT_CLOSED
+    _fail(breaker)
+    assert breaker.state == CIRCUIT_CLOSED
+    _fail(breaker)
+    assert breaker.state == CIRCUIT_OPEN
+
+
+def test_breakers_are_shared_by_name():
+    breakers = CircuitBreakers()
+    breaker = breakers.get("a", min_calls=1)
+    assert breakers.get("a") is breaker
+    _fail(breaker)
+    assert breakers.status()["a"]["state"] == CIRCUIT_OPEN
+    with pytest.raises(ValueError):
+        CircuitBreaker("b", failure_rate=0)
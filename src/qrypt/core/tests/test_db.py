@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Database - Tests
+"""
+
+from sqlalchemy import text
+
+from qrypt.core.config import DBConfigSQLite
+from qrypt.core.db import create_db_engine
+
+
+def test_sqlite_engine_tuning(tmp_path, monkeypatch):
+    monkeypatch.setenv("KE_DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("KE_DATABASE_POOL_SIZE", "2")
+    monkeypatch.setenv("KE_DATABASE_POOL_MAX_OVERFLOW", "1")
+
+    engine, metrics = create_db_engine(DBConfigSQLite())
+    try:
+        with engine.connect() as connection:
+            pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == 5000
+
+            stats = metrics.stats(engine.pool)
+            assert stats["capacity"] == 3
+            assert stats["checked_out"] == 1
+            assert stats["wait_count"] == 1
+
+        stats = metrics.stats(engine.pool)
+        assert stats["checked_out"] == 0
+        assert stats["peak_checked_out"] == 1
+    finally:
+        engine.dispose()
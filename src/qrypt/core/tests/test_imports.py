@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Import Time - Tests
+
+Importing the application modules must be cheap and free of side effects:
+no config or engine is created, no files or directories are written, and
+a partial environment does not fail the import.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[3]
+
+# Modules imported by the CLI entry points, workers and tests
+MODULES = (
+    "qrypt.core.ops.db",
+    "qrypt.tokens.crud",
+    "qrypt.tokens.archive",
+    "qrypt.tokens.services.coingecko.ops.admin",
+)
+# The API application (its routes and models cost more to declare)
+API_MODULES = ("qrypt.tokens.api", "qrypt.main")
+
+# Budget for the import time of our own modules (excluding dependencies)
+IMPORT_BUDGET_MS = 150
+API_IMPORT_BUDGET_MS = 250
+
+
+def _import_times(stderr: str) -> dict[str, int]:
+    """Self import time (us) per module, from `-X importtime` output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:") :].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = int(self_us)
+    return times
+
+
+@pytest.mark.performance
+@pytest.mark.parametrize(
+    "modules, budget_ms",
+    [(MODULES, IMPORT_BUDGET_MS), (API_MODULES, API_IMPORT_BUDGET_MS)],
+    ids=["cli", "api"],
+)
+def test_imports_are_lazy_and_fast(tmp_path, modules, budget_ms):
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SRC_DIR),
+        # An incomplete PostgreSQL config fails validation, but only on use
+        "KE_DATABASE_URL": "postgresql://",
+    }
+    check = (
+        "import qrypt.core.db as db; "
+        "assert db._primary.cache_info().currsize == 0; "
+        "assert db.get_config.cache_info().currsize == 0"
+    )
+    if "qrypt.main" in modules:
+        check += "; assert qrypt.main.create_app.cache_info().currsize == 0"
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import {', '.join(modules)}; {check}",
+        ],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert not list(tmp_path.iterdir()), "importing wrote to the working directory"
+
+    times = _import_times(proc.stderr)
+    own = {name: us for name, us in times.items() if name.startswith("qrypt")}
+    assert set(modules) <= set(own)
+    total_ms = sum(own.values()) / 1000
+    slowest = sorted(own.items(), key=lambda item: -item[1])[:5]
+    assert total_ms < budget_ms, f"{total_ms:.1f}ms, slowest: {slowest}"
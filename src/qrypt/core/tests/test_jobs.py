@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Background Jobs - Tests
+"""
+
+import threading
+
+from qrypt.core.jobs import JOB_CANCELLED, JOB_FAILED, JOB_SUCCEEDED, JobManager
+
+
+def _wait(job, timeout: float = 5) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if not job.running:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"{job.name} still running")
+
+
+def test_single_run_progress_and_cancel():
+    manager = JobManager()
+    release = threading.Event()
+
+    def sync(job):
+        with job.phase("fetch"):
+            job.expect(10)
+        with job.phase("load"):
+            job.advance(4)
+            release.wait(5)
+            job.advance(6)
+        return "done"
+
+    job, started = manager.submit("sync", sync)
+    assert started
+    # A second submit returns the running job
+    assert manager.submit("sync", sync) == (job, False)
+
+    release.set()
+    _wait(job)
+    status = job.status()
+    assert job.state == JOB_SUCCEEDED and job.result == "done"
+    assert status["done"] == status["total"] == 10
+    assert list(status["phases"]) == ["fetch", "load"]
+    assert status["rows_per_second"] > 0 and status["eta_seconds"] is None
+
+    # Cancelled at the next progress report
+    release.clear()
+    job, started = manager.submit("sync", sync)
+    assert started and manager.cancel("sync")
+    release.set()
+    _wait(job)
+    assert job.state == JOB_CANCELLED and job.result is None
+    assert not manager.cancel("sync")
+
+
+def test_failed_job():
+    manager = JobManager()
+
+    def broken(job):
+        raise RuntimeError("upstream down")
+
+    job, _ = manager.submit("broken", broken)
+    _wait(job)
+    assert job.state == JOB_FAILED
+    assert job.error == "RuntimeError: upstream down"
+    assert manager.get(job.id) is job
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Logging - Tests
+"""
+
+import json
+import logging
+
+import pytest
+
+from qrypt.core.config import LogConfig
+from qrypt.core.log import (
+    DroppingQueueHandler,
+    JSONFormatter,
+    SamplingFilter,
+    configure_logging,
+    get_logger,
+    stop_logging,
+)
+
+
+@pytest.fixture
+def log_env(monkeypatch):
+    """Logging configured from the environment (restored afterwards)"""
+
+    def configure(**env: str) -> logging.Handler:
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return configure_logging(LogConfig(), force=True)
+
+    yield configure
+    monkeypatch.undo()
+    stop_logging()
+    configure_logging(force=True)
+
+
+def test_json_lines_levels_and_queue(log_env, capsys):
+    handler = log_env(
+        KE_LOG_FORMAT="json",
+        KE_LOG_LEVEL="WARNING",
+        KE_LOG_LEVELS="qrypt.tests.loud=DEBUG",
+        KE_LOG_QUEUE="true",
+    )
+    assert isinstance(handler, DroppingQueueHandler)
+
+    quiet, loud = get_logger("qrypt.tests.quiet"), get_logger("qrypt.tests.loud")
+    assert not quiet.isEnabledFor(logging.INFO)
+    quiet.info("not written")
+    args = {"rows": 1}
+    loud.debug("loaded %s", args, extra={"job": "sync"})
+    # The message is merged when logged, not when written
+    args["rows"] = 2
+    stop_logging()
+
+    lines = capsys.readouterr().err.splitlines()
+    entries = [json.loads(line) for line in lines if line.startswith("{")]
+    assert [entry["message"] for entry in entries] == ["loaded {'rows': 1}"]
+    assert entries[0]["level"] == "DEBUG"
+    assert entries[0]["logger"] == "qrypt.tests.loud"
+    assert entries[0]["job"] == "sync"
+
+
+def test_sampling_and_config_validation(monkeypatch):
+    sampling = SamplingFilter(rate=10)
+
+    def record(level: int, lineno: int) -> logging.LogRecord:
+        return logging.LogRecord("qrypt", level, __file__, lineno, "msg", None, None)
+
+    # 1 in 10 debug records per call site; INFO and above always kept
+    assert sum(sampling.filter(record(logging.DEBUG, 1)) for _ in range(100)) == 10
+    assert sum(sampling.filter(record(logging.DEBUG, 2)) for _ in range(5)) == 1
+    assert all(sampling.filter(record(logging.INFO, 3)) for _ in range(5))
+
+    error = record(logging.ERROR, 4)
+    error.exc_info = None
+    assert json.loads(JSONFormatter().format(error))["level"] == "ERROR"
+
+    monkeypatch.setenv("KE_LOG_LEVELS", "qrypt.core=LOUD")
+    with pytest.raises(ValueError):
+        LogConfig()
+    monkeypatch.setenv("KE_LOG_LEVELS", "")
+    monkeypatch.setenv("KE_LOG_FORMAT", "xml")
+    with pytest.raises(ValueError):
+        LogConfig()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Metrics - Tests
+"""
+
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from qrypt.core.api import metrics_router
+from qrypt.core.metrics import (
+    MetricsMiddleware,
+    Registry,
+    http_duration,
+    http_requests,
+)
+
+
+def test_counters_and_histograms_render():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls", ("kind",))
+    latency = registry.histogram("latency_seconds", "Latency", (), (0.1, 1.0))
+
+    # Every thread writes its own shard; the scrape sums them
+    def record():
+        for _ in range(100):
+            calls.inc("a")
+            latency.observe(0.5)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    calls.inc("b", amount=2)
+    latency.observe(0.05)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE calls_total counter" in lines
+    assert 'calls_total{kind="a"} 400' in lines
+    assert 'calls_total{kind="b"} 2' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 401' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 402' in lines
+    assert "latency_seconds_count 402" in lines
+    assert "latency_seconds_sum 205.05" in lines
+
+    registry.clear()
+    assert calls.values() == {}
+
+
+def test_middleware_labels_requests_by_route():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int) -> dict:
+        return {"id": item_id}
+
+    client = TestClient(app)
+    before = http_requests.values().get(("GET", "/items/{item_id}", "200"), 0)
+    for item_id in (1, 2, 3):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    assert client.get("/items/x").status_code == 422
+    assert client.get("/nowhere").status_code == 404
+
+    counts = http_requests.values()
+    assert counts[("GET", "/items/{item_id}", "200")] == before + 3
+    assert counts[("GET", "/items/{item_id}", "422")] >= 1
+    assert counts[("GET", "unmatched", "404")] >= 1
+    assert http_duration.values()[("GET", "/items/{item_id}")][-1] > 0
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'qrypt_http_requests_total{method="GET",route="/items/{item_id}",'
+        'status="200"}' in response.text
+    )
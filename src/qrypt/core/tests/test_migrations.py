@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Migrations - Tests
+"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from qrypt.core.db import Base
+from qrypt.core.ops.db import upgrade_db
+from qrypt.core.ops.query_plans import run
+from qrypt.tokens.models import BlockchainPlatform, Token
+
+PERFORMANCE_INDEXES = {
+    "ix_blockchain_platforms_token_id",
+    "ix_blockchain_platforms_address",
+}
+
+
+def _index_names(connection) -> set:
+    # (SQLAlchemy does not reflect expression indexes on SQLite)
+    query = text("SELECT name FROM sqlite_master WHERE type = 'index'")
+    return set(connection.execute(query).scalars())
+
+
+def test_upgrade_fresh_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    with engine.connect() as connection:
+        upgrade_db(connection)
+        assert PERFORMANCE_INDEXES <= _index_names(connection)
+        version = connection.execute(text("SELECT version_num FROM alembic_version"))
+        assert version.scalar_one() == "0003"
+    engine.dispose()
+
+
+def test_upgrade_stamps_create_all_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    # A database created before migrations (create_all, no alembic_version)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        upgrade_db(connection)
+        assert PERFORMANCE_INDEXES <= _index_names(connection)
+    engine.dispose()
+
+
+def test_upgrade_lowercases_evm_addresses(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    checksum = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+    solana = "EPjFWdd5AufqSSqeM2q"
+    with Session(engine) as db:
+        db.add(
+            Token(
+                symbol="usdc",
+                name="USD Coin",
+                platforms=[
+                    BlockchainPlatform(name="ethereum", address=checksum),
+                    BlockchainPlatform(name="solana", address=solana),
+                ],
+            )
+        )
+        db.commit()
+    with engine.connect() as connection:
+        upgrade_db(connection)
+        addresses = connection.execute(
+            text("SELECT name, address FROM blockchain_platforms")
+        )
+        assert dict(addresses.all()) == {
+            "ethereum": checksum.lower(),
+            "solana": solana,
+        }
+    engine.dispose()
+
+
+def test_key_queries_use_indexes():
+    results = run(rows=2000, repeat=1)
+    assert {result.index for result in results} == PERFORMANCE_INDEXES
+    for result in results:
+        assert result.ok, f"{result.name} does not use {result.index}: {result.plan}"
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Request Profiling - Tests
+"""
+
+import pstats
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from qrypt.core.api import router as system_router
+from qrypt.core.db import get_config
+from qrypt.core.profiling import ProfileStore, ProfilingMiddleware, profile_store
+
+ADMIN = {"X-Admin-Key": "s3cret"}
+
+
+def slow_work() -> int:
+    deadline = time.perf_counter() + 0.05
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(1000))
+    return total
+
+
+@pytest.fixture
+def admin_env(monkeypatch):
+    monkeypatch.setenv("KE_ADMIN_API_KEY", ADMIN["X-Admin-Key"])
+    get_config.cache_clear()
+    profile_store.clear()
+    yield
+    monkeypatch.undo()
+    get_config.cache_clear()
+    profile_store.clear()
+
+
+def _app(sample_rate: float = 0.0, store: ProfileStore = profile_store) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        ProfilingMiddleware,
+        admin_key=ADMIN["X-Admin-Key"],
+        sample_rate=sample_rate,
+        store=store,
+    )
+    app.include_router(system_router)
+
+    @app.get("/work/{n}")
+    def work(n: int) -> dict:
+        return {"n": n, "total": slow_work()}
+
+    return app
+
+
+def test_admins_profile_a_request_on_demand(admin_env, tmp_path):
+    client = TestClient(_app())
+
+    # Not asked for, or not by an admin: not profiled
+    assert "x-profile-id" not in client.get("/work/1").headers
+    refused = client.get("/work/1", headers={"X-Profile": "1", "X-Admin-Key": "x"})
+    assert "x-profile-id" not in refused.headers
+    assert profile_store.list() == []
+
+    response = client.get("/work/2", params={"profile": "1"}, headers=ADMIN)
+    assert response.json()["n"] == 2
+    profile_id = response.headers["x-profile-id"]
+
+    assert client.get("/api/v1/system/profiles").status_code == 403
+    [summary] = client.get("/api/v1/system/profiles", headers=ADMIN).json()
+    assert summary["id"] == profile_id
+    assert summary["route"] == "/work/{n}"
+    assert (summary["kind"], summary["trigger"], summary["status"]) == (
+        "cprofile",
+        "requested",
+        200,
+    )
+
+    url = f"/api/v1/system/profiles/{profile_id}"
+    assert "slow_work" in client.get(url, headers=ADMIN).text
+    pstats_file = tmp_path / "request.pstats"
+    pstats_file.write_bytes(
+        client.get(url, params={"format": "pstats"}, headers=ADMIN).content
+    )
+    functions = {name for _, _, name in pstats.Stats(str(pstats_file)).stats}
+    assert "slow_work" in functions
+    speedscope = client.get(url, params={"format": "speedscope"}, headers=ADMIN)
+    assert speedscope.status_code == 400
+
+
+def test_sampled_profiles_and_automatic_sampling(admin_env):
+    client = TestClient(_app())
+    response = client.get("/work/3", headers={"X-Profile": "sample", **ADMIN})
+    url = f"/api/v1/system/profiles/{response.headers['x-profile-id']}"
+
+    speedscope = client.get(url, headers=ADMIN).json()
+    frames = [frame["name"] for frame in speedscope["shared"]["frames"]]
+    assert "slow_work" in frames
+    profile = next(
+        p
+        for p in speedscope["profiles"]
+        if any(frames.index("slow_work") in stack for stack in p["samples"])
+    )
+    assert profile["type"] == "sampled"
+    assert len(profile["samples"]) == len(profile["weights"])
+
+    # Every request sampled, into a store of 2
+    store = ProfileStore(history=2)
+    client = TestClient(_app(sample_rate=1.0, store=store))
+    ids = [client.get(f"/work/{n}").headers["x-profile-id"] for n in range(3)]
+    assert [p["id"] for p in store.list()] == ids[:0:-1]
+    assert {p["trigger"] for p in store.list()} == {"sampled"}
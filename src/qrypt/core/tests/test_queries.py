@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Query Log - Tests
+"""
+
+import logging
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from qrypt.core.api import router as system_router
+from qrypt.core.auth import require_admin
+from qrypt.core.metrics import MetricsMiddleware, db_queries
+from qrypt.core.queries import (
+    explain_statement,
+    fingerprint,
+    instrument_engine,
+    query_log,
+)
+
+POSTGRES_URL = os.environ.get("KE_TEST_POSTGRES_URL")
+
+
+def test_fingerprints_normalize_literals_and_lists():
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) LIMIT 10") == (
+        fingerprint("select * from t where id in (?, ?)  LIMIT 5").replace(
+            "select * from t where id in", "SELECT * FROM t WHERE id IN"
+        )
+    )
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) LIMIT 10") == (
+        "SELECT * FROM t WHERE id IN (?...) LIMIT ?"
+    )
+    assert (
+        fingerprint("SELECT name FROM tokens WHERE symbol = 'btc' AND id = %(id_1)s")
+        == "SELECT name FROM tokens WHERE symbol = ? AND id = ?"
+    )
+    assert fingerprint("SELECT x::text FROM t WHERE y = :y") == (
+        "SELECT x::text FROM t WHERE y = ?"
+    )
+    assert (
+        fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)")
+        == "INSERT INTO t (a, b) VALUES (?...), ..."
+    )
+
+
+def test_queries_counted_by_route_and_slow_ones_logged(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queries.db'}")
+    # Every query is slow; SELECTs are EXPLAINed
+    instrument_engine(engine, slow_query_ms=1e-6, explain=True)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1), (2), (3)"))
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(system_router)
+
+    @app.get("/things/{thing_id}")
+    def thing(thing_id: int) -> dict:
+        with engine.connect() as connection:
+            sql = text("SELECT x FROM t WHERE x = :x")
+            return {"x": connection.execute(sql, {"x": thing_id}).scalar()}
+
+    query_log.clear()
+    before = db_queries.values().get(("SELECT",), 0)
+    client = TestClient(app)
+    with caplog.at_level(logging.WARNING, logger="qrypt.core.queries"):
+        for thing_id in (1, 2, 3):
+            assert client.get(f"/things/{thing_id}").json() == {"x": thing_id}
+    assert db_queries.values()[("SELECT",)] - before == 3
+
+    # Admin only
+    assert client.get("/api/v1/system/queries").status_code == 403
+    app.dependency_overrides[require_admin] = lambda: None
+    top = client.get("/api/v1/system/queries", params={"limit": 5}).json()
+    assert top["statements"] == 1
+    [stats] = top["frequent"]
+    assert stats["fingerprint"] == "SELECT x FROM t WHERE x = ?"
+    assert stats["count"] == stats["slow"] == 3
+    assert stats["routes"] == {"GET /things/{thing_id}": 3}
+    assert "SCAN" in stats["plan"]
+    assert top["slowest"] == top["frequent"]
+
+    slow = [r.getMessage() for r in caplog.records if "FROM t WHERE" in r.message]
+    assert len(slow) == 3
+    assert slow[0].startswith("Slow query: ")
+    assert "GET /things/{thing_id}" in slow[0] and "plan: " in slow[0]
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "sqlite://",
+        pytest.param(
+            POSTGRES_URL,
+            marks=pytest.mark.skipif(
+                not POSTGRES_URL, reason="KE_TEST_POSTGRES_URL is not set"
+            ),
+        ),
+    ],
+    ids=["sqlite", "postgresql"],
+)
+def test_failed_explain_keeps_the_transaction(url):
+    engine = create_engine(url)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("CREATE TEMPORARY TABLE t (x INTEGER)")
+        cursor.execute("INSERT INTO t VALUES (1)")
+        with pytest.raises(Exception):
+            explain_statement(cursor, engine.dialect.name, "SELECT nope FROM t", None)
+        # The transaction (and its insert) is still usable
+        cursor.execute("SELECT count(*) FROM t")
+        assert cursor.fetchone()[0] == 1
+    finally:
+        connection.close()
+        engine.dispose()
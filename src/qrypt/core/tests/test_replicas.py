@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Core Read Replicas - Tests
+"""
+
+from sqlalchemy import create_engine
+
+from qrypt.core.pool import PoolMetrics
+from qrypt.core.replicas import Replica, ReplicaRouter
+
+
+def _replica(name: str, url: str) -> Replica:
+    return Replica(name=name, engine=create_engine(url), metrics=PoolMetrics())
+
+
+def test_router_round_robin_and_health(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    one = _replica("one", f"sqlite:///{tmp_path / 'one.db'}")
+    # SQLite can't create a file in a missing directory: always unhealthy
+    down = _replica("down", f"sqlite:///{tmp_path / 'missing' / 'down.db'}")
+    router = ReplicaRouter(primary, [one, down])
+
+    assert [router.choose() for _ in range(4)] == [one.engine, down.engine] * 2
+
+    router.check_health()
+    assert one.healthy and not down.healthy
+    assert {router.choose() for _ in range(3)} == {one.engine}
+
+    router.mark_unhealthy(one, "lagging")
+    assert router.choose() is primary
+    assert router.status()["primary_reads"] == 1
+
+    router.check_health()
+    assert router.choose() is one.engine
+    router.dispose()
+    primary.dispose()
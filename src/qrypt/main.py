@@ -4,24 +4,133 @@
 Qrypto - Main Entry Point
 
 This module serves as the main entry point for the Qrypto application.
+
+The application is built on first use of ``app`` (``uvicorn qrypt.main:app``),
+not at import: importing this module reads no config and writes nothing.
 """
 
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
+
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from sqlalchemy.exc import SQLAlchemyError
+
+from qrypt.core.api import metrics_router
+from qrypt.core.api import router as system_router
+from qrypt.core.db import SessionLocal, get_config, get_read_router
+from qrypt.core.http import ImmutableStaticFiles
+from qrypt.core.log import configure_logging, get_logger
+from qrypt.core.metrics import MetricsMiddleware
+from qrypt.core.profiling import ProfilingMiddleware, profile_store
+from qrypt.tokens.api import router, snapshots
+from qrypt.tokens.index import token_index
+from qrypt.tokens.logos import IMMUTABLE_MAX_AGE, LOGO_DIR
+
+log = get_logger(__name__)
+
+
+def build_token_index() -> None:
+    """Build the token autocomplete index from the database"""
+    db = SessionLocal()
+    try:
+        token_index.build_from_db(db)
+    except SQLAlchemyError as e:
+        # Eg. the tables do not exist yet; serve an empty index until the
+        # next refresh rather than refusing to start
+        log.warning("Could not build the token index: %s", e)
+    finally:
+        db.close()
+
+
+async def refresh_token_index(interval: int) -> None:
+    """Periodically rebuild the token autocomplete index"""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(build_token_index)
+
+
+async def check_replica_health(interval: int) -> None:
+    """Periodically health check the read replicas"""
+    while True:
+        await asyncio.to_thread(get_read_router().check_health)
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Application startup / shutdown"""
+    await asyncio.to_thread(build_token_index)
+
+    config = get_config().api
+    tasks = []
+    if config.token_index_refresh_seconds:
+        tasks.append(
+            asyncio.create_task(refresh_token_index(config.token_index_refresh_seconds))
+        )
+    db_config = get_config().db
+    if db_config.replica_urls and db_config.replica_health_check_seconds:
+        tasks.append(
+            asyncio.create_task(
+                check_replica_health(db_config.replica_health_check_seconds)
+            )
+        )
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        if db_config.replica_urls:
+            get_read_router().dispose()
+
+
+@lru_cache(maxsize=1)
+def create_app() -> FastAPI:
+    """The FastAPI application (configured from the environment on first use)"""
+    configure_logging()
+    config = get_config().api
+
+    # Initialize the FastAPI app
+    app = FastAPI(title="Crypto Records Manager", lifespan=lifespan)
+
+    # Add the routers to the FastAPI app
+    app.include_router(router)
+    app.include_router(system_router)
+
+    # Profile requests on demand (admins) and a sample of the others
+    if config.profiling_enabled:
+        profile_store.resize(config.profile_history)
+        app.add_middleware(
+            ProfilingMiddleware,
+            admin_key=config.admin_api_key,
+            sample_rate=config.profile_sample_rate,
+        )
 
-from qrypt.core.config import FastAPIConfig
-from qrypt.core.log import logger as log
-from qrypt.tokens.api import router
+    # Time every request (and serve /metrics)
+    if config.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(metrics_router)
 
-# Initialize the FastAPI app
-app = FastAPI(title="Crypto Records Manager")
+    # Mount the static directory
+    log.debug("Serving static files from %s", config.static_dir)
+    app.mount(
+        "/static",
+        ImmutableStaticFiles(
+            directory=config.ensure_static_dir(),
+            immutable=(LOGO_DIR,),
+            max_age=IMMUTABLE_MAX_AGE,
+        ),
+        name="static",
+    )
 
-# Load FastAPI config options from .env file
-config = FastAPIConfig()
+    # Pre-rendered token responses
+    snapshots.resize(config.snapshot_max_entries)
+    return app
 
-# Add the router to the FastAPI app
-app.include_router(router)
 
-# Mount the static directory
-log.debug("Serving static files from %s", config.static_dir)
-app.mount("/static", StaticFiles(directory=config.static_dir), name="static")
+def __getattr__(name: str):
+    if name == "app":
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
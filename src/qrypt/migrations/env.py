@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Alembic Migration Environment
+
+Migrations run against the application engine (see `qrypt.core.db`), or
+against a connection handed in through ``config.attributes["connection"]``
+(eg. by `qrypt.core.ops.db.upgrade_db` or tests).
+"""
+
+from alembic import context
+
+config = context.config
+
+
+def get_target_metadata():
+    """The application metadata, with all models registered"""
+    # pylint: disable=import-outside-toplevel,unused-import
+    from qrypt.core.db import Base
+    from qrypt.tokens.models import Token  # noqa: F401
+    from qrypt.users.models import User  # noqa: F401
+
+    return Base.metadata
+
+
+def run_migrations(connection) -> None:
+    """Run the migrations on a connection"""
+    context.configure(
+        connection=connection,
+        target_metadata=get_target_metadata(),
+        render_as_batch=connection.dialect.name == "sqlite",
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting to the database"""
+    url = config.get_main_option("sqlalchemy.url")
+    if not url:
+        # pylint: disable=import-outside-toplevel
+        from qrypt.core.db import get_config
+
+        url = get_config().db.url
+    context.configure(
+        url=url,
+        target_metadata=get_target_metadata(),
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations against the database"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from qrypt.core.db import get_engine
+
+    with get_engine().connect() as connection:
+        run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
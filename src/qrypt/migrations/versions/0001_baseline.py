@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+Baseline schema (tokens, blockchain platforms, users)
+
+Databases created before migrations were introduced (with `create_all`)
+already have this schema; `init_db` stamps them at this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade the schema"""
+    op.create_table(
+        "tokens",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("ext_id", sa.String(), nullable=True),
+        sa.Column("symbol", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("logo_url", sa.String(), nullable=True),
+        sa.Column("last_updated", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tokens_id", "tokens", ["id"])
+    op.create_index("ix_tokens_ext_id", "tokens", ["ext_id"], unique=True)
+    op.create_index("ix_tokens_symbol", "tokens", ["symbol"])
+
+    op.create_table(
+        "blockchain_platforms",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("address", sa.String(), nullable=False),
+        sa.Column("token_id", sa.Integer(), nullable=False),
+        sa.Column("last_updated", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["token_id"], ["tokens.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_blockchain_platforms_id", "blockchain_platforms", ["id"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("api_key", sa.String(), nullable=False),
+        sa.Column("last_updated", sa.DateTime(), nullable=True),
+        sa.Column("last_used", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("api_key"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade the schema"""
+    op.drop_table("users")
+    op.drop_table("blockchain_platforms")
+    op.drop_table("tokens")
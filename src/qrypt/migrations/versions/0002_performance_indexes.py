@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+Performance indexes for token and platform lookups
+
+* blockchain_platforms.token_id - loading a token's platforms
+* blockchain_platforms.address  - reverse lookup by contract address
+
+The token name search (``ILIKE '%q%'``) cannot use a btree index, so the
+name is not indexed: it would only add write cost to every sync.
+
+On PostgreSQL the indexes are built CONCURRENTLY (outside a transaction), so
+the tables stay writable while they build. All indexes are created "if not
+exists", as databases created with `create_all` may already have some.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES: tuple = (
+    ("ix_blockchain_platforms_token_id", "blockchain_platforms", ["token_id"]),
+    ("ix_blockchain_platforms_address", "blockchain_platforms", ["address"]),
+)
+
+
+def upgrade() -> None:
+    """Upgrade the schema"""
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(
+                    name,
+                    table,
+                    columns,
+                    if_not_exists=True,
+                    postgresql_concurrently=True,
+                )
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade the schema"""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+Normalize stored EVM contract addresses to lowercase
+
+Addresses are normalized on write and lookup (see `qrypt.tokens.addresses`):
+EVM style addresses (``0x`` + 40 hex chars) are stored lowercase. Rows
+written before that may hold the checksum (mixed case) form, which reverse
+lookups never match; they are lowercased here. Addresses on other chains
+are case-sensitive and left as they are.
+
+The original case is not kept: the downgrade does nothing.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+"""
+
+import re
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (as `qrypt.tokens.addresses.RE_EVM_ADDRESS`, at the time of this revision)
+RE_EVM_ADDRESS = re.compile(r"^0x[0-9a-fA-F]{40}$")
+UPDATE_CHUNK: int = 500
+
+platforms = sa.table(
+    "blockchain_platforms",
+    sa.column("id", sa.Integer),
+    sa.column("address", sa.String),
+)
+
+
+def upgrade() -> None:
+    """Upgrade the schema"""
+    connection = op.get_bind()
+    # Candidates in SQL (portable), the exact pattern in Python
+    rows = connection.execute(
+        sa.select(platforms.c.id, platforms.c.address).where(
+            platforms.c.address.like("0x%"),
+            sa.func.length(platforms.c.address) == 42,
+            platforms.c.address != sa.func.lower(platforms.c.address),
+        )
+    )
+    updates = [
+        {"row_id": row.id, "lowered": row.address.lower()}
+        for row in rows
+        if RE_EVM_ADDRESS.match(row.address)
+    ]
+    statement = (
+        platforms.update()
+        .where(platforms.c.id == sa.bindparam("row_id"))
+        .values(address=sa.bindparam("lowered"))
+    )
+    for i in range(0, len(updates), UPDATE_CHUNK):
+        connection.execute(statement, updates[i : i + UPDATE_CHUNK])
+
+
+def downgrade() -> None:
+    """Downgrade the schema"""
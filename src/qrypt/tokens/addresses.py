@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Addresses
+
+This module contains the reverse lookup of tokens by contract address.
+
+Contract addresses are normalized before they are stored or queried:
+EVM style addresses (``0x`` + 40 hex chars) are case-insensitive, so both
+their checksum (EIP-55 mixed case) and lowercase forms map to lowercase.
+Addresses on other chains (eg. base58 on Solana) are case-sensitive and are
+only stripped of surrounding whitespace.
+
+Platform names are interned into a small lookup table, so batch lookups
+compare small integers rather than repeated strings.
+"""
+
+import re
+import sys
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from qrypt.core.log import get_logger
+from qrypt.tokens.models import BlockchainPlatform, Token
+
+log = get_logger(__name__)
+
+MAX_ADDRESS_BATCH: int = 10_000
+# Keep IN (...) clauses well below the SQLite / PostgreSQL parameter limits
+ADDRESS_QUERY_CHUNK: int = 500
+
+RE_EVM_ADDRESS = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+
+def normalize_address(address: str) -> str:
+    """Normalize a contract address for storage and lookup"""
+    address = address.strip()
+    if RE_EVM_ADDRESS.match(address):
+        return address.lower()
+    return address
+
+
+def normalize_platform(name: str) -> str:
+    """Normalize a blockchain platform name for lookup"""
+    return name.strip().lower()
+
+
+class PlatformTable:
+    """Interned table of blockchain platform names"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def intern(self, name: str) -> int:
+        """Get the id for a platform name, adding it if it is new"""
+        key = normalize_platform(name)
+        platform_id = self._ids.get(key)
+        if platform_id is None:
+            with self._lock:
+                platform_id = self._ids.get(key)
+                if platform_id is None:
+                    platform_id = len(self._names)
+                    self._names.append(sys.intern(key))
+                    self._ids[self._names[platform_id]] = platform_id
+        return platform_id
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Get the id for a platform name, without adding it"""
+        return self._ids.get(normalize_platform(name))
+
+    def name(self, platform_id: int) -> str:
+        """Get the platform name for an id"""
+        return self._names[platform_id]
+
+
+# Process wide platform table
+platform_table = PlatformTable()
+
+
+@dataclass(frozen=True, slots=True)
+class AddressMatch:
+    """A token found at a contract address"""
+
+    platform: str
+    address: str
+    token_id: int
+    symbol: str
+    name: str
+
+
+@dataclass(slots=True)
+class AddressResult:
+    """The tokens found for one requested (platform, address) pair"""
+
+    platform: Optional[str]
+    address: str
+    matches: list[AddressMatch] = field(default_factory=list)
+
+
+def _chunks(items: list[str], size: int) -> Iterable[list[str]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def resolve_addresses(
+    db: Session, pairs: Iterable[tuple[Optional[str], str]]
+) -> list[AddressResult]:
+    """
+    Resolve (platform, address) pairs to tokens.
+
+    A ``None`` platform matches the address on any platform. Results are
+    returned in request order, one per pair.
+    """
+    results: list[AddressResult] = []
+    wanted: set[str] = set()
+    for platform, address in pairs:
+        address = normalize_address(address)
+        results.append(
+            AddressResult(
+                platform=normalize_platform(platform) if platform else None,
+                address=address,
+            )
+        )
+        wanted.add(address)
+
+    # (platform id, address) -> matches, and address -> matches (any platform)
+    by_pair: dict[tuple[int, str], list[AddressMatch]] = defaultdict(list)
+    by_address: dict[str, list[AddressMatch]] = defaultdict(list)
+
+    for chunk in _chunks(sorted(wanted), ADDRESS_QUERY_CHUNK):
+        rows = db.execute(
+            select(
+                BlockchainPlatform.name,
+                BlockchainPlatform.address,
+                Token.id,
+                Token.symbol,
+                Token.name.label("token_name"),
+            )
+            .join(Token, BlockchainPlatform.token_id == Token.id)
+            .where(BlockchainPlatform.address.in_(chunk))
+        )
+        for row in rows:
+            platform_id = platform_table.intern(row.name)
+            match = AddressMatch(
+                platform=platform_table.name(platform_id),
+                address=row.address,
+                token_id=row.id,
+                symbol=row.symbol,
+                name=row.token_name,
+            )
+            by_pair[(platform_id, row.address)].append(match)
+            by_address[row.address].append(match)
+
+    for result in results:
+        if result.platform is None:
+            result.matches = by_address.get(result.address, [])
+        else:
+            platform_id = platform_table.lookup(result.platform)
+            if platform_id is not None:
+                result.matches = by_pair.get((platform_id, result.address), [])
+
+    log.debug(
+        "Resolved %d of %d addresses",
+        sum(1 for r in results if r.matches),
+        len(results),
+    )
+    return results
@@ -11,15 +11,56 @@ It also includes the necessary authentication and authorization mechanisms.
 
 """
 
-from datetime import datetime
+import asyncio
+from typing import Any, Hashable, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
-from qrypt.core.db import get_db
-from qrypt.core.log import logger as log
-from qrypt.tokens.models import BlockchainPlatform, Token
-from qrypt.tokens.services.coingecko.schema import TokenOut
+from qrypt.core.auth import require_admin
+from qrypt.core.db import get_config, get_db, read_session
+from qrypt.core.http import (
+    cache_headers,
+    etag_matches,
+    not_modified,
+)
+from qrypt.core.jobs import JOB_SUCCEEDED, Job, jobs
+from qrypt.core.log import get_logger
+from qrypt.core.replicas import read_your_writes, wants_primary
+from qrypt.tokens import crud
+from qrypt.tokens.addresses import MAX_ADDRESS_BATCH, AddressResult, resolve_addresses
+from qrypt.tokens.catalog import catalog_version, make_etag
+from qrypt.tokens.crud import MAX_TOKEN_BATCH, TOKEN_FIELDS, token_out
+from qrypt.tokens.index import (
+    DEFAULT_AUTOCOMPLETE_LIMIT,
+    MAX_AUTOCOMPLETE_LIMIT,
+    token_index,
+)
+from qrypt.tokens.jobs import JOB_TARGETS
+from qrypt.tokens.logos import LogoError, store_logo
+from qrypt.tokens.services.coingecko.schema import (
+    AddressLookupOut,
+    AddressLookupRequest,
+    AddressMatchOut,
+    JobOut,
+    JobStartOut,
+    LogoOut,
+    TokenBatchIds,
+    TokenBatchItemOut,
+    TokenBatchItems,
+    TokenBatchOut,
+    TokenCandidate,
+    TokenOut,
+)
+from qrypt.tokens.snapshots import (
+    Snapshot,
+    SnapshotStore,
+    render_snapshot,
+    snapshot_response,
+)
+
+log = get_logger(__name__)
 
 # from qrypt.tokens.services.coingecko.adapter import CoinGeckoAdapter
 
@@ -28,78 +69,536 @@ router = APIRouter(prefix="/api/v1/tokens", tags=["tokens"])
 
 # Type aliases
 type EndPointResponseTokenList = list[TokenOut]
+type EndPointResponseCandidateList = list[TokenCandidate]
+type EndPointResponseAddressList = list[AddressLookupOut]
 ResponseModel = TokenOut
 
+MAX_PAGE_SIZE: int = 1000
+# Number of tokens matching a list request (before offset / limit)
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+# Response formats
+FORMAT_JSON = "json"
+FORMAT_COMPACT = "compact"
+FIELDS_DESCRIPTION = f"Comma separated fields to return ({','.join(TOKEN_FIELDS)})"
+FORMAT_DESCRIPTION = (
+    "'json' for a list of objects, or 'compact' for "
+    '{"fields": [...], "rows": [[...], ...]}'
+)
+
+# Serializers for pre-rendered responses
+TOKEN_ADAPTER = TypeAdapter(TokenOut)
+TOKEN_LIST_ADAPTER = TypeAdapter(list[TokenOut])
+ANY_ADAPTER = TypeAdapter(Any)
+
+# Pre-rendered responses for hot queries, keyed by catalog version (sized
+# from the config by the application)
+snapshots = SnapshotStore()
+
+# Write endpoints: the client reads from the primary for a while afterwards
+WRITES = [Depends(read_your_writes)]
+ADMIN = [Depends(require_admin)]
+# The background jobs, see `qrypt.tokens.jobs`
+JobName = Literal["coingecko-sync", "logo-mirror"]
+
+
+def get_catalog_db(request: Request):
+    """Get a session for catalog reads (on a read replica, if configured)
+
+    Reads go to the primary while a recent catalog write (by any process) may
+    not have replicated yet, so no stale response is cached under the new
+    catalog version.
+    """
+    recent_write = catalog_version.age() < get_config().db.read_your_writes_seconds
+    db = read_session(primary=recent_write or wants_primary(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _parse_fields(fields: str | None) -> tuple[str, ...] | None:
+    """Parse (and validate) a comma separated fields projection"""
+    if fields is None:
+        return None
+    projection = tuple(
+        dict.fromkeys(field.strip() for field in fields.split(",") if field.strip())
+    )
+    unknown = [field for field in projection if field not in TOKEN_FIELDS]
+    if not projection or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {unknown}, expected some of {TOKEN_FIELDS}",
+        )
+    return projection
+
+
+def _project(
+    rows: list[dict[str, Any]], fields: tuple[str, ...], response_format: str = ""
+) -> Any:
+    """Shape projected token rows for the requested response format"""
+    if response_format == FORMAT_COMPACT:
+        return {
+            "fields": list(fields),
+            "rows": [[row[field] for field in fields] for row in rows],
+        }
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+def _store_snapshot(
+    version: str,
+    key: Hashable | None,
+    adapter: TypeAdapter,
+    content: Any,
+    headers: dict[str, str],
+) -> Snapshot:
+    """Render a response, keeping it as a snapshot for hot keys"""
+    snapshot = render_snapshot(adapter, content, headers, compress=key is not None)
+    # Don't store a render that a concurrent write has already outdated
+    if key is not None and version == catalog_version.value:
+        snapshots.put(version, key, snapshot)
+    return snapshot
+
 
 @router.get("/", response_model=EndPointResponseTokenList)
-async def list_tokens() -> EndPointResponseTokenList:
+async def list_tokens(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    q: str | None = Query(None, min_length=1, description="Name contains"),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+    response_format: Literal["json", "compact"] = Query(
+        FORMAT_JSON, alias="format", description=FORMAT_DESCRIPTION
+    ),
+    db: Session = Depends(get_catalog_db),
+) -> Response:
     """
     List all tokens.
 
-    Returns a list of all tokens in the database.
+    Returns a list of all tokens in the database (or a page of them), or of
+    the tokens whose name contains `q`. The X-Total-Count header holds the
+    number of matching tokens (for paging).
+
+    Responses carry an ETag tied to the catalog version; a request with a
+    matching If-None-Match gets a 304 without touching the database. The full
+    list and its first pages are served from pre-rendered snapshots.
+
+    There is no Last-Modified (nor If-Modified-Since): the tokens' update
+    times miss deletions, and a one second HTTP date misses writes within
+    the same second (see `qrypt.core.http`). The ETag changes with every
+    write.
+
+    Args:
+        offset (int): The number of tokens to skip.
+        limit (int): The maximum number of tokens to return (all if not set).
+        q (str): Only tokens whose name contains this (case insensitive).
+        fields (str): Comma separated fields to return (all if not set).
+        format (str): "json" (list of objects) or "compact" (field names and
+            an array of value arrays).
+    """
+    projection = _parse_fields(fields)
+    config = get_config().api
+    version = catalog_version.value
+    etag = make_etag(version, "list", offset, limit, q, projection, response_format)
+    if etag_matches(request, etag):
+        return not_modified(cache_headers(etag, config.cache_max_age))
+
+    key = ("list", offset, limit, q, projection, response_format)
+    snapshot = snapshots.get(version, key)
+    if snapshot is None:
+        if projection is None and response_format == FORMAT_JSON:
+            tokens = crud.list_tokens(db, offset=offset, limit=limit, name=q)
+            adapter, content = TOKEN_LIST_ADAPTER, [token_out(t) for t in tokens]
+            count = len(tokens)
+        else:
+            projection = projection or TOKEN_FIELDS
+            rows = crud.list_token_rows(
+                db, projection, offset=offset, limit=limit, name=q
+            )
+            adapter, content = ANY_ADAPTER, _project(rows, projection, response_format)
+            count = len(rows)
+        if offset or (limit is not None and count >= limit):
+            count = crud.count_tokens(db, q)
+
+        headers = cache_headers(etag, config.cache_max_age)
+        headers[TOTAL_COUNT_HEADER] = str(count)
+        # Searches are not snapshotted: there is no end to them
+        is_hot = limit is not None and offset + limit <= config.snapshot_hot_rows
+        snapshot = _store_snapshot(
+            version,
+            key if q is None and (limit is None or is_hot) else None,
+            adapter,
+            content,
+            headers,
+        )
+
+    return snapshot_response(request, snapshot)
+
+
+@router.get("/autocomplete", response_model=EndPointResponseCandidateList)
+async def autocomplete_tokens(
+    q: str = Query(..., min_length=1, description="Symbol or name prefix"),
+    limit: int = Query(DEFAULT_AUTOCOMPLETE_LIMIT, ge=1, le=MAX_AUTOCOMPLETE_LIMIT),
+) -> EndPointResponseCandidateList:
     """
+    Autocomplete token symbols and names.
 
-    # client = CoinGeckoAdapter()
-    # coins = await client.api.coins_list()
+    Resolves a symbol or name prefix (eg. "ETH", "usd c") to ranked candidate
+    tokens using the in-memory token index; no database access is needed.
 
-    coins = DB
-    if not coins:
-        return []
+    Args:
+        q (str): The symbol or name prefix to look up.
+        limit (int): The maximum number of candidates to return.
 
+    Returns:
+        list[TokenCandidate]: The best matching tokens, best first.
+    """
     return [
-        TokenOut(
-            id=coin.id,
-            symbol=coin.symbol,
-            name=coin.name,
-            platforms=coin.platforms,
-            last_updated=coin.last_updated,
+        TokenCandidate(
+            id=candidate.id,
+            symbol=candidate.symbol,
+            name=candidate.name,
+            match=candidate.match,
         )
-        for coin in coins
+        for candidate in token_index.search(q, limit=limit)
     ]
 
 
-@router.get("/{token_id}", response_model=TokenOut)
-async def get_token(token_id: str) -> TokenOut:
+def _address_lookup_out(result: AddressResult) -> AddressLookupOut:
+    return AddressLookupOut(
+        platform=result.platform,
+        address=result.address,
+        matches=[
+            AddressMatchOut(
+                platform=match.platform,
+                address=match.address,
+                token_id=match.token_id,
+                symbol=match.symbol,
+                name=match.name,
+            )
+            for match in result.matches
+        ],
+    )
+
+
+@router.get("/by-address", response_model=AddressLookupOut)
+async def get_tokens_by_address(
+    address: str = Query(..., min_length=1, description="Contract address"),
+    platform: str | None = Query(None, description="Blockchain platform"),
+    db: Session = Depends(get_catalog_db),
+) -> AddressLookupOut:
     """
-    Get a token by its ID.
+    Find the tokens deployed at a contract address.
 
     Args:
-        token_id (str): The ID of the token to retrieve.
+        address (str): The contract address (checksum or lowercase form).
+        platform (str): The blockchain platform (optional, any if not set).
 
     Returns:
-        TokenOut: The token with the specified ID.
+        AddressLookupOut: The tokens found at the address.
+    """
+    (result,) = resolve_addresses(db, [(platform, address)])
+    return _address_lookup_out(result)
+
+
+@router.post("/by-address", response_model=EndPointResponseAddressList)
+async def lookup_tokens_by_address(
+    request: AddressLookupRequest, db: Session = Depends(get_catalog_db)
+) -> EndPointResponseAddressList:
+    """
+    Find the tokens deployed at a batch of contract addresses.
+
+    Args:
+        request (AddressLookupRequest): The (platform, address) pairs.
+
+    Returns:
+        list[AddressLookupOut]: One result per requested pair, in order.
+    """
+    if len(request.items) > MAX_ADDRESS_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_ADDRESS_BATCH} addresses per request",
+        )
+
+    log.debug("Looking up %d addresses", len(request.items))
+    results = resolve_addresses(
+        db, ((item.platform, item.address) for item in request.items)
+    )
+    return [_address_lookup_out(result) for result in results]
+
+
+def _batch_out(results: list[crud.ItemResult]) -> TokenBatchOut:
+    succeeded = sum(1 for result in results if result.ok)
+    return TokenBatchOut(
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=[
+            TokenBatchItemOut(
+                index=result.index,
+                status=result.status,
+                id=result.id,
+                detail=result.detail,
+                token=result.token,
+            )
+            for result in results
+        ],
+    )
+
+
+def _check_batch_size(size: int) -> None:
+    if size > MAX_TOKEN_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_TOKEN_BATCH} tokens per batch",
+        )
+
+
+@router.post("/batch/get", response_model=TokenBatchOut)
+async def get_tokens_batch(
+    request: TokenBatchIds, db: Session = Depends(get_catalog_db)
+) -> TokenBatchOut:
+    """
+    Get a batch of tokens by their IDs.
+
+    Args:
+        request (TokenBatchIds): The IDs of the tokens to retrieve.
+
+    Returns:
+        TokenBatchOut: One result per requested ID ("found" or "not_found").
+    """
+    _check_batch_size(len(request.ids))
+    return _batch_out(crud.fetch_tokens(db, request.ids))
+
+
+@router.post("/batch", response_model=TokenBatchOut, dependencies=WRITES)
+async def create_tokens_batch(
+    request: TokenBatchItems, db: Session = Depends(get_db)
+) -> TokenBatchOut:
+    """
+    Create a batch of tokens in one transaction.
+
+    Invalid items are reported and skipped; the valid ones are created.
+
+    Args:
+        request (TokenBatchItems): The tokens to create.
+
+    Returns:
+        TokenBatchOut: One result per item ("created", "invalid" or "error").
+    """
+    _check_batch_size(len(request.items))
+    log.debug("Creating %d tokens", len(request.items))
+    return _batch_out(crud.create_tokens(db, request.items))
+
+
+@router.put("/batch", response_model=TokenBatchOut, dependencies=WRITES)
+async def update_tokens_batch(
+    request: TokenBatchItems, db: Session = Depends(get_db)
+) -> TokenBatchOut:
+    """
+    Update a batch of tokens in one transaction.
+
+    Each item needs the token "id"; fields that are not set are left unchanged.
+    Invalid and unknown items are reported and skipped.
+
+    Args:
+        request (TokenBatchItems): The token updates.
+
+    Returns:
+        TokenBatchOut: One result per item ("updated", "not_found", "invalid"
+        or "error").
+    """
+    _check_batch_size(len(request.items))
+    log.debug("Updating %d tokens", len(request.items))
+    return _batch_out(crud.update_tokens(db, request.items))
+
+
+@router.post("/batch/delete", response_model=TokenBatchOut, dependencies=WRITES)
+async def delete_tokens_batch(
+    request: TokenBatchIds, db: Session = Depends(get_db)
+) -> TokenBatchOut:
     """
+    Delete a batch of tokens in one transaction.
 
-    # client = CoinGeckoAdapter()
-    # coins = await client.api.coins_list()
-    # if not coins:
-    #     raise HTTPException(status_code=404, detail=f"Token not found [{token_id}]")
+    Args:
+        request (TokenBatchIds): The IDs of the tokens to delete.
 
-    # For now, we will use the temporary DB
-    global DB
-    coins = DB
+    Returns:
+        TokenBatchOut: One result per ID ("deleted", "not_found" or "error").
+    """
+    _check_batch_size(len(request.ids))
+    log.debug("Deleting %d tokens", len(request.ids))
+    return _batch_out(crud.delete_tokens(db, request.ids))
+
+
+@router.post(
+    "/logos",
+    response_model=LogoOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=WRITES,
+)
+async def upload_logo(request: Request) -> LogoOut:
+    """
+    Store a logo image (the request body), for a token's `logo_url`.
 
-    # Find the token with the specified ID
-    coin = next((c for c in coins if c.id == token_id), None)
-    if not coin:
-        raise HTTPException(status_code=404, detail=f"Token not found [{token_id}]")
+    The image is stored by content as thumbnails, in the static files the
+    API serves (see `qrypt.tokens.logos`).
 
-    return TokenOut(
-        id=coin.id,
-        symbol=coin.symbol,
-        name=coin.name,
-        platforms=coin.platforms,
-        last_updated=coin.last_updated,
+    Returns:
+        LogoOut: The URL of the logo.
+    """
+    config = get_config().api
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > config.logo_max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Logos are at most {config.logo_max_bytes} bytes",
+            )
+    if not data:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No image")
+    try:
+        url = await asyncio.to_thread(
+            store_logo, bytes(data), config.ensure_static_dir(), config.logo_max_pixels
+        )
+    except LogoError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return LogoOut(logo_url=url)
+
+
+def _job_out(job: Job) -> JobOut:
+    return JobOut(
+        **job.status(), result=job.result if job.state == JOB_SUCCEEDED else None
     )
 
 
-@router.post("/", response_model=TokenOut, status_code=status.HTTP_201_CREATED)
+def _current_job(name: str) -> Job:
+    job = jobs.current(name)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No {name} job has run")
+    return job
+
+
+@router.post(
+    "/jobs/{name}",
+    response_model=JobStartOut,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=ADMIN,
+)
+async def start_job(name: JobName) -> JobStartOut:
+    """
+    Start a background job: "coingecko-sync" or "logo-mirror" (admin).
+
+    Returns:
+        JobStartOut: The job, and whether it was started (or was running).
+    """
+    job, started = jobs.submit(name, JOB_TARGETS[name])
+    return JobStartOut(started=started, job=_job_out(job))
+
+
+@router.get("/jobs/{name}", response_model=JobOut, dependencies=ADMIN)
+async def get_job(name: JobName) -> JobOut:
+    """
+    The progress of the latest job of a name (admin).
+
+    Returns:
+        JobOut: The job's progress, with a result summary once it succeeded.
+    """
+    return _job_out(_current_job(name))
+
+
+@router.delete("/jobs/{name}", response_model=JobOut, dependencies=ADMIN)
+async def cancel_job(name: JobName) -> JobOut:
+    """
+    Cancel the running job of a name (admin); it stops at its next check.
+
+    Returns:
+        JobOut: The job's progress.
+    """
+    job = _current_job(name)
+    jobs.cancel(name)
+    return _job_out(job)
+
+
+def _single_result(result: crud.ItemResult) -> crud.ItemResult:
+    """Raise the HTTP error for a failed single item operation"""
+    if result.status == crud.STATUS_NOT_FOUND:
+        raise HTTPException(
+            status_code=404, detail=f"Token not found [ID: {result.id}]"
+        )
+    if result.status == crud.STATUS_INVALID:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=result.detail
+        )
+    if not result.ok:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=result.detail
+        )
+    return result
+
+
+@router.get("/{token_id}", response_model=TokenOut)
+async def get_token(
+    token_id: int,
+    request: Request,
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_catalog_db),
+) -> Response:
+    """
+    Get a token by its ID.
+
+    Supports conditional requests (If-None-Match) and is served from
+    snapshots for recently requested tokens, see `list_tokens`.
+
+    Args:
+        token_id (int): The ID of the token to retrieve.
+        fields (str): Comma separated fields to return (all if not set).
+
+    Returns:
+        TokenOut: The token with the specified ID.
+    """
+    projection = _parse_fields(fields)
+    config = get_config().api
+    version = catalog_version.value
+    etag = make_etag(version, "token", token_id, projection)
+    if etag_matches(request, etag):
+        return not_modified(cache_headers(etag, config.cache_max_age))
+
+    key = ("token", token_id, projection)
+    snapshot = snapshots.get(version, key)
+    if snapshot is None:
+        if projection is None:
+            token = crud.get_tokens(db, [token_id]).get(token_id)
+            adapter, content = TOKEN_ADAPTER, token and token_out(token)
+        else:
+            rows = crud.list_token_rows(db, projection, ids=[token_id])
+            adapter, content = ANY_ADAPTER, rows and _project(rows, projection)[0]
+        if not content:
+            raise HTTPException(status_code=404, detail=f"Token not found [{token_id}]")
+
+        snapshot = _store_snapshot(
+            version,
+            key,
+            adapter,
+            content,
+            cache_headers(etag, config.cache_max_age),
+        )
+
+    return snapshot_response(request, snapshot)
+
+
+@router.post(
+    "/",
+    response_model=TokenOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=WRITES,
+)
 async def create_token(data: dict, db: Session = Depends(get_db)) -> TokenOut:
     """
     Create a new token.
 
     Args:
-        token (TokenOut): The token to create.
+        data (dict): The token to create (symbol, name and platforms).
 
     Returns:
         TokenOut: The created token.
@@ -121,48 +620,22 @@ async def create_token(data: dict, db: Session = Depends(get_db)) -> TokenOut:
             detail="Token symbol and name are required",
         )
 
-    logo_url = ""
-    # price_usd = None
-    # market_cap = None
-
-    token = Token(
-        id=None,
-        symbol=symbol,
-        name=name,
-        # platforms=platforms,
-        logo_url=logo_url,
-        # price_usd=price_usd,
-        # market_cap=market_cap,
-        last_updated=datetime.now(),
-    )
-
-    # Add the token to the database
-    db.add(token)
-    db.commit()
-    db.refresh(token)
-
-    token_reponse = TokenOut(
-        id=int(token.id),
-        symbol=token.symbol,
-        name=token.name,
-        platforms=dict(),
-        last_updated=token.last_updated,
-        logo_url=token.logo_url,
-    )
+    (result,) = crud.create_tokens(db, [data])
+    token_reponse = _single_result(result).token
 
     log.debug("Token created: %s", token_reponse)
-    # log.debug("Tokens in DB: %s", len(DB))
-    # log.debug("Tokens in DB: %s", DB)
     return token_reponse
 
 
-@router.put("/{token_id}", response_model=TokenOut)
-async def update_token(token_id: str, data: dict) -> TokenOut:
+@router.put("/{token_id}", response_model=TokenOut, dependencies=WRITES)
+async def update_token(
+    token_id: int, data: dict, db: Session = Depends(get_db)
+) -> TokenOut:
     """
     Update an existing token.
 
     Args:
-        token_id (str): The ID of the token to update.
+        token_id (int): The ID of the token to update.
         data (dict): The updated token data.
 
     Returns:
@@ -172,65 +645,29 @@ async def update_token(token_id: str, data: dict) -> TokenOut:
     log.debug("Updating token: %s", token_id)
     log.debug("Token data: %s", data)
 
-    global DB
+    (result,) = crud.update_tokens(db, [{**data, "id": token_id}])
+    token = _single_result(result).token
 
-    idx = next((i for i, c in enumerate(DB) if c.id == token_id), None)
+    log.debug("Token updated: %s", token)
+    return token
 
-    if idx is not None:
-        DB[idx].name = data.get("name", DB[idx].name)
-        DB[idx].symbol = data.get("symbol", DB[idx].symbol)
-        DB[idx].platforms = data.get("platforms", DB[idx].platforms)
-        DB[idx].last_updated = datetime.now()
 
-        log.debug("Token updated: %s", DB[idx])
-        log.debug("Tokens remaining: %s", len(DB))
-        return DB[idx]
-    else:
-        log.debug("Token not found: %s", token_id)
-        raise HTTPException(status_code=404, detail=f"Token not found [ID: {token_id}]")
-
-
-@router.delete("/{token_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_token(token_id: str) -> None:
+@router.delete(
+    "/{token_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=WRITES
+)
+async def delete_token(token_id: int, db: Session = Depends(get_db)) -> None:
     """
     Delete a token by its ID.
 
     Args:
-        token_id (str): The ID of the token to delete.
+        token_id (int): The ID of the token to delete.
 
     Raises:
         HTTPException: If the token is not found.
     """
-    global DB
-
     log.debug("Deleting token: %s", token_id)
-    log.debug("Total tokens before deletion: %s", len(DB))
-
-    idx = next((i for i, c in enumerate(DB) if c.id == token_id), None)
 
-    if idx is not None:
-        DB.pop(idx)
-        log.debug("Token deleted: %s", token_id)
-    else:
-        log.debug("Token not found: %s", token_id)
-        raise HTTPException(status_code=404, detail=f"Token not found [ID: {token_id}]")
+    (result,) = crud.delete_tokens(db, [token_id])
+    _single_result(result)
 
     log.debug("Token deleted: %s", token_id)
-    log.debug("Tokens remaining: %s", len(DB))
-
-
-## TEMPORARY DB
-DB = []
-ID_AUTO = 0
-
-
-def get_id() -> str:
-    """
-    Get a new ID for a token.
-
-    Returns:
-        str: A new ID for the token.
-    """
-    global ID_AUTO
-    ID_AUTO += 1
-    return str(ID_AUTO)
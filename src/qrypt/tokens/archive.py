@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Catalog Archives
+
+This module exports the token catalog (tokens and their platforms) to a
+compact snapshot file and bulk-loads it back, so a new node can bootstrap
+its database from a local file instead of the CoinGecko API.
+
+The file is gzip compressed, columnar JSON: one array per column rather than
+one object per row, with platform names dictionary encoded. Tokens are keyed
+by their external (CoinGecko) id; tokens without one are not exported.
+
+    export_catalog [path]
+    import_catalog [path] [--update]
+
+The path defaults to ``KE_CATALOG_SNAPSHOT``.
+"""
+
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from qrypt.core.db import SessionLocal
+from qrypt.core.log import configure_logging, get_logger
+from qrypt.tokens.loaders import LoadResult, TokenRecord, load_tokens
+from qrypt.tokens.models import BlockchainPlatform, Token
+
+log = get_logger(__name__)
+
+ARCHIVE_FORMAT: str = "qrypt-catalog"
+ARCHIVE_VERSION: int = 1
+DEFAULT_CATALOG_SNAPSHOT: str = "./localcache/catalog.json.gz"
+TOKEN_COLUMNS: tuple = ("ext_id", "symbol", "name", "logo_url")
+EXPORT_CHUNK: int = 5_000
+
+
+class ArchiveError(ValueError):
+    """The file is not a (supported) catalog archive"""
+
+
+def default_snapshot_path() -> Path:
+    """The catalog snapshot path (``KE_CATALOG_SNAPSHOT``)"""
+    return Path(os.environ.get("KE_CATALOG_SNAPSHOT", DEFAULT_CATALOG_SNAPSHOT))
+
+
+def build_archive(db: Session) -> dict[str, Any]:
+    """The catalog as columns"""
+    tokens: dict[str, list] = {column: [] for column in TOKEN_COLUMNS}
+    rows_by_id: dict[int, int] = {}
+    query = (
+        select(Token.id, Token.ext_id, Token.symbol, Token.name, Token.logo_url)
+        .where(Token.ext_id.is_not(None))
+        .order_by(Token.id)
+        .execution_options(yield_per=EXPORT_CHUNK)
+    )
+    for token_id, *values in db.execute(query):
+        rows_by_id[token_id] = len(tokens["ext_id"])
+        for column, value in zip(TOKEN_COLUMNS, values):
+            tokens[column].append(value)
+
+    names: dict[str, int] = {}
+    platforms: dict[str, list] = {"token": [], "name": [], "address": []}
+    query = (
+        select(
+            BlockchainPlatform.token_id,
+            BlockchainPlatform.name,
+            BlockchainPlatform.address,
+        )
+        .order_by(BlockchainPlatform.token_id, BlockchainPlatform.id)
+        .execution_options(yield_per=EXPORT_CHUNK)
+    )
+    for token_id, name, address in db.execute(query):
+        row = rows_by_id.get(token_id)
+        if row is None:
+            continue
+        platforms["token"].append(row)
+        platforms["name"].append(names.setdefault(name, len(names)))
+        platforms["address"].append(address)
+
+    return {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "count": len(tokens["ext_id"]),
+        "tokens": tokens,
+        "platform_names": list(names),
+        "platforms": platforms,
+    }
+
+
+def _columns(archive: dict[str, Any], key: str, columns: tuple) -> dict[str, list]:
+    """A table of an archive: equal length column lists"""
+    table = archive.get(key)
+    if not isinstance(table, dict):
+        raise ArchiveError(f"Archive has no {key}")
+    for column in columns:
+        if not isinstance(table.get(column), list):
+            raise ArchiveError(f"Archive {key} have no {column} column")
+    if len({len(table[column]) for column in columns}) > 1:
+        raise ArchiveError(f"Archive {key} columns have different lengths")
+    return table
+
+
+def _index(value: Any, size: int, what: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < size:
+        raise ArchiveError(f"Archive has an invalid {what} index: {value!r}")
+    return value
+
+
+def iter_records(archive: dict[str, Any]) -> Iterator[TokenRecord]:
+    """The token records of an archive
+
+    The archive is validated up front: an invalid one raises `ArchiveError`
+    before any record is loaded.
+    """
+    if not isinstance(archive, dict) or archive.get("format") != ARCHIVE_FORMAT:
+        raise ArchiveError("Not a catalog archive")
+    if archive.get("version") != ARCHIVE_VERSION:
+        raise ArchiveError(f"Unsupported archive version {archive.get('version')}")
+
+    tokens = _columns(archive, "tokens", TOKEN_COLUMNS)
+    count = len(tokens["ext_id"])
+    names = archive.get("platform_names")
+    if not isinstance(names, list):
+        raise ArchiveError("Archive has no platform_names")
+    columns = _columns(archive, "platforms", ("token", "name", "address"))
+
+    platforms: list[dict[str, str]] = [{} for _ in range(count)]
+    for row, name, address in zip(
+        columns["token"], columns["name"], columns["address"]
+    ):
+        row = _index(row, count, "token")
+        platforms[row][names[_index(name, len(names), "platform name")]] = address
+
+    return (
+        TokenRecord(ext_id, symbol, name, logo_url, platforms[row])
+        for row, (ext_id, symbol, name, logo_url) in enumerate(
+            zip(*(tokens[column] for column in TOKEN_COLUMNS))
+        )
+    )
+
+
+def write_archive(archive: dict[str, Any], path: Path) -> None:
+    """Write an archive (atomically)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with gzip.open(tmp, "wt", encoding="utf8", compresslevel=9) as f:
+        json.dump(archive, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def read_archive(path: Path) -> dict[str, Any]:
+    """Read an archive"""
+    try:
+        with gzip.open(path, "rt", encoding="utf8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ArchiveError(f"Could not read catalog archive {path}: {e}") from e
+
+
+def export_archive(db: Session, path: Path) -> int:
+    """Export the catalog to a file, returns the number of tokens"""
+    archive = build_archive(db)
+    write_archive(archive, path)
+    log.info("Exported %d tokens to %s", archive["count"], path)
+    return archive["count"]
+
+
+def import_archive(
+    db: Session, path: Path, update_existing: bool = False
+) -> LoadResult:
+    """Bulk load a catalog file into the database"""
+    result = load_tokens(db, iter_records(read_archive(path)), update_existing)
+    log.info(
+        "Imported %s: %d added, %d updated, %d skipped",
+        path,
+        len(result.added),
+        len(result.updated),
+        len(result.skipped),
+    )
+    return result
+
+
+def _parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "path",
+        nargs="?",
+        type=Path,
+        default=None,
+        help=f"snapshot file (default: $KE_CATALOG_SNAPSHOT or {DEFAULT_CATALOG_SNAPSHOT})",
+    )
+    return parser
+
+
+def export_catalog(argv: Optional[list[str]] = None) -> int:
+    """Command line: export the catalog to a snapshot file"""
+    args = _parser("Export the token catalog to a snapshot file").parse_args(argv)
+    configure_logging()
+    db = SessionLocal()
+    try:
+        export_archive(db, args.path or default_snapshot_path())
+    finally:
+        db.close()
+    return 0
+
+
+def import_catalog(argv: Optional[list[str]] = None) -> int:
+    """Command line: load a snapshot file into the catalog"""
+    parser = _parser("Load a token catalog snapshot file into the database")
+    parser.add_argument(
+        "--update", action="store_true", help="update tokens that already exist"
+    )
+    args = parser.parse_args(argv)
+    configure_logging()
+    db = SessionLocal()
+    try:
+        import_archive(db, args.path or default_snapshot_path(), args.update)
+    except ArchiveError as e:
+        log.error("%s", e)
+        return 1
+    finally:
+        db.close()
+    return 0
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Catalog Version
+
+This module contains the token catalog version, a token that changes
+whenever the catalog is written to (token CRUD, syncs).
+
+It is the basis for HTTP validators (ETags) and response caches: anything
+derived from the catalog at version ``v`` stays valid while the version is
+still ``v``, so checking freshness costs no database access.
+
+The version is shared between processes (API workers, the UI, CLI syncs)
+through a small file; reading it costs one ``stat`` call unless it changed.
+"""
+
+import os
+import threading
+import time
+from hashlib import blake2b
+from pathlib import Path
+from typing import Optional
+
+from qrypt.core.config import load_env
+from qrypt.core.log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_CATALOG_VERSION_FILE = "./localcache/catalog.version"
+
+
+def _new_version() -> str:
+    return f"{time.time_ns():x}"
+
+
+def make_etag(version: str, *parts: object) -> str:
+    """Strong ETag for a response derived from the catalog at a version"""
+    digest = blake2b(
+        "|".join(str(part) for part in parts).encode("utf8"), digest_size=6
+    ).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+class CatalogVersion:
+    """Cross-process catalog version counter"""
+
+    def __init__(self, path: Optional[Path] = None, env: Optional[str] = None) -> None:
+        self._path = path
+        # Environment variable with the path, read on first use
+        self._env = env
+        self._lock = threading.Lock()
+        self._value = _new_version()
+        self._stamp: Optional[tuple[int, int]] = None
+        # When the version last changed (epoch seconds)
+        self._changed_at = 0.0
+
+    @property
+    def path(self) -> Optional[Path]:
+        """The shared version file (None: versions are per process)"""
+        if self._env is not None:
+            load_env()
+            self._path = Path(os.environ.get(self._env, DEFAULT_CATALOG_VERSION_FILE))
+            self._env = None
+        return self._path
+
+    def _read(self) -> str:
+        """Read the shared version if the file changed since the last read"""
+        if self.path is None:
+            return self._value
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            # First use: publish our version so every process agrees on it
+            self._write(self._value)
+            return self._value
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                try:
+                    self._value = self.path.read_text(encoding="utf8").strip()
+                    self._stamp = stamp
+                    self._changed_at = stat.st_mtime_ns / 1e9
+                except OSError as e:
+                    log.warning("Could not read catalog version: %s", e)
+        return self._value
+
+    def _write(self, value: str) -> None:
+        assert self.path is not None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(value, encoding="utf8")
+            os.replace(tmp, self.path)
+            stat = self.path.stat()
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+            self._changed_at = stat.st_mtime_ns / 1e9
+        except OSError as e:
+            log.warning("Could not write catalog version: %s", e)
+
+    @property
+    def value(self) -> str:
+        """The current catalog version"""
+        return self._read()
+
+    def bump(self) -> str:
+        """Move to a new catalog version (after the catalog was written)"""
+        with self._lock:
+            self._value = _new_version()
+            self._changed_at = time.time()
+            if self.path is not None:
+                self._write(self._value)
+        log.debug("Catalog version bumped to %s", self._value)
+        return self._value
+
+    def age(self) -> float:
+        """Seconds since the catalog version last changed"""
+        self._read()
+        return max(0.0, time.time() - self._changed_at)
+
+    def etag(self, *parts: object) -> str:
+        """Strong ETag for a response derived from the current catalog"""
+        return make_etag(self.value, *parts)
+
+
+# Process wide catalog version
+catalog_version = CatalogVersion(env="KE_CATALOG_VERSION_FILE")
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token CRUD
+
+This module contains the database operations behind the token API.
+
+Every operation works on a batch (a single token is a batch of one): items
+are validated up front, the valid ones are written with bulk statements in
+one transaction, and a per-item result reports what happened to each of them.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, selectinload
+
+from qrypt.core.log import get_logger
+from qrypt.tokens.addresses import normalize_address
+from qrypt.tokens.catalog import catalog_version
+from qrypt.tokens.index import token_index
+from qrypt.tokens.models import BlockchainPlatform, Token, get_current_time
+from qrypt.tokens.services.coingecko.schema import TokenCreate, TokenOut, TokenUpdate
+
+log = get_logger(__name__)
+
+MAX_TOKEN_BATCH: int = 5_000
+
+# Token fields that can be projected (see `list_token_rows`)
+TOKEN_FIELDS: tuple = ("id", "symbol", "name", "platforms", "last_updated", "logo_url")
+_TOKEN_COLUMNS: dict = {
+    "id": Token.id,
+    "symbol": Token.symbol,
+    "name": Token.name,
+    "last_updated": Token.last_updated,
+    "logo_url": Token.logo_url,
+}
+
+# Per item result statuses
+STATUS_FOUND = "found"
+STATUS_CREATED = "created"
+STATUS_UPDATED = "updated"
+STATUS_DELETED = "deleted"
+STATUS_NOT_FOUND = "not_found"
+STATUS_INVALID = "invalid"
+STATUS_ERROR = "error"
+STATUS_OK: frozenset = frozenset(
+    {STATUS_FOUND, STATUS_CREATED, STATUS_UPDATED, STATUS_DELETED}
+)
+# The detail of items failed by a database error (logged, not sent)
+DATABASE_ERROR_DETAIL: str = "database error"
+
+
+@dataclass(slots=True)
+class ItemResult:
+    """The outcome of one item of a batch"""
+
+    index: int
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+    token: Optional[TokenOut] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the item succeeded"""
+        return self.status in STATUS_OK
+
+
+def token_out(token: Token) -> TokenOut:
+    """Convert a token (with its platforms loaded) to the API output model"""
+    return TokenOut(
+        id=token.id,
+        symbol=token.symbol,
+        name=token.name,
+        platforms={platform.name: platform.address for platform in token.platforms},
+        last_updated=token.last_updated,
+        logo_url=token.logo_url,
+    )
+
+
+def _name_filter(query, name: Optional[str]):
+    """Only tokens whose name contains `name` (case insensitive)"""
+    if name:
+        query = query.where(Token.name.ilike(f"%{name}%"))
+    return query
+
+
+def count_tokens(db: Session, name: Optional[str] = None) -> int:
+    """Number of tokens (whose name contains `name`)"""
+    return db.scalar(_name_filter(select(func.count(Token.id)), name)) or 0
+
+
+def list_tokens(
+    db: Session,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    name: Optional[str] = None,
+) -> list[Token]:
+    """Get all tokens (or a page of them), with their platforms"""
+    query = select(Token).options(selectinload(Token.platforms)).order_by(Token.id)
+    query = _name_filter(query, name)
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return list(db.scalars(query))
+
+
+def list_token_rows(
+    db: Session,
+    fields: Iterable[str],
+    offset: int = 0,
+    limit: Optional[int] = None,
+    ids: Optional[Iterable[int]] = None,
+    name: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """
+    Get tokens as plain rows holding only the requested fields.
+
+    Only the needed columns are selected, and platforms are only loaded when
+    they are requested. The "id" and "last_updated" columns are always
+    included (for paging and HTTP validators).
+    """
+    fields = set(fields)
+    columns = [Token.id, Token.last_updated] + [
+        column
+        for field, column in _TOKEN_COLUMNS.items()
+        if field in fields and field not in ("id", "last_updated")
+    ]
+    page = _name_filter(select(Token.id).order_by(Token.id), name)
+    query = _name_filter(select(*columns).order_by(Token.id), name)
+    if ids is not None:
+        page = page.where(Token.id.in_(set(ids)))
+        query = query.where(Token.id.in_(set(ids)))
+    if offset:
+        page, query = page.offset(offset), query.offset(offset)
+    if limit is not None:
+        page, query = page.limit(limit), query.limit(limit)
+
+    rows = [row._asdict() for row in db.execute(query)]
+
+    if "platforms" in fields:
+        platforms: dict[int, dict[str, str]] = defaultdict(dict)
+        platform_query = select(
+            BlockchainPlatform.token_id,
+            BlockchainPlatform.name,
+            BlockchainPlatform.address,
+        )
+        if ids is not None or offset or limit is not None or name:
+            platform_query = platform_query.where(
+                BlockchainPlatform.token_id.in_(page.scalar_subquery())
+            )
+        for token_id, platform, address in db.execute(platform_query):
+            platforms[token_id][platform] = address
+        for row in rows:
+            row["platforms"] = platforms.get(row["id"], {})
+
+    return rows
+
+
+def get_tokens(db: Session, ids: Iterable[int]) -> dict[int, Token]:
+    """Get tokens (with their platforms) by id"""
+    ids = set(ids)
+    if not ids:
+        return {}
+    tokens = db.scalars(
+        select(Token).options(selectinload(Token.platforms)).where(Token.id.in_(ids))
+    )
+    return {token.id: token for token in tokens}
+
+
+def _existing_ids(db: Session, ids: Iterable[int]) -> set[int]:
+    ids = set(ids)
+    if not ids:
+        return set()
+    return set(db.scalars(select(Token.id).where(Token.id.in_(ids))))
+
+
+def _platform_rows(token_id: int, platforms: dict[str, str]) -> list[dict]:
+    return [
+        {
+            "token_id": token_id,
+            "name": name,
+            "address": normalize_address(address),
+        }
+        for name, address in platforms.items()
+    ]
+
+
+def _validation_detail(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+def _item_id(item: Any) -> Optional[int]:
+    """Best effort id of an (invalid) update item, for reporting"""
+    if isinstance(item, dict) and isinstance(item.get("id"), int):
+        return item["id"]
+    return None
+
+
+def _fail_batch(results: list[ItemResult]) -> None:
+    """Mark all pending items of a failed transaction as errors"""
+    for result in results:
+        if result.ok:
+            result.status = STATUS_ERROR
+            result.detail = DATABASE_ERROR_DETAIL
+            result.token = None
+
+
+def fetch_tokens(db: Session, ids: list[int]) -> list[ItemResult]:
+    """Get a batch of tokens by id"""
+    tokens = get_tokens(db, ids)
+    return [
+        (
+            ItemResult(
+                index=i,
+                id=token_id,
+                status=STATUS_FOUND,
+                token=token_out(tokens[token_id]),
+            )
+            if token_id in tokens
+            else ItemResult(index=i, id=token_id, status=STATUS_NOT_FOUND)
+        )
+        for i, token_id in enumerate(ids)
+    ]
+
+
+def create_tokens(db: Session, items: list[dict[str, Any]]) -> list[ItemResult]:
+    """Create a batch of tokens (with their platforms) in one transaction"""
+    results: list[ItemResult] = []
+    valid: list[tuple[ItemResult, TokenCreate]] = []
+    for i, item in enumerate(items):
+        try:
+            data = TokenCreate.model_validate(item)
+        except ValidationError as e:
+            results.append(
+                ItemResult(index=i, status=STATUS_INVALID, detail=_validation_detail(e))
+            )
+            continue
+        result = ItemResult(index=i, status=STATUS_CREATED)
+        results.append(result)
+        valid.append((result, data))
+
+    if not valid:
+        return results
+
+    now = get_current_time()
+    try:
+        ids = db.scalars(
+            insert(Token).returning(Token.id, sort_by_parameter_order=True),
+            [
+                {
+                    "symbol": data.symbol,
+                    "name": data.name,
+                    "logo_url": data.logo_url,
+                    "last_updated": now,
+                }
+                for _, data in valid
+            ],
+        ).all()
+        platform_rows = [
+            row
+            for token_id, (_, data) in zip(ids, valid)
+            for row in _platform_rows(token_id, data.platforms)
+        ]
+        if platform_rows:
+            db.execute(insert(BlockchainPlatform), platform_rows)
+        db.commit()
+    except SQLAlchemyError as e:
+        log.exception("Failed to create %d tokens: %s", len(valid), e)
+        db.rollback()
+        _fail_batch(results)
+        return results
+
+    tokens = get_tokens(db, ids)
+    for token_id, (result, data) in zip(ids, valid):
+        result.id = token_id
+        result.token = token_out(tokens[token_id])
+        token_index.add(token_id, data.symbol, data.name)
+
+    catalog_version.bump()
+    log.debug("Created %d tokens", len(valid))
+    return results
+
+
+def update_tokens(db: Session, items: list[dict[str, Any]]) -> list[ItemResult]:
+    """Update a batch of tokens in one transaction"""
+    results: list[ItemResult] = []
+    valid: list[tuple[ItemResult, TokenUpdate]] = []
+    for i, item in enumerate(items):
+        try:
+            data = TokenUpdate.model_validate(item)
+        except ValidationError as e:
+            results.append(
+                ItemResult(
+                    index=i,
+                    id=_item_id(item),
+                    status=STATUS_INVALID,
+                    detail=_validation_detail(e),
+                )
+            )
+            continue
+        result = ItemResult(index=i, id=data.id, status=STATUS_UPDATED)
+        results.append(result)
+        valid.append((result, data))
+
+    existing = _existing_ids(db, (data.id for _, data in valid))
+    for result, data in valid:
+        if data.id not in existing:
+            result.status = STATUS_NOT_FOUND
+    valid = [(result, data) for result, data in valid if data.id in existing]
+
+    if not valid:
+        return results
+
+    now = get_current_time()
+    rows: list[dict] = []
+    replace_platforms: dict[int, dict[str, str]] = {}
+    for _, data in valid:
+        rows.append(
+            {
+                "id": data.id,
+                **data.model_dump(
+                    include={"symbol", "name", "logo_url"}, exclude_unset=True
+                ),
+                "last_updated": now,
+            }
+        )
+        if data.platforms is not None:
+            replace_platforms[data.id] = data.platforms
+
+    try:
+        db.execute(update(Token), rows)
+        if replace_platforms:
+            db.execute(
+                delete(BlockchainPlatform).where(
+                    BlockchainPlatform.token_id.in_(replace_platforms)
+                )
+            )
+            platform_rows = [
+                row
+                for token_id, platforms in replace_platforms.items()
+                for row in _platform_rows(token_id, platforms)
+            ]
+            if platform_rows:
+                db.execute(insert(BlockchainPlatform), platform_rows)
+        db.commit()
+    except SQLAlchemyError as e:
+        log.exception("Failed to update %d tokens: %s", len(valid), e)
+        db.rollback()
+        _fail_batch(results)
+        return results
+
+    tokens = get_tokens(db, (data.id for _, data in valid))
+    for result, data in valid:
+        token = tokens[data.id]
+        result.token = token_out(token)
+        token_index.add(token.id, token.symbol, token.name)
+
+    catalog_version.bump()
+    log.debug("Updated %d tokens", len(valid))
+    return results
+
+
+def delete_tokens(db: Session, ids: list[int]) -> list[ItemResult]:
+    """Delete a batch of tokens (and their platforms) in one transaction"""
+    existing = _existing_ids(db, ids)
+    results = [
+        ItemResult(
+            index=i,
+            id=token_id,
+            status=STATUS_DELETED if token_id in existing else STATUS_NOT_FOUND,
+        )
+        for i, token_id in enumerate(ids)
+    ]
+    if not existing:
+        return results
+
+    try:
+        db.execute(
+            delete(BlockchainPlatform).where(BlockchainPlatform.token_id.in_(existing))
+        )
+        db.execute(delete(Token).where(Token.id.in_(existing)))
+        db.commit()
+    except SQLAlchemyError as e:
+        log.exception("Failed to delete %d tokens: %s", len(existing), e)
+        db.rollback()
+        _fail_batch(results)
+        return results
+
+    for token_id in existing:
+        token_index.discard(token_id)
+
+    catalog_version.bump()
+    log.debug("Deleted %d tokens", len(existing))
+    return results
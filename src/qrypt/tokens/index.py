@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Index
+
+This module contains an in-memory prefix index over token symbols and names.
+
+Symbols are not unique (many coins share a ticker), so resolving "ETH" or
+"usdc" to candidate token ids is a prefix lookup rather than a key lookup.
+The index keeps sorted parallel arrays of lowercased keys and token ids and
+answers lookups with a binary search, without a database round-trip.
+
+The index is built from the ``tokens`` table at startup and updated
+incrementally when tokens are written or synced.
+"""
+
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from qrypt.core.log import get_logger
+from qrypt.tokens.models import Token
+
+log = get_logger(__name__)
+
+DEFAULT_AUTOCOMPLETE_LIMIT: int = 10
+MAX_AUTOCOMPLETE_LIMIT: int = 100
+
+# Match kinds, best first. The position in this tuple is the rank.
+MATCH_SYMBOL_EXACT = "symbol"
+MATCH_SYMBOL_PREFIX = "symbol_prefix"
+MATCH_NAME_EXACT = "name"
+MATCH_NAME_PREFIX = "name_prefix"
+MATCH_WORD_PREFIX = "word_prefix"
+MATCH_RANKS: tuple = (
+    MATCH_SYMBOL_EXACT,
+    MATCH_SYMBOL_PREFIX,
+    MATCH_NAME_EXACT,
+    MATCH_NAME_PREFIX,
+    MATCH_WORD_PREFIX,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Candidate:
+    """A ranked autocomplete candidate"""
+
+    id: int
+    symbol: str
+    name: str
+    match: str
+
+
+class _SortedKeys:
+    """
+    Sorted array of (key, token id) pairs.
+
+    Keys live in a plain list (strings are shared with the token metadata
+    where possible) and ids in a compact ``array``; both are kept in the same
+    order so position ``i`` describes one entry.
+    """
+
+    __slots__ = ("keys", "ids")
+
+    def __init__(self) -> None:
+        self.keys: list[str] = []
+        self.ids: array = array("q")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def load(self, pairs: list[tuple[str, int]]) -> None:
+        """Replace the contents with the given (key, id) pairs"""
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.ids = array("q", (token_id for _, token_id in pairs))
+
+    def insert(self, key: str, token_id: int) -> None:
+        """Insert a single (key, id) pair, keeping the arrays sorted"""
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key and self.ids[i] < token_id:
+            i += 1
+        self.keys.insert(i, key)
+        self.ids.insert(i, token_id)
+
+    def remove(self, key: str, token_id: int) -> None:
+        """Remove a single (key, id) pair if present"""
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == token_id:
+                del self.keys[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def prefix(self, prefix: str) -> Iterable[tuple[str, int]]:
+        """Yield all (key, id) pairs whose key starts with the prefix"""
+        keys, ids = self.keys, self.ids
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            yield keys[i], ids[i]
+            i += 1
+
+
+def _normalize(text: str) -> str:
+    """Lowercase and collapse whitespace"""
+    return " ".join(text.lower().split())
+
+
+def _name_keys(name: str) -> set[str]:
+    """Keys for a token name: the full name and each trailing word run"""
+    words = _normalize(name).split()
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class TokenIndex:
+    """In-memory prefix index over token symbols and names"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._symbols = _SortedKeys()
+        self._names = _SortedKeys()
+        # token id -> (symbol, name)
+        self._meta: dict[int, tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def __contains__(self, token_id: int) -> bool:
+        return token_id in self._meta
+
+    def build(self, rows: Iterable[tuple[int, str, str]]) -> None:
+        """
+        (Re)build the index from (id, symbol, name) rows.
+        """
+        meta: dict[int, tuple[str, str]] = {}
+        symbols: list[tuple[str, int]] = []
+        names: list[tuple[str, int]] = []
+        for token_id, symbol, name in rows:
+            meta[token_id] = (symbol, name)
+            symbols.append((symbol.lower(), token_id))
+            names.extend((key, token_id) for key in _name_keys(name))
+
+        symbol_keys, name_keys = _SortedKeys(), _SortedKeys()
+        symbol_keys.load(symbols)
+        name_keys.load(names)
+
+        with self._lock:
+            self._meta = meta
+            self._symbols = symbol_keys
+            self._names = name_keys
+        log.debug("Token index built with %d tokens", len(meta))
+
+    def build_from_db(self, db: Session) -> None:
+        """(Re)build the index from the tokens table"""
+        rows = db.execute(select(Token.id, Token.symbol, Token.name))
+        self.build((row.id, row.symbol, row.name) for row in rows)
+
+    def add(self, token_id: int, symbol: str, name: str) -> None:
+        """Add or replace a single token"""
+        with self._lock:
+            previous = self._meta.get(token_id)
+            if previous is not None:
+                self._remove(token_id, previous)
+            self._meta[token_id] = (symbol, name)
+            self._symbols.insert(symbol.lower(), token_id)
+            for key in _name_keys(name):
+                self._names.insert(key, token_id)
+
+    def add_many(self, rows: Iterable[tuple[int, str, str]]) -> None:
+        """Add or replace several (id, symbol, name) rows"""
+        for token_id, symbol, name in rows:
+            self.add(token_id, symbol, name)
+
+    def discard(self, token_id: int) -> None:
+        """Remove a token from the index if present"""
+        with self._lock:
+            previous = self._meta.pop(token_id, None)
+            if previous is not None:
+                self._remove(token_id, previous)
+
+    def _remove(self, token_id: int, meta: tuple[str, str]) -> None:
+        symbol, name = meta
+        self._symbols.remove(symbol.lower(), token_id)
+        for key in _name_keys(name):
+            self._names.remove(key, token_id)
+
+    def search(
+        self, query: str, limit: int = DEFAULT_AUTOCOMPLETE_LIMIT
+    ) -> list[Candidate]:
+        """
+        Find the best candidates for a symbol or name prefix.
+
+        Candidates are ranked by match kind (exact symbol first), then by
+        symbol length. (The catalog has no market data to break ties with.)
+        """
+        prefix = _normalize(query)
+        if not prefix or limit <= 0:
+            return []
+
+        with self._lock:
+            best: dict[int, int] = {}
+            for key, token_id in self._symbols.prefix(prefix):
+                rank = 0 if key == prefix else 1
+                if rank < best.get(token_id, len(MATCH_RANKS)):
+                    best[token_id] = rank
+            for key, token_id in self._names.prefix(prefix):
+                if key == _normalize(self._meta[token_id][1]):
+                    rank = 2 if key == prefix else 3
+                else:
+                    rank = 4
+                if rank < best.get(token_id, len(MATCH_RANKS)):
+                    best[token_id] = rank
+
+            meta = self._meta
+
+            def sort_key(item: tuple[int, int]) -> tuple:
+                token_id, rank = item
+                return (rank, len(meta[token_id][0]), token_id)
+
+            top = heapq.nsmallest(limit, best.items(), key=sort_key)
+            return [
+                Candidate(
+                    id=token_id,
+                    symbol=meta[token_id][0],
+                    name=meta[token_id][1],
+                    match=MATCH_RANKS[rank],
+                )
+                for token_id, rank in top
+            ]
+
+
+# Process wide index, built on API startup
+token_index = TokenIndex()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Jobs
+
+The catalog's background jobs: a CoinGecko sync and the mirroring of the
+remote logos. Admins start, poll and cancel them through the token API
+(``/api/v1/tokens/jobs/<name>``), so API clients (the UI) never touch the
+database or the static files themselves.
+
+Jobs run in the API process that started them (see ``qrypt.core.jobs``):
+with several API workers, polls have to reach the same worker (a single
+worker, or sticky sessions).
+"""
+
+import asyncio
+from typing import Callable
+
+from qrypt.core.db import SessionLocal
+from qrypt.core.jobs import Job
+from qrypt.tokens.logos import mirror_logos
+from qrypt.tokens.services.coingecko.ops.admin import pull_tokens
+
+SYNC_JOB: str = "coingecko-sync"
+LOGOS_JOB: str = "logo-mirror"
+
+
+def sync_catalog(job: Job) -> dict[str, int]:
+    """Pull the CoinGecko coins list into the catalog"""
+    added, skipped = pull_tokens(job)
+    return {"added": len(added), "skipped": len(skipped)}
+
+
+def mirror_catalog_logos(job: Job) -> dict[str, int]:
+    """Mirror the remote logos of the catalog (into the API's static files)"""
+    db = SessionLocal()
+    try:
+        result = asyncio.run(mirror_logos(db, job=job))
+    finally:
+        db.close()
+    return {
+        "urls": result.urls,
+        "mirrored": result.mirrored,
+        "failed": len(result.failed),
+    }
+
+
+# The jobs by name, each returning a summary of its result
+JOB_TARGETS: dict[str, Callable[[Job], dict[str, int]]] = {
+    SYNC_JOB: sync_catalog,
+    LOGOS_JOB: mirror_catalog_logos,
+}
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Bulk Loaders
+
+This module loads whole catalogs (a CoinGecko sync, a snapshot restore) into
+the database, keyed by the external (CoinGecko) id.
+
+On PostgreSQL the rows are streamed into temporary staging tables with
+``COPY ... FROM STDIN`` and merged into ``tokens`` / ``blockchain_platforms``
+with one set-based statement. Other databases (SQLite) use batched bulk
+inserts. Either way the load is a single transaction.
+"""
+
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from qrypt.core.log import get_logger
+from qrypt.tokens.addresses import normalize_address
+from qrypt.tokens.catalog import catalog_version
+from qrypt.tokens.index import token_index
+from qrypt.tokens.models import BlockchainPlatform, Token, get_current_time
+
+log = get_logger(__name__)
+
+DEFAULT_LOGO_URL: str = "/static/images/coin-logo.png"
+# Rows per statement of the batched (non COPY) loader
+LOAD_CHUNK: int = 500
+# Bytes buffered per read of a COPY stream
+COPY_BUFFER_BYTES: int = 1 << 16
+
+LOAD_METHOD_COPY = "copy"
+LOAD_METHOD_BATCH = "batch"
+
+# Called with the number of records processed since the last call
+Progress = Callable[[int], None]
+
+
+@dataclass(frozen=True, slots=True)
+class TokenRecord:
+    """A token to load, identified by its external id"""
+
+    ext_id: str
+    symbol: str
+    name: str
+    logo_url: Optional[str] = None
+    platforms: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_coingecko(cls, coin: dict[str, Any]) -> "TokenRecord":
+        """Record for an entry of the CoinGecko coins list"""
+        return cls(
+            ext_id=str(coin["id"]),
+            symbol=str(coin["symbol"]),
+            name=str(coin["name"]),
+            logo_url=coin.get("image", DEFAULT_LOGO_URL),
+            platforms={
+                name: normalize_address(address)
+                for name, address in (coin.get("platforms") or {}).items()
+                if name and address
+            },
+        )
+
+
+@dataclass(slots=True)
+class LoadResult:
+    """External ids of the tokens added, updated and skipped by a load"""
+
+    method: str
+    added: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        """Whether the catalog was written to"""
+        return bool(self.added or self.updated)
+
+
+def _dedupe(records: Iterable[TokenRecord]) -> dict[str, TokenRecord]:
+    """Records by external id (the last one wins)"""
+    return {record.ext_id: record for record in records}
+
+
+def _chunks(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _counted(rows: Iterable, progress: Optional[Progress]) -> Iterator:
+    """Report every `LOAD_CHUNK` rows read from `rows`"""
+    if progress is None:
+        yield from rows
+        return
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count == LOAD_CHUNK:
+            progress(count)
+            count = 0
+    if count:
+        progress(count)
+
+
+def supports_copy(db: Session) -> bool:
+    """Whether the session's database can be loaded with COPY"""
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def load_tokens(
+    db: Session,
+    records: Iterable[TokenRecord],
+    update_existing: bool = False,
+    method: Optional[str] = None,
+    progress: Optional[Progress] = None,
+) -> LoadResult:
+    """Load tokens (and their platforms) in one transaction
+
+    Tokens whose external id is already in the catalog are skipped, or
+    updated (platforms replaced) with `update_existing`. The method defaults
+    to COPY on PostgreSQL and batched inserts elsewhere.
+
+    `progress` is called as records are written; an exception it raises
+    (eg. a cancelled job) rolls the whole load back.
+    """
+    if method is None:
+        method = LOAD_METHOD_COPY if supports_copy(db) else LOAD_METHOD_BATCH
+    loader = _load_copy if method == LOAD_METHOD_COPY else _load_batch
+
+    unique = _dedupe(records)
+    try:
+        result = loader(db, unique, update_existing, progress)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    log.debug(
+        "Loaded tokens (%s): %d added, %d updated, %d skipped",
+        result.method,
+        len(result.added),
+        len(result.updated),
+        len(result.skipped),
+    )
+    if result.changed:
+        catalog_version.bump()
+        token_index.build_from_db(db)
+    return result
+
+
+def _load_batch(
+    db: Session,
+    records: dict[str, TokenRecord],
+    update_existing: bool,
+    progress: Optional[Progress] = None,
+) -> LoadResult:
+    """Batched bulk inserts (any database)"""
+    result = LoadResult(method=LOAD_METHOD_BATCH)
+    now = get_current_time()
+    for chunk in _chunks(list(records.values()), LOAD_CHUNK):
+        existing: dict[str, int] = {
+            ext_id: token_id
+            for ext_id, token_id in db.execute(
+                select(Token.ext_id, Token.id).where(
+                    Token.ext_id.in_([record.ext_id for record in chunk])
+                )
+            )
+        }
+        new = [record for record in chunk if record.ext_id not in existing]
+        old = [record for record in chunk if record.ext_id in existing]
+
+        platforms: list[tuple[int, TokenRecord]] = []
+        if new:
+            ids = db.scalars(
+                insert(Token).returning(Token.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "ext_id": record.ext_id,
+                        "symbol": record.symbol,
+                        "name": record.name,
+                        "logo_url": record.logo_url,
+                        "last_updated": now,
+                    }
+                    for record in new
+                ],
+            ).all()
+            platforms.extend(zip(ids, new))
+            result.added.extend(record.ext_id for record in new)
+
+        if old and update_existing:
+            db.execute(
+                update(Token),
+                [
+                    {
+                        "id": existing[record.ext_id],
+                        "symbol": record.symbol,
+                        "name": record.name,
+                        "logo_url": record.logo_url,
+                        "last_updated": now,
+                    }
+                    for record in old
+                ],
+            )
+            db.execute(
+                delete(BlockchainPlatform).where(
+                    BlockchainPlatform.token_id.in_(
+                        [existing[record.ext_id] for record in old]
+                    )
+                )
+            )
+            platforms.extend((existing[record.ext_id], record) for record in old)
+            result.updated.extend(record.ext_id for record in old)
+        else:
+            result.skipped.extend(record.ext_id for record in old)
+
+        platform_rows = [
+            {
+                "token_id": token_id,
+                "name": name,
+                "address": address,
+                "last_updated": now,
+            }
+            for token_id, record in platforms
+            for name, address in record.platforms.items()
+        ]
+        if platform_rows:
+            db.execute(insert(BlockchainPlatform), platform_rows)
+        if progress is not None:
+            progress(len(chunk))
+    return result
+
+
+class CopyStream(io.TextIOBase):
+    """File-like CSV stream of rows, read lazily by ``COPY ... FROM STDIN``"""
+
+    def __init__(self, rows: Iterable[tuple]) -> None:
+        super().__init__()
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        # QUOTE_NOTNULL: None becomes an (unquoted) empty field, ie. NULL
+        self._writer = csv.writer(
+            self._buffer, quoting=csv.QUOTE_NOTNULL, lineterminator="\n"
+        )
+        self._pending = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> str:
+        limit = COPY_BUFFER_BYTES if size is None or size < 0 else size
+        while len(self._pending) < limit:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        data, self._pending = self._pending[:limit], self._pending[limit:]
+        return data
+
+    def readline(self, size: Optional[int] = -1) -> str:
+        return self.read(size)
+
+
+def _copy_rows(cursor, table: str, columns: tuple[str, ...], rows) -> None:
+    """Stream rows into a table with COPY (psycopg2 or psycopg 3)"""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(sql, CopyStream(rows), size=COPY_BUFFER_BYTES)
+    else:
+        with cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+_STAGING_TABLES = """
+CREATE TEMPORARY TABLE stage_tokens (
+    seq bigint NOT NULL,
+    ext_id text NOT NULL,
+    symbol text NOT NULL,
+    name text NOT NULL,
+    logo_url text
+) ON COMMIT DROP;
+CREATE TEMPORARY TABLE stage_platforms (
+    seq bigint NOT NULL,
+    ext_id text NOT NULL,
+    name text NOT NULL,
+    address text NOT NULL
+) ON COMMIT DROP;
+"""
+
+_MERGE = """
+WITH source AS (
+    SELECT DISTINCT ON (ext_id) seq, ext_id, symbol, name, logo_url
+    FROM stage_tokens
+    ORDER BY ext_id, seq DESC
+), merged AS (
+    INSERT INTO tokens (ext_id, symbol, name, logo_url, last_updated)
+    SELECT ext_id, symbol, name, logo_url, :now FROM source
+    ON CONFLICT (ext_id) DO {on_conflict}
+    RETURNING id, ext_id, (xmax = 0) AS inserted
+), cleared AS (
+    DELETE FROM blockchain_platforms p
+    USING merged m
+    WHERE p.token_id = m.id AND NOT m.inserted
+), platforms AS (
+    INSERT INTO blockchain_platforms (name, address, token_id, last_updated)
+    SELECT sp.name, sp.address, m.id, :now
+    FROM merged m
+    JOIN source s ON s.ext_id = m.ext_id
+    JOIN stage_platforms sp ON sp.seq = s.seq
+)
+SELECT ext_id, inserted FROM merged
+"""
+
+_ON_CONFLICT_UPDATE = """UPDATE SET
+        symbol = EXCLUDED.symbol,
+        name = EXCLUDED.name,
+        logo_url = EXCLUDED.logo_url,
+        last_updated = EXCLUDED.last_updated"""
+
+
+def _load_copy(
+    db: Session,
+    records: dict[str, TokenRecord],
+    update_existing: bool,
+    progress: Optional[Progress] = None,
+) -> LoadResult:
+    """COPY into staging tables, then one set-based merge (PostgreSQL)"""
+    result = LoadResult(method=LOAD_METHOD_COPY)
+    now: datetime = get_current_time()
+    ordered = list(records.values())
+
+    connection = db.connection()
+    connection.exec_driver_sql(_STAGING_TABLES)
+    cursor = connection.connection.cursor()
+    try:
+        _copy_rows(
+            cursor,
+            "stage_tokens",
+            ("seq", "ext_id", "symbol", "name", "logo_url"),
+            _counted(
+                (
+                    (seq, r.ext_id, r.symbol, r.name, r.logo_url)
+                    for seq, r in enumerate(ordered)
+                ),
+                progress,
+            ),
+        )
+        _copy_rows(
+            cursor,
+            "stage_platforms",
+            ("seq", "ext_id", "name", "address"),
+            (
+                (seq, r.ext_id, name, address)
+                for seq, r in enumerate(ordered)
+                for name, address in r.platforms.items()
+            ),
+        )
+    finally:
+        cursor.close()
+
+    on_conflict = _ON_CONFLICT_UPDATE if update_existing else "NOTHING"
+    merged = connection.execute(
+        text(_MERGE.format(on_conflict=on_conflict)), {"now": now}
+    ).all()
+
+    written = set()
+    for ext_id, inserted in merged:
+        written.add(ext_id)
+        (result.added if inserted else result.updated).append(ext_id)
+    result.skipped = [r.ext_id for r in ordered if r.ext_id not in written]
+    return result
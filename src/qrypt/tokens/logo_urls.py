@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Logo URLs
+
+This module names the stored logo thumbnails (see ``qrypt.tokens.logos``)
+by URL. It has no dependencies, so API clients (the UI) pick thumbnail
+sizes without importing the storage or database code.
+"""
+
+import re
+from typing import Optional
+
+LOGO_SIZES: tuple[int, ...] = (32, 64, 128)
+LOGO_DIR: str = "logos"
+LOGO_URL_PREFIX: str = f"/static/{LOGO_DIR}"
+
+_THUMBNAIL_URL = re.compile(
+    rf"^{re.escape(LOGO_URL_PREFIX)}/([0-9a-f]{{2}})/([0-9a-f]{{64}})-(\d+)\.webp$"
+)
+
+
+def logo_url(digest: str, size: int = LOGO_SIZES[-1]) -> str:
+    return f"{LOGO_URL_PREFIX}/{digest[:2]}/{digest}-{size}.webp"
+
+
+def thumbnail_url(url: Optional[str], size: int) -> Optional[str]:
+    """The `size` thumbnail of a mirrored logo (other URLs are returned as is)"""
+    if not url:
+        return url
+    match = _THUMBNAIL_URL.match(url)
+    if match is None:
+        return url
+    size = min(LOGO_SIZES, key=lambda s: (s < size, abs(s - size)))
+    return logo_url(match.group(2), size)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Logos
+
+This module mirrors token logos locally and serves them as small thumbnails
+instead of hotlinking full size (remote) images.
+
+Logos are stored by content: the SHA-256 of the original image names a set
+of WebP thumbnails (32, 64 and 128px), so the same image uploaded or linked
+twice is stored once, and a logo file never changes - it is served with a
+long-lived, immutable Cache-Control header.
+
+    <static dir>/logos/<2 hex>/<digest>-<size>.webp
+
+A token's ``logo_url`` points at the largest thumbnail; ``thumbnail_url``
+picks a size. Remote logos are mirrored (downloads with bounded
+concurrency, resizing in worker threads) with:
+
+    mirror_logos [--concurrency N] [--limit N]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import os
+import sys
+import warnings
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from qrypt.core.config import DEFAULT_LOGO_MAX_PIXELS, FastAPIConfig
+from qrypt.core.db import SessionLocal
+from qrypt.core.jobs import Job
+from qrypt.core.log import configure_logging, get_logger
+from qrypt.tokens.catalog import catalog_version
+from qrypt.tokens.logo_urls import (  # noqa: F401 (re-exported)
+    LOGO_DIR,
+    LOGO_SIZES,
+    LOGO_URL_PREFIX,
+    logo_url,
+    thumbnail_url,
+)
+from qrypt.tokens.models import Token
+
+log = get_logger(__name__)
+
+LOGO_QUALITY: int = 85
+# Logo files never change (their name is their content)
+IMMUTABLE_MAX_AGE: int = 365 * 24 * 3600
+DOWNLOAD_TIMEOUT_SECONDS: int = 20
+UPDATE_CHUNK: int = 500
+
+# Downloads a logo: url -> image bytes
+Fetch = Callable[[str], Awaitable[bytes]]
+
+
+class LogoError(ValueError):
+    """The data is not a (usable) image"""
+
+
+def logo_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def thumbnail_path(root: Path, digest: str, size: int) -> Path:
+    """The file of a thumbnail, under the static directory"""
+    return root / LOGO_DIR / digest[:2] / f"{digest}-{size}.webp"
+
+
+def _save(image: Image.Image, path: Path) -> None:
+    """Write a thumbnail (atomically)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    image.save(tmp, "WEBP", quality=LOGO_QUALITY, method=6)
+    os.replace(tmp, path)
+
+
+def store_logo(
+    data: bytes, root: Path, max_pixels: int = DEFAULT_LOGO_MAX_PIXELS
+) -> str:
+    """Store the thumbnails of an image, returns the logo URL
+
+    Images over `max_pixels` (width x height) are refused before they are
+    decoded, as are Pillow's decompression bombs. Nothing is written when
+    the image is already stored.
+    """
+    digest = logo_digest(data)
+    paths = {size: thumbnail_path(root, digest, size) for size in LOGO_SIZES}
+    if all(path.exists() for path in paths.values()):
+        return logo_url(digest)
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(data)) as image:
+                # Opening reads the header only: check the size before decoding
+                width, height = image.size
+                if width * height > max_pixels:
+                    raise LogoError(
+                        f"Larger than {max_pixels} pixels ({width}x{height})"
+                    )
+                # First frame of animations; keep transparency
+                image.seek(0)
+                image = ImageOps.exif_transpose(image).convert("RGBA")
+    except LogoError:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        raise LogoError(f"Image too large: {e}") from e
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        raise LogoError(f"Not an image: {e}") from e
+
+    for size, path in paths.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+        _save(thumbnail, path)
+    return logo_url(digest)
+
+
+@dataclass(slots=True)
+class MirrorResult:
+    """Outcome of a mirror run (token counts and failed URLs)"""
+
+    mirrored: int = 0
+    urls: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+def remote_logos(db: Session, limit: Optional[int] = None) -> dict[str, list[int]]:
+    """Token ids by remote logo URL"""
+    query = (
+        select(Token.logo_url, Token.id)
+        .where(Token.logo_url.like("http%"))
+        .order_by(Token.id)
+    )
+    tokens: dict[str, list[int]] = {}
+    for url, token_id in db.execute(query):
+        if limit is not None and url not in tokens and len(tokens) >= limit:
+            break
+        tokens.setdefault(url, []).append(token_id)
+    return tokens
+
+
+def _downloader(session: aiohttp.ClientSession, max_bytes: int) -> Fetch:
+    async def fetch(url: str) -> bytes:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            if (response.content_length or 0) > max_bytes:
+                raise LogoError(f"Larger than {max_bytes} bytes")
+            data = await response.content.read(max_bytes + 1)
+            if len(data) > max_bytes:
+                raise LogoError(f"Larger than {max_bytes} bytes")
+            return data
+
+    return fetch
+
+
+async def mirror_urls(
+    urls: list[str],
+    root: Path,
+    fetch: Fetch,
+    concurrency: int,
+    job: Optional[Job] = None,
+    max_pixels: int = DEFAULT_LOGO_MAX_PIXELS,
+) -> tuple[dict[str, str], dict[str, str]]:
+    """Download and store logos, returns (logo URLs, errors) by remote URL
+
+    A logo that fails (for any reason) is recorded, the others are mirrored.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    stored: dict[str, str] = {}
+    failed: dict[str, str] = {}
+
+    async def mirror(url: str) -> None:
+        async with semaphore:
+            if job is not None:
+                job.check()
+            try:
+                data = await fetch(url)
+                # Decoding and resizing is CPU bound: off the event loop
+                stored[url] = await asyncio.to_thread(
+                    store_logo, data, root, max_pixels
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                if not isinstance(e, (aiohttp.ClientError, TimeoutError, LogoError)):
+                    log.warning("Could not mirror %s", url, exc_info=True)
+                failed[url] = str(e) or type(e).__name__
+            if job is not None:
+                job.advance()
+
+    await asyncio.gather(*(mirror(url) for url in urls))
+    return stored, failed
+
+
+async def mirror_logos(
+    db: Session,
+    root: Optional[Path] = None,
+    concurrency: Optional[int] = None,
+    limit: Optional[int] = None,
+    fetch: Optional[Fetch] = None,
+    job: Optional[Job] = None,
+) -> MirrorResult:
+    """Mirror the remote logos of the catalog and point the tokens at them"""
+    config = FastAPIConfig()
+    root = root or config.ensure_static_dir()
+    concurrency = concurrency or config.logo_concurrency
+
+    tokens = remote_logos(db, limit)
+    result = MirrorResult(urls=len(tokens))
+    if job is not None:
+        job.expect(len(tokens))
+    if not tokens:
+        return result
+
+    log.info("Mirroring %d logos (%d at a time)", len(tokens), concurrency)
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT_SECONDS),
+        connector=aiohttp.TCPConnector(limit=concurrency),
+    ) as session:
+        stored, result.failed = await mirror_urls(
+            list(tokens),
+            root,
+            fetch or _downloader(session, config.logo_max_bytes),
+            concurrency,
+            job,
+            config.logo_max_pixels,
+        )
+
+    rows = [
+        {"id": token_id, "logo_url": url}
+        for remote, url in stored.items()
+        for token_id in tokens[remote]
+    ]
+    for i in range(0, len(rows), UPDATE_CHUNK):
+        db.execute(update(Token), rows[i : i + UPDATE_CHUNK])
+    db.commit()
+    if rows:
+        catalog_version.bump()
+    result.mirrored = len(rows)
+
+    log.info(
+        "Mirrored logos of %d tokens (%d URLs failed)",
+        result.mirrored,
+        len(result.failed),
+    )
+    return result
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Mirror remote token logos")
+    parser.add_argument(
+        "--concurrency", type=int, default=None, help="concurrent downloads"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="logos to mirror")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    db = SessionLocal()
+    try:
+        result = asyncio.run(
+            mirror_logos(db, concurrency=args.concurrency, limit=args.limit)
+        )
+    finally:
+        db.close()
+    for url, error in result.failed.items():
+        log.warning("Could not mirror %s: %s", url, error)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,7 +15,9 @@ from sqlalchemy import DateTime, ForeignKey, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from qrypt.core.db import Base, get_db
-from qrypt.core.log import logger as log
+from qrypt.core.log import get_logger
+
+log = get_logger(__name__)
 
 
 def get_current_time() -> datetime:
@@ -53,8 +55,10 @@ class BlockchainPlatform(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
-    address: Mapped[str] = mapped_column(String, nullable=False)
-    token_id: Mapped[int] = mapped_column(ForeignKey("tokens.id"), nullable=False)
+    address: Mapped[str] = mapped_column(String, index=True, nullable=False)
+    token_id: Mapped[int] = mapped_column(
+        ForeignKey("tokens.id"), index=True, nullable=False
+    )
     last_updated: Mapped[datetime] = mapped_column(
         DateTime, default=get_current_time, onupdate=get_current_time
     )
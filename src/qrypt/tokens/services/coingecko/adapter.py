@@ -17,16 +17,23 @@ Adapter
 Cache
 - Cache all token symbol & related data
 
+Resilience
+- A circuit breaker per endpoint (``KE_COINGECKO_BREAKER_*``), shared by
+  the adapters of the process
+
 
 
 """
 
 from abc import ABC
 from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
 
+from qrypt.core.breaker import CircuitBreaker, circuit_breakers
 from qrypt.tokens.services.coingecko.config import CoinGeckoConfig
 from qrypt.tokens.services.coingecko.constants import (
-    BASE_URL_V3,
+    API_PATH_V3,
     DEFAULT_TIMEOUT_SECONDS,
     HEADER_ACCEPT_JSON,
 )
@@ -34,6 +41,7 @@ from qrypt.tokens.services.coingecko.strategies import (
     EndpointCoinsListStrategy,
     EndpointCoinsMarketDataStrategy,
     EndpointSimpleSupportedVsCurrenciesStrategy,
+    is_upstream_failure,
 )
 
 
@@ -72,7 +80,8 @@ class CoinGeckoAdapter:
         self.headers = headers
         self.config = CoinGeckoConfig()
 
-        if self.base_url == BASE_URL_V3:
+        # The v3 API, on api.coingecko.com or a stand-in server
+        if urlsplit(self.base_url).path.rstrip("/") == API_PATH_V3:
             # Initialize the API with the v3 endpoints
 
             # Create the API object with the v3 endpoints
@@ -85,6 +94,7 @@ class CoinGeckoAdapter:
                     method="GET",
                     headers=self.headers,
                     timeout=self.timeout,
+                    breaker=self.breaker("simple/supported_vs_currencies"),
                 ),
                 # Create the coins market data endpoint
                 coins_markets_data=EndpointCoinsMarketDataStrategy(
@@ -93,6 +103,7 @@ class CoinGeckoAdapter:
                     method="GET",
                     headers=self.headers,
                     timeout=self.timeout,
+                    breaker=self.breaker("coins/markets"),
                     params={"vs_currency": self.config.vs_currency},
                 ),
                 # Create the coins list endpoint
@@ -102,8 +113,19 @@ class CoinGeckoAdapter:
                     method="GET",
                     headers=self.headers,
                     timeout=self.timeout,
+                    breaker=self.breaker("coins/list"),
                     params={"include_platform": "true"},
                 ),
             )
         else:
             raise ValueError(f"Unsupported API URL: {self.base_url}")
+
+    def breaker(self, endpoint: str) -> Optional[CircuitBreaker]:
+        """The circuit breaker of an endpoint (None if disabled)"""
+        if not self.config.breaker_enabled:
+            return None
+        return circuit_breakers.get(
+            f"coingecko:{endpoint}",
+            is_failure=is_upstream_failure,
+            **self.config.breaker_settings(),
+        )
@@ -6,9 +6,13 @@ Qrypto - CoinGecko Service - Configuration
 
 import os
 
-from qrypt.core.config import ConfigBase
+from qrypt.core.config import ConfigBase, env_bool, load_env
 from qrypt.tokens.services.coingecko.constants import (
     BASE_URL_V3,
+    DEFAULT_BREAKER_FAILURE_RATE,
+    DEFAULT_BREAKER_MIN_CALLS,
+    DEFAULT_BREAKER_OPEN_SECONDS,
+    DEFAULT_BREAKER_WINDOW,
     DEFAULT_TIMEOUT_SECONDS,
     DEFAULT_VS_CURRENCY,
     HEADER_ACCEPT_JSON,
@@ -25,9 +29,20 @@ class CoinGeckoConfig(ConfigBase):
     headers: dict
     demo_user: bool
     vs_currency: str
+    breaker_enabled: bool
+    breaker_failure_rate: float
+    breaker_window: int
+    breaker_min_calls: int
+    breaker_open_seconds: float
 
     def __init__(self, validate: bool = True) -> None:
-        self.base_url = os.environ.get("COINGECKO_BASE_URL", BASE_URL_V3)
+        # Load .env variables (before reading them)
+        load_env()
+        # The live API, or a stand-in (eg. `fake_coingecko`) serving /api/v3
+        self.base_url = os.environ.get(
+            "KE_COINGECKO_API_BASE_URL",
+            os.environ.get("COINGECKO_BASE_URL", BASE_URL_V3),
+        )
         self.timeout = int(
             os.environ.get("KE_COINGECKO_API_TIMEOUT", DEFAULT_TIMEOUT_SECONDS)
         )  # seconds
@@ -45,6 +60,25 @@ class CoinGeckoConfig(ConfigBase):
             "KE_COINGECKO_API_VS_CURRENCY", DEFAULT_VS_CURRENCY
         )
 
+        # Per endpoint circuit breakers: fail fast while the API is failing
+        self.breaker_enabled = env_bool("KE_COINGECKO_BREAKER", True)
+        self.breaker_failure_rate = float(
+            os.environ.get(
+                "KE_COINGECKO_BREAKER_FAILURE_RATE", DEFAULT_BREAKER_FAILURE_RATE
+            )
+        )
+        self.breaker_window = int(
+            os.environ.get("KE_COINGECKO_BREAKER_WINDOW", DEFAULT_BREAKER_WINDOW)
+        )
+        self.breaker_min_calls = int(
+            os.environ.get("KE_COINGECKO_BREAKER_MIN_CALLS", DEFAULT_BREAKER_MIN_CALLS)
+        )
+        self.breaker_open_seconds = float(
+            os.environ.get(
+                "KE_COINGECKO_BREAKER_OPEN_SECONDS", DEFAULT_BREAKER_OPEN_SECONDS
+            )
+        )
+
         super().__init__(validate=validate)
 
     def validate(self):
@@ -67,3 +101,18 @@ class CoinGeckoConfig(ConfigBase):
             raise NotImplementedError(
                 "API key is only supported for DEMO account users"
             )
+        if not 0 < self.breaker_failure_rate <= 1:
+            raise ValueError("Breaker failure rate must be in (0, 1]")
+        if not 1 <= self.breaker_min_calls <= self.breaker_window:
+            raise ValueError("Breaker minimum calls must be in [1, window]")
+        if self.breaker_open_seconds <= 0:
+            raise ValueError("Breaker open seconds must be greater than 0")
+
+    def breaker_settings(self) -> dict:
+        """Settings of the per endpoint circuit breakers"""
+        return {
+            "failure_rate": self.breaker_failure_rate,
+            "window": self.breaker_window,
+            "min_calls": self.breaker_min_calls,
+            "open_seconds": self.breaker_open_seconds,
+        }
@@ -1,10 +1,18 @@
 # Declare constants
-BASE_URL_V3: str = "https://api.coingecko.com/api/v3"
+API_PATH_V3: str = "/api/v3"
+BASE_URL_V3: str = f"https://api.coingecko.com{API_PATH_V3}"
 DEFAULT_TIMEOUT_SECONDS: int = 10
 HEADER_ACCEPT_JSON: dict = {
     "accept": "application/json",
     "User-Agent": "Qrypto (PY) <chris@calmrat.com>",
 }
+# Compressed responses (decoded by the strategies)
+ACCEPT_ENCODING: str = "gzip, deflate"
 DEFAULT_VS_CURRENCY = "usd"
 TTL_60_MINUTES: int = 60 * 60
 TTL_30_SECONDS: int = 30
+# Circuit breaker (per endpoint)
+DEFAULT_BREAKER_FAILURE_RATE: float = 0.5
+DEFAULT_BREAKER_WINDOW: int = 20
+DEFAULT_BREAKER_MIN_CALLS: int = 5
+DEFAULT_BREAKER_OPEN_SECONDS: float = 30.0
@@ -7,18 +7,26 @@ This module contains the operations for pulling tokens from the CoinGecko API.
 """
 
 import asyncio
+from contextlib import nullcontext
 from typing import Optional, Tuple
 
-from sqlalchemy.exc import IntegrityError
-
 # from sqlalchemy import insert, select, update
 # from sqlalchemy.orm import Session
+from qrypt.core.breaker import DATA_STALE, data_freshness
 from qrypt.core.db import SessionLocal, get_db
-from qrypt.core.log import logger as log
+from qrypt.core.jobs import Job
+from qrypt.core.log import configure_logging, get_logger
+from qrypt.tokens.loaders import TokenRecord, load_tokens
 from qrypt.tokens.models import BlockchainPlatform, Token, get_all
 from qrypt.tokens.services.coingecko.adapter import CoinGeckoAdapter
 from qrypt.tokens.services.coingecko.config import CoinGeckoConfig
 from qrypt.tokens.services.coingecko.schema import TokenOut
+from qrypt.tokens.services.coingecko.strategies import (
+    UPSTREAM_ERRORS,
+    is_upstream_unavailable,
+)
+
+log = get_logger(__name__)
 
 
 async def create_token(symbol: str, name: str, logo_url: str) -> None:
@@ -47,9 +55,20 @@ async def create_token(symbol: str, name: str, logo_url: str) -> None:
         db.close()  # always close session
 
 
-def pull_tokens() -> Tuple[list, list]:
-    """Pull tokens from CoinGecko API and insert them into the database."""
+def pull_tokens(job: Optional[Job] = None) -> Tuple[list, list]:
+    """Pull tokens from CoinGecko API and insert them into the database.
+
+    Run as a background `job`, the fetch and load phases are timed, the
+    loaded rows reported, and a cancelled job rolls the load back.
 
+    While CoinGecko is unavailable, the last (expired) cached coins list is
+    synced, or without one the catalog is kept as it is.
+    """
+
+    def phase(name: str):
+        return job.phase(name) if job is not None else nullcontext()
+
+    configure_logging()
     log.debug("Pulling tokens from CoinGecko API")
     config = CoinGeckoConfig()
 
@@ -62,9 +81,29 @@ def pull_tokens() -> Tuple[list, list]:
     client = CoinGeckoAdapter(
         base_url=config.base_url, timeout=config.timeout, headers=config.headers
     )
-    log.debug(f"{client.base_url=}, {client.timeout=}, {client.headers=}")
+    log.debug(
+        "Client: base_url=%s, timeout=%s, headers=%s",
+        client.base_url,
+        client.timeout,
+        client.headers,
+    )
 
-    _tokens = asyncio.run(client.api.coins_list())
+    with phase("fetch"):
+        try:
+            _tokens = asyncio.run(client.api.coins_list())
+        except UPSTREAM_ERRORS as e:
+            if not is_upstream_unavailable(e):
+                raise
+            log.warning(
+                "CoinGecko unavailable (%s: %s), keeping the catalog as is",
+                type(e).__name__,
+                e,
+            )
+            return [], []
+
+    freshness = data_freshness.get("coins_list")
+    if freshness is not None and freshness.source == DATA_STALE:
+        log.warning("Syncing a stale coins list (%.0fs old)", freshness.age)
 
     if not _tokens:
         log.warning("No tokens found in the response")
@@ -75,54 +114,23 @@ def pull_tokens() -> Tuple[list, list]:
     # Get a session
     db = next(get_db())
 
-    # Prepare tokens for insertion
-    added = []
-    skipped = []
+    # Load the whole list in one transaction (COPY + merge on PostgreSQL)
     log.debug("Syncing Coingecko Token Data")
-    k = 0
-    _skip = False
-    for token in _tokens:
-        if k % 500 == 0:
-            log.debug("Processing token %d of %d", k, len(_tokens))
-        k += 1
-
-        _platforms = token.get("platforms", {})
-
-        _platforms = [
-            BlockchainPlatform(name=platform, address=address)
-            for platform, address in _platforms.items()
-        ]
-
-        _token = Token(
-            ext_id=str(token["id"]),
-            symbol=str(token["symbol"]),
-            name=str(token["name"]),
-            platforms=_platforms,
-            logo_url=token.get("image", "/static/images/coin-logo.png"),
-        )
-        # Let's track all the tokens, even if they are not added to the database
+    if job is not None:
+        job.expect(len(_tokens))
+    try:
+        with phase("load"):
+            result = load_tokens(
+                db,
+                (TokenRecord.from_coingecko(t) for t in _tokens),
+                progress=job.advance if job is not None else None,
+            )
+    finally:
+        db.close()
 
-        db.add(_token)
-        try:
-            db.commit()
-            added.append(_token)
-        except IntegrityError:
-            if not _skip:
-                log.debug(
-                    "⚠️ Some Tokens already exists, skipping, eg [%s] %s",
-                    _token.ext_id,
-                    _token.symbol,
-                )
-                _skip = True
-            db.rollback()
-            skipped.append(_token)
-            continue
-
-        # FIXED: # THIS SLOWS THINGS DOWN! No need for refreshing here.
-        # db.refresh(_token)
-
-    # close the session
-    db.close()
+    added, skipped = result.added, result.skipped
+    if skipped:
+        log.debug("⚠️ Some Tokens already exists, skipping, eg %s", skipped[0])
 
     log.debug("Inserted %d tokens", len(added))
     log.debug("Skipped %d tokens", len(skipped))
@@ -9,9 +9,9 @@ It defines the data models and their relationships using SQLAlchemy and Pydantic
 """
 
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
 
 class TokenBase(BaseModel):
@@ -36,3 +36,131 @@ class TokenOut(TokenBase):
         # in the response models
         # * 'orm_mode' has been renamed to 'from_attributes' in v2
         from_attributes = True
+
+
+class TokenCandidate(BaseModel):
+    """Token model for Autocomplete Output"""
+
+    id: int
+    symbol: str
+    name: str
+    match: str
+
+
+class AddressQuery(BaseModel):
+    """Contract address to look up (on any platform if none is given)"""
+
+    platform: Optional[str] = None
+    address: str = Field(..., min_length=1)
+
+
+class AddressLookupRequest(BaseModel):
+    """Batch of contract addresses to look up"""
+
+    items: list[AddressQuery]
+
+
+class AddressMatchOut(BaseModel):
+    """Token found at a contract address"""
+
+    platform: str
+    address: str
+    token_id: int
+    symbol: str
+    name: str
+
+
+class AddressLookupOut(BaseModel):
+    """Lookup result for one requested contract address"""
+
+    platform: Optional[str] = None
+    address: str
+    matches: list[AddressMatchOut]
+
+
+class TokenCreate(BaseModel):
+    """Token model for Create Input"""
+
+    symbol: str = Field(..., min_length=1)
+    name: str = Field(..., min_length=1)
+    logo_url: Optional[str] = None
+    platforms: dict[str, str] = Field(default_factory=dict)
+
+
+class TokenUpdate(BaseModel):
+    """Token model for Update Input (unset fields are left unchanged)"""
+
+    id: int
+    symbol: Optional[str] = Field(None, min_length=1)
+    name: Optional[str] = Field(None, min_length=1)
+    logo_url: Optional[str] = None
+    platforms: Optional[dict[str, str]] = None
+
+    @field_validator("symbol", "name")
+    @classmethod
+    def not_null(cls, value: Optional[str]) -> str:
+        """The columns are NOT NULL: omitted is unchanged, null is invalid"""
+        if value is None:
+            raise ValueError("may be omitted, but not null")
+        return value
+
+
+class TokenBatchIds(BaseModel):
+    """Batch of token ids"""
+
+    ids: list[int]
+
+
+class TokenBatchItems(BaseModel):
+    """Batch of token items (validated per item)"""
+
+    items: list[dict]
+
+
+class TokenBatchItemOut(BaseModel):
+    """Result for one item of a batch"""
+
+    index: int
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+    token: Optional[TokenOut] = None
+
+
+class TokenBatchOut(BaseModel):
+    """Batch results, one per requested item, in request order"""
+
+    succeeded: int
+    failed: int
+    results: list[TokenBatchItemOut]
+
+
+class LogoOut(BaseModel):
+    """A stored logo"""
+
+    logo_url: str
+
+
+class JobOut(BaseModel):
+    """A background job's progress (and result summary, once finished)"""
+
+    id: str
+    name: str
+    state: str
+    cancel_requested: bool
+    phase: Optional[str] = None
+    phases: dict[str, float]
+    done: int
+    total: Optional[int] = None
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    elapsed_seconds: float
+    error: Optional[str] = None
+    result: Optional[dict[str, Any]] = None
+
+
+class JobStartOut(BaseModel):
+    """A job start request: whether it started, or one was already running"""
+
+    started: bool
+    job: JobOut
@@ -11,11 +11,27 @@ Simple (Free) Endpoints:
 * simple/supported_vs_currencies
 * coins/markets
 
+Calls go through a per endpoint circuit breaker (see `qrypt.core.breaker`):
+while the API is failing they fail fast, and the response cache serves its
+expired (stale) data instead, if it has any.
+
+Refreshing an expired cache entry is a conditional request: its validators
+(``ETag``, ``Last-Modified``) are sent, and a 304 (not modified) only
+extends the entry's TTL. Responses are requested compressed; the bytes on
+the wire, and the bytes saved, are counted by endpoint.
+
 """
 
+import gzip
+import hashlib
 import json
+import logging
 import os
+import time
+import zlib
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
@@ -23,51 +39,160 @@ from typing import Optional
 
 import aiohttp
 
-from qrypt.core.log import logger as log
+from qrypt.core.breaker import (
+    DATA_CACHE,
+    DATA_LIVE,
+    DATA_STALE,
+    CircuitBreaker,
+    CircuitOpenError,
+    data_freshness,
+)
+from qrypt.core.log import get_logger
+from qrypt.core.metrics import (
+    upstream_bytes,
+    upstream_bytes_saved,
+    upstream_cache,
+    upstream_duration,
+)
 from qrypt.tokens.services.coingecko.constants import (
+    ACCEPT_ENCODING,
     DEFAULT_TIMEOUT_SECONDS,
     HEADER_ACCEPT_JSON,
     TTL_60_MINUTES,
 )
 
+log = get_logger(__name__)
+
 type EndpointResponse = Optional[list[dict]]
 
-if not Path("./localcache/").exists():
-    os.makedirs(Path("./localcache/"), exist_ok=True)
+# Errors of the API calls: those of an unavailable API (see
+# `is_upstream_unavailable`) are served stale from the cache when possible
+UPSTREAM_ERRORS = (CircuitOpenError, aiohttp.ClientError, TimeoutError)
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Whether an error counts against the API (not eg. a bad request)"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, TimeoutError))
+
 
+def is_upstream_unavailable(error: Exception) -> bool:
+    """Whether the API is unavailable (an open circuit, or a failure), rather
+    than refusing the request (eg. a bad API key): only then is stale data
+    better than the error"""
+    return isinstance(error, CircuitOpenError) or is_upstream_failure(error)
 
-def cached_token(key: str, jsonfile: Path, ttl: int = TTL_60_MINUTES):
+
+@dataclass(slots=True)
+class Revalidation:
+    """The validators of a cached response, for a conditional request
+
+    `_get` sends them, and updates them (and `not_modified`, on a 304) from
+    the response.
+    """
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # The (decoded) size of the cached response, not downloaded again on a 304
+    size: int = 0
+    not_modified: bool = False
+
+    def headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+# The revalidation of the cache entry being refreshed (set by `cached_token`)
+revalidation: ContextVar[Optional[Revalidation]] = ContextVar(
+    "coingecko_revalidation", default=None
+)
+
+
+def decode_body(body: bytes, encoding: str) -> bytes:
+    """A response body, decompressed as its Content-Encoding says"""
+    encoding = encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        # zlib wrapped as the spec says, raw deflate as some servers send
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+
+def params_key(key: str, params: Optional[dict]) -> str:
+    """The cache key of a request's parameters (stable across processes)"""
+    encoded = json.dumps(params or {}, sort_keys=True, default=str).encode()
+    return f"{key}:{hashlib.sha256(encoded).hexdigest()[:16]}"
+
+
+def cached_token(
+    key: str, jsonfile: Path, ttl: int = TTL_60_MINUTES, by_params: bool = False
+):
     """
     Decorator to cache the token in a JSON file.
-    :param jsonfile: The JSON file to cache the token in
+    :param jsonfile: The JSON file to cache the token in (shared by keys)
+    :param by_params: One entry per request parameters (pages, ids, ...)
+        rather than per endpoint; metrics and freshness stay per `key`
     :return: The decorator
     """
 
-    def load(key):
+    def load(key) -> dict:
         with open(jsonfile, mode="r", encoding="utf8") as f:
             cache = json.load(f)
-            _data = cache.get(key, {})
-            data, ctime = _data.get("data"), _data.get("ctime")
-            if not data:
+            entry = cache.get(key, {})
+            if not entry.get("data"):
                 raise ValueError(f"Cache for {key} not found in {jsonfile}")
-            if not ctime:
+            if not entry.get("ctime"):
                 raise ValueError(f"Cache for {key} has no ctime in {jsonfile}")
-            return (data, ctime)
-
-    def save(data):
-        ctime = datetime.now(timezone.utc).timestamp()
-        with open(jsonfile, mode="w", encoding="utf8") as f:
-            json.dump({key: {"data": data, "ctime": ctime}}, f)
+            return entry
+
+    def save(key, data, validators: Revalidation):
+        entry = {
+            "data": data,
+            "ctime": datetime.now(timezone.utc).timestamp(),
+            "etag": validators.etag,
+            "last_modified": validators.last_modified,
+            "size": validators.size,
+        }
+        jsonfile.parent.mkdir(parents=True, exist_ok=True)
+        # The other keys' entries are kept
+        try:
+            with open(jsonfile, mode="r", encoding="utf8") as f:
+                cache = json.load(f)
+        except (FileNotFoundError, ValueError):
+            cache = {}
+        cache[key] = entry
+        tmp = jsonfile.with_name(f".{jsonfile.name}.{os.getpid()}.tmp")
+        with open(tmp, mode="w", encoding="utf8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, jsonfile)
         return data
 
     def decorator(fn):
         async def wrapped(*args, **kwargs):
+            entry_key = key
+            if by_params:
+                params = kwargs.get("params", args[1] if len(args) > 1 else None)
+                entry_key = params_key(key, params)
+            entry = None
             if jsonfile.exists():
                 try:
-                    data, ctime = load(key)
+                    entry = load(entry_key)
                 except ValueError as e:
                     log.debug("Cache not found: %s", e)
+                    upstream_cache.inc(key, "miss")
                 else:
+                    data, ctime = entry["data"], entry["ctime"]
                     lifespan = datetime.now(timezone.utc).timestamp() - ctime
                     is_valid = lifespan < ttl
                     log.debug("Cache lifespan: %s", lifespan)
@@ -78,11 +203,54 @@ def cached_token(key: str, jsonfile: Path, ttl: int = TTL_60_MINUTES):
                     # Check if the data exists, and is still valid
                     if data and is_valid:
                         log.debug("🎯 | HIT - Loading from CACHE")
+                        upstream_cache.inc(key, "hit")
+                        data_freshness.record(key, DATA_CACHE, ctime)
                         return data
+                    upstream_cache.inc(key, "expired")
+            else:
+                upstream_cache.inc(key, "miss")
 
             log.debug("⚡️ | MISS - Loading from LIVE API")
-            res = await fn(*args, **kwargs)
-            return save(res)
+            validators = (
+                Revalidation(
+                    etag=entry.get("etag"),
+                    last_modified=entry.get("last_modified"),
+                    size=entry.get("size") or 0,
+                )
+                if entry
+                else Revalidation()
+            )
+            token = revalidation.set(validators)
+            try:
+                res = await fn(*args, **kwargs)
+            except UPSTREAM_ERRORS as e:
+                if entry is None or not is_upstream_unavailable(e):
+                    raise
+                data, ctime = entry["data"], entry["ctime"]
+                age = datetime.now(timezone.utc).timestamp() - ctime
+                log.warning(
+                    "CoinGecko unavailable (%s: %s), serving %s cached %.0fs ago",
+                    type(e).__name__,
+                    e,
+                    key,
+                    age,
+                )
+                upstream_cache.inc(key, "stale")
+                data_freshness.record(
+                    key, DATA_STALE, ctime, f"{type(e).__name__}: {e}"
+                )
+                return data
+            finally:
+                revalidation.reset(token)
+            if validators.not_modified and entry is not None:
+                log.debug("♻️ | NOT MODIFIED - Extending the CACHE TTL")
+                upstream_cache.inc(key, "revalidated")
+                res = entry["data"]
+            res = save(entry_key, res, validators)
+            data_freshness.record(
+                key, DATA_LIVE, datetime.now(timezone.utc).timestamp()
+            )
+            return res
 
         return wrapped
 
@@ -102,6 +270,7 @@ class EndpointStrategyBase(ABC):
     params: dict = field(default_factory=dict)
     data: dict = field(default_factory=dict)
     timeout: int = DEFAULT_TIMEOUT_SECONDS
+    breaker: Optional[CircuitBreaker] = None
 
     @property
     def url(self) -> str:
@@ -144,28 +313,73 @@ class EndpointStrategyBase(ABC):
         :param timeout: The timeout for the request
         :return: The response from the endpoint
         """
-        log.debug("Calling GET on endpoint")
-
-        headers = headers if headers else HEADER_ACCEPT_JSON
-
-        log.debug("URL: %s", self.url)
-        log.debug("Headers: %s", headers)
-        log.debug("Params: %s", params)
-        log.debug("Data: %s", data)
-        log.debug("Timeout: %s", timeout)
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
+        headers = {
+            **(headers if headers else HEADER_ACCEPT_JSON),
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
+        validators = revalidation.get()
+        if validators is not None:
+            headers.update(validators.headers())
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(
+                "GET %s (headers: %s, params: %s, data: %s, timeout: %s)",
                 self.url,
-                headers=headers,
-                params=params,
-                timeout=aiohttp.ClientTimeout(timeout),
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    log.debug("Error: %s - %s", response.status, response.reason)
-                    response.raise_for_status()
+                headers,
+                params,
+                data,
+                timeout,
+            )
+
+        # Fails fast (CircuitOpenError) while the endpoint is failing
+        with self.breaker.guard() if self.breaker is not None else nullcontext():
+            start, status = time.perf_counter(), "error"
+            try:
+                # Decompressed here, to count the bytes on the wire
+                async with aiohttp.ClientSession(auto_decompress=False) as session:
+                    async with session.get(
+                        self.url,
+                        headers=headers,
+                        params=params,
+                        timeout=aiohttp.ClientTimeout(timeout),
+                    ) as response:
+                        status = str(response.status)
+                        if response.status == 304 and validators is not None:
+                            validators.not_modified = True
+                            upstream_bytes_saved.inc(
+                                self.endpoint, "not_modified", amount=validators.size
+                            )
+                            return None
+                        if response.status == 200:
+                            wire = await response.read()
+                            body = decode_body(
+                                wire, response.headers.get("Content-Encoding", "")
+                            )
+                            upstream_bytes.inc(self.endpoint, "wire", amount=len(wire))
+                            upstream_bytes.inc(
+                                self.endpoint, "decoded", amount=len(body)
+                            )
+                            upstream_bytes_saved.inc(
+                                self.endpoint,
+                                "compression",
+                                amount=max(len(body) - len(wire), 0),
+                            )
+                            if validators is not None:
+                                validators.etag = response.headers.get("ETag")
+                                validators.last_modified = response.headers.get(
+                                    "Last-Modified"
+                                )
+                                validators.size = len(body)
+                            return json.loads(body)
+                        else:
+                            log.debug(
+                                "Error: %s - %s", response.status, response.reason
+                            )
+                            response.raise_for_status()
+            finally:
+                upstream_duration.observe(
+                    time.perf_counter() - start, self.endpoint, status
+                )
         return None
 
     @abstractmethod
@@ -221,7 +435,12 @@ class EndpointCoinsMarketDataStrategy(EndpointStrategyBase):
     :param params: The parameters to send with the request (required: vs_currency)
     """
 
-    @cached_token("coins_marketa_data", Path("./localcache/service_coingecko.json"))
+    # One cache entry (and validators) per page / ids
+    @cached_token(
+        "coins_marketa_data",
+        Path("./localcache/service_coingecko.json"),
+        by_params=True,
+    )
     async def fetch(
         self,
         params: dict = dict(),
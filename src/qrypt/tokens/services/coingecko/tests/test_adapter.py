@@ -7,9 +7,27 @@ This module contains the tests for the CoinGecko service for the Krypto Explorer
 
 """
 
+import asyncio
+import json
+from pathlib import Path
+
+import aiohttp
 import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
 
+from qrypt.benchmarks.fake_coingecko import FakeCoinGecko, Faults, serve
+from qrypt.benchmarks.fixtures import synthetic_coins_list
+from qrypt.core.api import router as system_router
+from qrypt.core.auth import require_admin
+from qrypt.core.breaker import DATA_STALE, circuit_breakers, data_freshness
+from qrypt.core.db import SessionLocal, reset_engines
+from qrypt.core.metrics import upstream_bytes_saved
+from qrypt.core.ops.db import init_db
+from qrypt.tokens.models import Token
 from qrypt.tokens.services.coingecko.adapter import CoinGeckoAdapter
+from qrypt.tokens.services.coingecko.ops.admin import pull_tokens
 
 
 @pytest.fixture
@@ -99,3 +117,174 @@ async def test_coingecko_adapter__coins_list(client):
     # Check if the response contains expected keys
     assert "id" in response[0]
     assert "symbol" in response[0]
+
+
+@pytest.fixture
+def fake_api(tmp_path, monkeypatch):
+    """A fake CoinGecko API (and a scratch directory for the response cache)"""
+    monkeypatch.chdir(tmp_path)
+    circuit_breakers.clear()
+    data_freshness.clear()
+    fake = FakeCoinGecko(synthetic_coins_list(200))
+    with serve(fake) as base_url:
+        monkeypatch.setenv("KE_COINGECKO_API_BASE_URL", base_url)
+        yield fake, base_url
+    circuit_breakers.clear()
+    data_freshness.clear()
+
+
+def test_coingecko_adapter__fake_api(fake_api):
+    fake, base_url = fake_api
+    client = CoinGeckoAdapter(base_url=base_url, timeout=1, headers={})
+
+    coins = asyncio.run(client.api.coins_list())
+    assert [coin["id"] for coin in coins] == [coin["id"] for coin in fake.coins]
+    # Cached
+    asyncio.run(client.api.coins_list())
+    assert fake.stats["requests.coins/list"] == 1
+
+    endpoint = client.api.coins_markets_data
+    fake.faults = Faults(rate_limit_rate=1.0)
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(endpoint._get(params=endpoint.params, timeout=1))
+    assert error.value.status == 429
+    fake.faults = Faults(timeout_rate=1.0, hang_seconds=5)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(endpoint._get(params=endpoint.params, timeout=1))
+
+
+def test_pull_tokens__fake_api(fake_api, tmp_path, monkeypatch):
+    monkeypatch.setenv("KE_DATABASE_URL", f"sqlite:///{tmp_path / 'tokens.db'}")
+    reset_engines()
+    try:
+        init_db()
+        added, skipped = pull_tokens()
+        assert (len(added), skipped) == (200, [])
+        with SessionLocal() as db:
+            assert db.scalar(select(func.count(Token.id))) == 200
+    finally:
+        monkeypatch.undo()
+        reset_engines()
+
+
+def test_coingecko_adapter__circuit_breaker(fake_api, monkeypatch):
+    fake, base_url = fake_api
+    monkeypatch.setenv("KE_COINGECKO_BREAKER_WINDOW", "2")
+    monkeypatch.setenv("KE_COINGECKO_BREAKER_MIN_CALLS", "2")
+    client = CoinGeckoAdapter(base_url=base_url, timeout=1, headers={})
+    coins = asyncio.run(client.api.coins_list())
+
+    # The cache expired, then the API fails: the expired data is served
+    cache_file = Path("localcache/service_coingecko.json")
+    cache = json.loads(cache_file.read_text())
+    cache["coins_list"]["ctime"] -= 24 * 60 * 60
+    cache_file.write_text(json.dumps(cache))
+    fake.faults = Faults(rate_limit_rate=1.0)
+    assert asyncio.run(client.api.coins_list()) == coins
+    assert data_freshness.get("coins_list").source == DATA_STALE
+
+    # Half the last 2 calls failed, the circuit is open: no more calls (until
+    # it half opens)
+    assert asyncio.run(client.api.coins_list()) == coins
+    assert fake.stats["requests.coins/list"] == 2
+
+    system = FastAPI()
+    system.include_router(system_router)
+    system.dependency_overrides[require_admin] = lambda: None
+    status = TestClient(system).get("/api/v1/system/upstream")
+    circuit = status.json()["circuits"]["coingecko:coins/list"]
+    assert (circuit["state"], circuit["rejected"]) == ("open", 1)
+    assert status.json()["data"]["coins_list"]["stale"]
+
+    # Nothing to fall back to: the catalog is kept as it is
+    cache_file.unlink()
+    assert pull_tokens() == ([], [])
+
+
+def test_coingecko_adapter__refused_requests_are_not_served_stale(fake_api):
+    fake, base_url = fake_api
+    client = CoinGeckoAdapter(base_url=base_url, timeout=1, headers={})
+    asyncio.run(client.api.coins_list())
+
+    cache_file = Path("localcache/service_coingecko.json")
+    cache = json.loads(cache_file.read_text())
+    cache["coins_list"]["ctime"] -= 24 * 60 * 60
+    cache_file.write_text(json.dumps(cache))
+    # An invalid API key: the error surfaces, even with expired data cached
+    fake.faults = Faults(unauthorized_rate=1.0)
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(client.api.coins_list())
+    assert error.value.status == 401
+    with pytest.raises(aiohttp.ClientResponseError):
+        pull_tokens()
+    assert circuit_breakers.status()["coingecko:coins/list"]["state"] == "closed"
+
+
+def test_coingecko_adapter__conditional_refresh(fake_api):
+    fake, base_url = fake_api
+    client = CoinGeckoAdapter(base_url=base_url, timeout=1, headers={})
+    saved = upstream_bytes_saved.values()
+    currencies = asyncio.run(client.api.simple_supported_vs_currencies())
+    coins = asyncio.run(client.api.coins_list())
+
+    # Both entries are kept, with their validators
+    cache_file = Path("localcache/service_coingecko.json")
+    cache = json.loads(cache_file.read_text())
+    assert cache["simple_supported_vs_currencies"]["data"] == currencies
+    entry = cache["coins_list"]
+    assert entry["etag"] and entry["last_modified"] and entry["size"] > 0
+    # Sent gzip'd
+    assert fake.stats["bytes_sent"] < entry["size"]
+
+    # The cache expired, the data did not change: 304, the TTL is extended
+    entry["ctime"] -= 24 * 60 * 60
+    cache_file.write_text(json.dumps(cache))
+    assert asyncio.run(client.api.coins_list()) == coins
+    assert fake.stats["not_modified"] == 1
+    refreshed = json.loads(cache_file.read_text())["coins_list"]
+    assert refreshed["ctime"] > entry["ctime"] + 60 * 60
+    assert refreshed["etag"] == entry["etag"]
+
+    after = upstream_bytes_saved.values()
+    for reason in ("compression", "not_modified"):
+        labels = ("coins/list", reason)
+        assert after[labels] > saved.get(labels, 0)
+
+    # Changed data (another entity tag): downloaded again
+    refreshed["ctime"] -= 24 * 60 * 60
+    refreshed["etag"] = '"outdated"'
+    cache_file.write_text(json.dumps({"coins_list": refreshed}))
+    assert asyncio.run(client.api.coins_list()) == coins
+    assert fake.stats["not_modified"] == 1
+    assert fake.stats["requests.coins/list"] == 3
+
+
+def test_coingecko_adapter__markets_cached_per_params(fake_api):
+    fake, base_url = fake_api
+    client = CoinGeckoAdapter(base_url=base_url, timeout=1, headers={})
+    endpoint = client.api.coins_markets_data
+
+    def page(n: int) -> list:
+        params = {**endpoint.params, "per_page": 10, "page": n}
+        return asyncio.run(endpoint.fetch(params=params))
+
+    first, second = page(1), page(2)
+    assert first != second
+    assert page(1) == first and page(2) == second
+    assert fake.stats["requests.coins/markets"] == 2
+
+    # Expired: each page is revalidated with its own validators
+    cache_file = Path("localcache/service_coingecko.json")
+    cache = json.loads(cache_file.read_text())
+    for entry in cache.values():
+        entry["ctime"] -= 24 * 60 * 60
+    cache_file.write_text(json.dumps(cache))
+    assert page(2) == second and page(1) == first
+    assert fake.stats["not_modified"] == 2
+
+
+def test_coingecko_adapter__unsupported_api():
+    with pytest.raises(ValueError, match="Unsupported API URL"):
+        CoinGeckoAdapter(
+            base_url="https://api.coingecko.com/api/v2", timeout=1, headers={}
+        )
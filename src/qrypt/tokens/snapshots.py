@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Response Snapshots
+
+This module contains an in-memory store of pre-rendered (and pre-compressed)
+response bodies for hot token queries: the full catalog, its first pages and
+recently requested token detail pages.
+
+Snapshots are keyed by catalog version. The store holds the entries of a
+single version; the first write for a newer version swaps in a fresh set of
+entries in one assignment, so a request never sees a mix of versions, and
+lookups for an older version simply miss.
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from qrypt.core.log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_SNAPSHOT_MAX_ENTRIES: int = 1024
+# Don't bother compressing tiny bodies
+GZIP_MIN_BYTES: int = 512
+GZIP_LEVEL: int = 6
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """A pre-rendered response"""
+
+    body: bytes
+    gzip_body: Optional[bytes]
+    headers: dict[str, str]
+
+
+def render_snapshot(
+    adapter: TypeAdapter,
+    content: Any,
+    headers: dict[str, str],
+    compress: bool = True,
+) -> Snapshot:
+    """Render the response body once (JSON bytes, optionally gzipped)"""
+    body = adapter.dump_json(content)
+    gzip_body = None
+    if compress and len(body) >= GZIP_MIN_BYTES:
+        gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return Snapshot(body=body, gzip_body=gzip_body, headers=headers)
+
+
+def accepts_gzip(request: Request) -> bool:
+    """Whether the client accepts a gzip encoded response"""
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+def snapshot_response(request: Request, snapshot: Snapshot) -> Response:
+    """Serve a snapshot, compressed when the client accepts it"""
+    headers = {**snapshot.headers, "Vary": "Accept-Encoding"}
+    body = snapshot.body
+    if snapshot.gzip_body is not None and accepts_gzip(request):
+        body = snapshot.gzip_body
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class SnapshotStore:
+    """Versioned, size bounded (LRU) store of response snapshots"""
+
+    def __init__(self, max_entries: int = DEFAULT_SNAPSHOT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._entries: OrderedDict[Hashable, Snapshot] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, version: str, key: Hashable) -> Optional[Snapshot]:
+        """Get the snapshot for a key at a catalog version"""
+        with self._lock:
+            if version != self._version:
+                return None
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+            return snapshot
+
+    def put(self, version: str, key: Hashable, snapshot: Snapshot) -> None:
+        """Store the snapshot for a key at a catalog version"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                # A new catalog version invalidates everything at once
+                log.debug("Snapshots invalidated (version %s)", version)
+                self._version = version
+                self._entries = OrderedDict()
+            self._entries[key] = snapshot
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resize(self, max_entries: int) -> None:
+        """Keep at most `max_entries` snapshots (0 disables them)"""
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max(max_entries, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all snapshots"""
+        with self._lock:
+            self._version = None
+            self._entries = OrderedDict()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Tokens - Test Fixtures
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from qrypt.core.db import Base, get_config, get_db
+from qrypt.core.jobs import JobManager
+from qrypt.main import app
+from qrypt.tokens import api
+from qrypt.tokens.api import get_catalog_db, snapshots
+
+ADMIN = {"X-Admin-Key": "secret"}
+
+
+@pytest.fixture
+def db_engine():
+    """In-memory SQLite engine with all tables created"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    """Database session bound to the in-memory engine"""
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db_engine):
+    """API test client using the in-memory database"""
+    SessionTest = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    def get_test_db():
+        db = SessionTest()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_catalog_db] = get_test_db
+    snapshots.clear()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def api_env(monkeypatch, tmp_path):
+    """An admin key, a scratch static directory and no past jobs"""
+    monkeypatch.setenv("KE_ADMIN_API_KEY", ADMIN["X-Admin-Key"])
+    monkeypatch.setenv("KE_API_STATIC_DIR", str(tmp_path))
+    monkeypatch.setenv("KE_API_LOGO_MAX_BYTES", "10000")
+    monkeypatch.setattr(api, "jobs", JobManager())
+    get_config.cache_clear()
+    yield tmp_path
+    monkeypatch.undo()
+    get_config.cache_clear()
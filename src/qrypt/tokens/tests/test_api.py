@@ -3,3 +3,286 @@
 """
 Qrypto - Token API - Tests
 """
+
+import io
+import time
+
+from PIL import Image
+
+from qrypt.core.jobs import JOB_SUCCEEDED
+from qrypt.tokens import api
+from qrypt.tokens.api import snapshots
+from qrypt.tokens.catalog import catalog_version
+from qrypt.tokens.crud import TOKEN_FIELDS
+from qrypt.tokens.index import token_index
+from qrypt.tokens.models import BlockchainPlatform, Token
+from qrypt.tokens.tests.conftest import ADMIN
+
+USDC_ETH = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+
+
+def test_autocomplete_tokens(client):
+    token_index.build([(1, "eth", "Ethereum"), (2, "usdc", "USD Coin")])
+
+    response = client.get("/api/v1/tokens/autocomplete", params={"q": "usd"})
+
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()] == [2]
+    assert response.json()[0]["symbol"] == "usdc"
+
+
+def test_tokens_by_address(client, db_session):
+    db_session.add(
+        Token(
+            ext_id="usd-coin",
+            symbol="usdc",
+            name="USD Coin",
+            platforms=[
+                BlockchainPlatform(name="ethereum", address=USDC_ETH.lower()),
+                BlockchainPlatform(name="solana", address="EPjFWdd5AufqSSqeM2q"),
+            ],
+        )
+    )
+    db_session.commit()
+
+    # Checksum form resolves to the lowercase stored address
+    response = client.get(
+        "/api/v1/tokens/by-address",
+        params={"address": USDC_ETH, "platform": "Ethereum"},
+    )
+    assert response.status_code == 200
+    assert [m["symbol"] for m in response.json()["matches"]] == ["usdc"]
+
+    response = client.post(
+        "/api/v1/tokens/by-address",
+        json={
+            "items": [
+                {"platform": "solana", "address": "EPjFWdd5AufqSSqeM2q"},
+                {"platform": "solana", "address": "epjfwdd5aufqssqem2q"},
+                {"platform": "polygon-pos", "address": USDC_ETH},
+                {"address": USDC_ETH},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert [len(r["matches"]) for r in response.json()] == [1, 0, 0, 1]
+
+
+def test_token_crud(client):
+    response = client.post(
+        "/api/v1/tokens/",
+        json={"symbol": "btc", "name": "Bitcoin", "platforms": {"bitcoin": "-"}},
+    )
+    assert response.status_code == 201
+    token_id = response.json()["id"]
+
+    response = client.put(f"/api/v1/tokens/{token_id}", json={"name": "Bitcoin!"})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Bitcoin!"
+    assert response.json()["platforms"] == {"bitcoin": "-"}
+
+    assert client.get(f"/api/v1/tokens/{token_id}").json()["name"] == "Bitcoin!"
+    assert [t["id"] for t in client.get("/api/v1/tokens/").json()] == [token_id]
+
+    assert client.delete(f"/api/v1/tokens/{token_id}").status_code == 204
+    assert client.get(f"/api/v1/tokens/{token_id}").status_code == 404
+    assert client.delete(f"/api/v1/tokens/{token_id}").status_code == 404
+
+
+def test_token_batches(client):
+    response = client.post(
+        "/api/v1/tokens/batch",
+        json={
+            "items": [
+                {"symbol": "eth", "name": "Ethereum", "platforms": {"ethereum": "-"}},
+                {"symbol": "", "name": "Nameless"},
+                {"symbol": "usdc", "name": "USD Coin"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    created = response.json()
+    assert (created["succeeded"], created["failed"]) == (2, 1)
+    assert [r["status"] for r in created["results"]] == [
+        "created",
+        "invalid",
+        "created",
+    ]
+    eth_id, usdc_id = created["results"][0]["id"], created["results"][2]["id"]
+
+    response = client.put(
+        "/api/v1/tokens/batch",
+        json={
+            "items": [
+                {"id": eth_id, "platforms": {"base": "-"}},
+                {"id": usdc_id, "symbol": "USDC", "logo_url": "/static/usdc.png"},
+                {"id": 9999, "name": "Unknown"},
+                {"id": eth_id, "symbol": None},
+            ]
+        },
+    )
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [
+        "updated",
+        "updated",
+        "not_found",
+        "invalid",
+    ]
+    assert "not null" in results[3]["detail"]
+    assert results[0]["token"]["platforms"] == {"base": "-"}
+    assert results[1]["token"]["symbol"] == "USDC"
+    assert results[1]["token"]["name"] == "USD Coin"
+
+    response = client.post(
+        "/api/v1/tokens/batch/get", json={"ids": [usdc_id, 9999, eth_id]}
+    )
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["found", "not_found", "found"]
+    assert results[2]["token"]["symbol"] == "eth"
+
+    response = client.post("/api/v1/tokens/batch/delete", json={"ids": [eth_id, 9999]})
+    assert [r["status"] for r in response.json()["results"]] == ["deleted", "not_found"]
+    assert [t["id"] for t in client.get("/api/v1/tokens/").json()] == [usdc_id]
+
+
+def test_token_reads_are_conditional(client):
+    response = client.post(
+        "/api/v1/tokens/",
+        json={"symbol": "btc", "name": "Bitcoin", "platforms": {"bitcoin": "-"}},
+    )
+    token_id = response.json()["id"]
+
+    for url in ("/api/v1/tokens/", f"/api/v1/tokens/{token_id}"):
+        response = client.get(url)
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"].startswith("public, max-age=")
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    # No Last-Modified: one second HTTP dates miss writes in the same second
+    list_etag = client.get("/api/v1/tokens/").headers["etag"]
+    for url in ("/api/v1/tokens/", f"/api/v1/tokens/{token_id}"):
+        assert "last-modified" not in client.get(url).headers
+        response = client.get(
+            url, headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+        )
+        assert response.status_code == 200
+
+    # Writes move the catalog version, so old validators stop matching
+    client.put(f"/api/v1/tokens/{token_id}", json={"name": "Bitcoin!"})
+    response = client.get(f"/api/v1/tokens/{token_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    client.delete(f"/api/v1/tokens/{token_id}")
+    response = client.get("/api/v1/tokens/", headers={"If-None-Match": list_etag})
+    assert (response.status_code, response.json()) == (200, [])
+
+
+def test_token_list_pages_and_snapshots(client):
+    client.post(
+        "/api/v1/tokens/batch",
+        json={"items": [{"symbol": f"t{i}", "name": f"Token {i}"} for i in range(12)]},
+    )
+
+    response = client.get("/api/v1/tokens/", params={"offset": 1, "limit": 8})
+    assert [t["symbol"] for t in response.json()][:2] == ["t1", "t2"]
+    assert len(response.json()) == 8
+    assert response.headers["x-total-count"] == "12"
+
+    response = client.get("/api/v1/tokens/", params={"q": "TOKEN 1", "limit": 2})
+    assert [t["symbol"] for t in response.json()] == ["t1", "t10"]
+    assert response.headers["x-total-count"] == "3"
+    assert (
+        snapshots.get(catalog_version.value, ("list", 1, 8, None, None, "json"))
+        is not None
+    )
+
+    # Served from the snapshot (gzip'd when accepted) until the next write
+    response = client.get("/api/v1/tokens/", params={"offset": 1, "limit": 8})
+    assert response.headers["content-encoding"] == "gzip"
+    assert [t["symbol"] for t in response.json()][:2] == ["t1", "t2"]
+
+    client.post("/api/v1/tokens/batch/delete", json={"ids": [response.json()[0]["id"]]})
+    assert (
+        snapshots.get(catalog_version.value, ("list", 1, 8, None, None, "json")) is None
+    )
+    response = client.get("/api/v1/tokens/", params={"offset": 1, "limit": 8})
+    assert [t["symbol"] for t in response.json()][:2] == ["t2", "t3"]
+
+
+def test_token_fields_and_compact_format(client):
+    client.post(
+        "/api/v1/tokens/batch",
+        json={
+            "items": [
+                {"symbol": "eth", "name": "Ethereum", "platforms": {"base": "0x1"}},
+                {"symbol": "btc", "name": "Bitcoin"},
+            ]
+        },
+    )
+
+    response = client.get("/api/v1/tokens/", params={"fields": "symbol,id"})
+    assert response.json() == [
+        {"symbol": "eth", "id": response.json()[0]["id"]},
+        {"symbol": "btc", "id": response.json()[1]["id"]},
+    ]
+    assert "etag" in response.headers
+
+    response = client.get(
+        "/api/v1/tokens/", params={"fields": "symbol,platforms", "format": "compact"}
+    )
+    assert response.json() == {
+        "fields": ["symbol", "platforms"],
+        "rows": [["eth", {"base": "0x1"}], ["btc", {}]],
+    }
+
+    response = client.get("/api/v1/tokens/", params={"format": "compact", "limit": 1})
+    assert response.json()["fields"] == list(TOKEN_FIELDS)
+    assert len(response.json()["rows"]) == 1
+
+    token_id = response.json()["rows"][0][0]
+    response = client.get(f"/api/v1/tokens/{token_id}", params={"fields": "name"})
+    assert response.json() == {"name": "Ethereum"}
+
+    response = client.get("/api/v1/tokens/", params={"fields": "symbol,price"})
+    assert response.status_code == 400
+
+
+def test_upload_logo(client, api_env):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(buffer, "PNG")
+
+    response = client.post("/api/v1/tokens/logos", content=buffer.getvalue())
+    assert response.status_code == 201
+    url = response.json()["logo_url"]
+    assert url.startswith("/static/logos/")
+    assert list(api_env.rglob("*.webp"))
+
+    assert client.post("/api/v1/tokens/logos", content=b"").status_code == 400
+    assert client.post("/api/v1/tokens/logos", content=b"nope").status_code == 400
+    response = client.post("/api/v1/tokens/logos", content=b"x" * 10_001)
+    assert response.status_code == 413
+
+
+def test_jobs(client, api_env, monkeypatch):
+    monkeypatch.setitem(
+        api.JOB_TARGETS, "coingecko-sync", lambda job: {"added": 2, "skipped": 1}
+    )
+    path = "/api/v1/tokens/jobs/coingecko-sync"
+
+    assert client.post(path).status_code == 403
+    assert client.get(path, headers=ADMIN).status_code == 404
+    assert client.post("/api/v1/tokens/jobs/nope", headers=ADMIN).status_code == 422
+
+    response = client.post(path, headers=ADMIN)
+    assert response.status_code == 202
+    assert response.json()["started"]
+
+    deadline = time.monotonic() + 5
+    while (job := client.get(path, headers=ADMIN).json())["state"] != JOB_SUCCEEDED:
+        assert time.monotonic() < deadline, job
+        time.sleep(0.01)
+    assert job["result"] == {"added": 2, "skipped": 1}
+    assert client.delete(path, headers=ADMIN).json()["state"] == JOB_SUCCEEDED
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Catalog Archives - Tests
+"""
+
+import gzip
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from qrypt.core.db import Base
+from qrypt.tokens.archive import (
+    ARCHIVE_FORMAT,
+    ARCHIVE_VERSION,
+    ArchiveError,
+    export_archive,
+    import_archive,
+    iter_records,
+)
+from qrypt.tokens.crud import list_tokens
+from qrypt.tokens.loaders import TokenRecord, load_tokens
+
+
+def test_archive_round_trip(db_session, tmp_path):
+    load_tokens(
+        db_session,
+        [
+            TokenRecord("usd-coin", "usdc", "USDC", None, {"ethereum": "0xa0b8"}),
+            TokenRecord("tether", "usdt", "Tether", "/t.png", {"ethereum": "0xdac1"}),
+            TokenRecord("bitcoin", "btc", "Bitcoin"),
+        ],
+    )
+    path = tmp_path / "catalog.json.gz"
+    assert export_archive(db_session, path) == 3
+
+    archive = json.loads(gzip.decompress(path.read_bytes()))
+    assert archive["tokens"]["symbol"] == ["usdc", "usdt", "btc"]
+    assert archive["platform_names"] == ["ethereum"]
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        result = import_archive(db, path)
+        assert result.added == ["usd-coin", "tether", "bitcoin"]
+        tokens = {t.symbol: t for t in list_tokens(db)}
+        assert tokens["usdt"].logo_url == "/t.png"
+        assert {p.address for p in tokens["usdc"].platforms} == {"0xa0b8"}
+        assert import_archive(db, path).skipped == ["usd-coin", "tether", "bitcoin"]
+    engine.dispose()
+
+
+def test_archive_rejects_other_files(db_session, tmp_path):
+    path = tmp_path / "other.json.gz"
+    path.write_bytes(gzip.compress(b'{"format": "other"}'))
+    with pytest.raises(ArchiveError):
+        import_archive(db_session, path)
+
+
+def _archive(**overrides) -> dict:
+    archive = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "tokens": {
+            "ext_id": ["bitcoin"],
+            "symbol": ["btc"],
+            "name": ["Bitcoin"],
+            "logo_url": [None],
+        },
+        "platform_names": ["bitcoin"],
+        "platforms": {"token": [0], "name": [0], "address": ["-"]},
+    }
+    return {**archive, **overrides}
+
+
+@pytest.mark.parametrize(
+    "archive",
+    [
+        _archive(tokens=None),
+        _archive(tokens={"ext_id": ["bitcoin"]}),
+        _archive(platform_names=None),
+        _archive(platforms={"token": [0], "name": [0]}),
+        _archive(platforms={"token": [0, 0], "name": [0], "address": ["-"]}),
+        _archive(platforms={"token": [1], "name": [0], "address": ["-"]}),
+        _archive(platforms={"token": [0], "name": [-1], "address": ["-"]}),
+        _archive(platforms={"token": ["0"], "name": [0], "address": ["-"]}),
+    ],
+)
+def test_archive_rejects_malformed_archives(archive):
+    with pytest.raises(ArchiveError):
+        iter_records(archive)
+
+
+def test_archive_records():
+    [record] = iter_records(_archive())
+    assert (record.ext_id, record.platforms) == ("bitcoin", {"bitcoin": "-"})
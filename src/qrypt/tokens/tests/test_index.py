@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Index - Tests
+"""
+
+import pytest
+
+from qrypt.tokens.index import TokenIndex
+
+
+@pytest.fixture
+def index():
+    index = TokenIndex()
+    index.build(
+        [
+            (1, "eth", "Ethereum"),
+            (2, "eth", "Ethereum Wormhole"),
+            (3, "usdc", "USD Coin"),
+            (4, "weth", "Wrapped Ether"),
+            (5, "ethfi", "Ether.fi"),
+        ]
+    )
+    return index
+
+
+def test_index_ranks_exact_symbol_first(index):
+    candidates = index.search("ETH")
+    assert [c.id for c in candidates[:2]] == [1, 2]
+    assert candidates[0].match == "symbol"
+    assert {c.id for c in candidates} == {1, 2, 4, 5}
+
+
+def test_index_breaks_ties_by_symbol_length(index):
+    index.add(6, "ethx", "Stader ETHx")
+    # Symbol prefixes, shortest first; "weth" only matches a name word
+    assert [c.id for c in index.search("eth")] == [1, 2, 6, 5, 4]
+
+
+def test_index_matches_name_words(index):
+    assert [c.id for c in index.search("usd c")] == [3]
+    assert [c.id for c in index.search("coin")] == [3]
+    assert index.search("coin")[0].match == "word_prefix"
+
+
+def test_index_incremental_updates(index):
+    index.add(6, "eth", "Ethereum Classic-ish")
+    assert 6 in {c.id for c in index.search("eth")}
+
+    index.add(6, "etc", "Ethereum Classic")
+    assert 6 not in {c.id for c in index.search("eth") if c.match == "symbol"}
+
+    index.discard(6)
+    assert 6 not in index
+    assert not index.search("etc")
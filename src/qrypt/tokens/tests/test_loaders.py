@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Loaders - Tests
+"""
+
+import csv
+import io
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from qrypt.core.db import Base
+from qrypt.core.jobs import JobCancelled
+from qrypt.tokens.loaders import CopyStream, TokenRecord, load_tokens
+from qrypt.tokens.models import BlockchainPlatform, Token
+
+COINS = [
+    {
+        "id": "usd-coin",
+        "symbol": "usdc",
+        "name": "USDC",
+        "platforms": {"ethereum": "0xA0B86991C6218B36C1D19D4A2E9EB0CE3606EB48"},
+    },
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "platforms": {}},
+]
+
+# A PostgreSQL database to test the COPY loader in (a scratch schema is used)
+POSTGRES_URL = os.environ.get("KE_TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def pg_session():
+    """Session on a scratch schema of the PostgreSQL test database"""
+    if not POSTGRES_URL:
+        pytest.skip("KE_TEST_POSTGRES_URL is not set")
+    schema = f"test_loaders_{os.getpid()}"
+    admin = create_engine(POSTGRES_URL)
+    with admin.begin() as connection:
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(
+        POSTGRES_URL, connect_args={"options": f"-csearch_path={schema}"}
+    )
+    try:
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        yield session
+        session.close()
+    finally:
+        engine.dispose()
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+
+def _platforms(db) -> dict[str, dict[str, str]]:
+    rows = db.execute(
+        select(Token.ext_id, BlockchainPlatform.name, BlockchainPlatform.address)
+        .join(BlockchainPlatform, BlockchainPlatform.token_id == Token.id)
+        .order_by(Token.ext_id, BlockchainPlatform.name)
+    )
+    platforms: dict[str, dict[str, str]] = {}
+    for ext_id, name, address in rows:
+        platforms.setdefault(ext_id, {})[name] = address
+    return platforms
+
+
+def test_load_tokens_batch(db_session):
+    records = [TokenRecord.from_coingecko(coin) for coin in COINS]
+    result = load_tokens(db_session, records)
+    assert result.method == "batch"
+    assert result.added == ["usd-coin", "bitcoin"]
+    assert db_session.scalar(select(BlockchainPlatform.address)) == (
+        "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+    )
+
+    # Existing tokens are skipped, or updated (platforms replaced)
+    renamed = TokenRecord("usd-coin", "usdc", "USD Coin", platforms={"base": "0x1"})
+    assert load_tokens(db_session, [renamed]).skipped == ["usd-coin"]
+    result = load_tokens(db_session, [renamed, renamed], update_existing=True)
+    assert result.updated == ["usd-coin"]
+    token = db_session.scalar(select(Token).where(Token.ext_id == "usd-coin"))
+    db_session.refresh(token)
+    assert token.name == "USD Coin"
+    assert {p.name: p.address for p in token.platforms} == {"base": "0x1"}
+    assert db_session.scalar(select(func.count(Token.id))) == 2
+
+
+def test_load_tokens_copy(pg_session):
+    records = [TokenRecord.from_coingecko(coin) for coin in COINS]
+    result = load_tokens(pg_session, records)
+    assert result.method == "copy"
+    assert (sorted(result.added), result.updated, result.skipped) == (
+        ["bitcoin", "usd-coin"],
+        [],
+        [],
+    )
+    assert _platforms(pg_session) == {
+        "usd-coin": {"ethereum": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"}
+    }
+
+    # Existing tokens are skipped (new ones added), or updated with their
+    # platforms replaced
+    renamed = TokenRecord(
+        "usd-coin", "usdc", "USD Coin", platforms={"base": "0x1", "solana": "So1"}
+    )
+    ether = TokenRecord("ethereum", "eth", "Ether", platforms={"base": "0x2"})
+    result = load_tokens(pg_session, [renamed, records[1], ether])
+    assert (result.added, sorted(result.skipped)) == (
+        ["ethereum"],
+        ["bitcoin", "usd-coin"],
+    )
+    assert _platforms(pg_session)["usd-coin"] == {
+        "ethereum": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+    }
+
+    # The last of duplicate records wins
+    changed = TokenRecord("bitcoin", "btc", "Bitcoin", platforms={"base": "0x3"})
+    result = load_tokens(
+        pg_session,
+        [records[1], changed, renamed],
+        update_existing=True,
+    )
+    assert (result.added, sorted(result.updated), result.skipped) == (
+        [],
+        ["bitcoin", "usd-coin"],
+        [],
+    )
+    names = dict(pg_session.execute(select(Token.ext_id, Token.name)).all())
+    assert names == {"usd-coin": "USD Coin", "bitcoin": "Bitcoin", "ethereum": "Ether"}
+    assert _platforms(pg_session) == {
+        "bitcoin": {"base": "0x3"},
+        "ethereum": {"base": "0x2"},
+        "usd-coin": {"base": "0x1", "solana": "So1"},
+    }
+    assert pg_session.scalar(select(func.count(BlockchainPlatform.id))) == 4
+
+
+def test_copy_stream_csv():
+    rows = [(0, "a,b", None), (1, "", 'say "hi"')]
+    stream = CopyStream(rows)
+    data = "".join(iter(lambda: stream.read(5), ""))
+    assert data == '"0","a,b",\n"1","","say ""hi"""\n'
+    assert list(csv.reader(io.StringIO(data))) == [
+        ["0", "a,b", ""],
+        ["1", "", 'say "hi"'],
+    ]
+
+
+def test_load_tokens_progress_and_cancel(db_session):
+    records = [TokenRecord(f"coin-{i}", f"c{i}", f"Coin {i}") for i in range(1200)]
+    reported = []
+    load_tokens(db_session, records[:1000], progress=reported.append)
+    assert reported == [500, 500]
+
+    # An exception raised by the progress callback rolls the load back
+    def cancel(rows):
+        raise JobCancelled("sync")
+
+    with pytest.raises(JobCancelled):
+        load_tokens(db_session, records, update_existing=True, progress=cancel)
+    assert db_session.scalar(select(func.count(Token.id))) == 1000
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Token Logos - Tests
+"""
+
+import asyncio
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import select
+
+from qrypt.core.http import ImmutableStaticFiles
+from qrypt.tokens.logos import (
+    IMMUTABLE_MAX_AGE,
+    LOGO_DIR,
+    LOGO_SIZES,
+    LogoError,
+    logo_digest,
+    mirror_logos,
+    store_logo,
+    thumbnail_path,
+    thumbnail_url,
+)
+from qrypt.tokens.models import Token
+
+
+def _png(width: int = 300, height: int = 200, color: str = "red") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_store_logo_thumbnails(tmp_path):
+    data = _png()
+    digest = logo_digest(data)
+    url = store_logo(data, tmp_path)
+    assert url == f"/static/logos/{digest[:2]}/{digest}-128.webp"
+
+    for size in LOGO_SIZES:
+        with Image.open(thumbnail_path(tmp_path, digest, size)) as image:
+            assert image.format == "WEBP"
+            assert max(image.size) == size
+
+    # Stored by content: the same image is not written again
+    path = thumbnail_path(tmp_path, digest, 64)
+    mtime = path.stat().st_mtime_ns
+    assert store_logo(data, tmp_path) == url
+    assert path.stat().st_mtime_ns == mtime
+
+    assert thumbnail_url(url, 50) == url.replace("-128", "-64")
+    assert thumbnail_url(url, 500) == url
+    assert thumbnail_url("https://example.com/a.png", 64) == "https://example.com/a.png"
+
+    with pytest.raises(LogoError):
+        store_logo(b"not an image", tmp_path)
+
+
+def test_store_logo_refuses_large_images(tmp_path, monkeypatch):
+    with pytest.raises(LogoError, match="pixels"):
+        store_logo(_png(300, 200), tmp_path, max_pixels=300 * 200 - 1)
+    assert store_logo(_png(300, 200), tmp_path, max_pixels=300 * 200)
+
+    # Pillow's decompression bomb checks (error, and warning) are refused too
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(LogoError, match="too large"):
+        store_logo(_png(300, 200, "blue"), tmp_path, max_pixels=10**9)
+    with pytest.raises(LogoError, match="too large"):
+        store_logo(_png(40, 40, "blue"), tmp_path, max_pixels=10**9)
+
+
+def test_mirror_logos(db_session, tmp_path):
+    images = {"https://img/a.png": _png(), "https://img/b.png": _png(color="blue")}
+    db_session.add_all(
+        [
+            Token(symbol="a", name="A", logo_url="https://img/a.png"),
+            Token(symbol="a2", name="A2", logo_url="https://img/a.png"),
+            Token(symbol="b", name="B", logo_url="https://img/b.png"),
+            Token(symbol="c", name="C", logo_url="https://img/missing.png"),
+            Token(symbol="d", name="D", logo_url="/static/images/coin-logo.png"),
+        ]
+    )
+    db_session.commit()
+    fetched = []
+
+    async def fetch(url: str) -> bytes:
+        fetched.append(url)
+        if url == "https://img/boom.png":
+            raise RuntimeError("boom")
+        if url not in images:
+            raise LogoError("404")
+        return images[url]
+
+    db_session.add(Token(symbol="e", name="E", logo_url="https://img/boom.png"))
+    db_session.commit()
+    result = asyncio.run(mirror_logos(db_session, tmp_path, 2, fetch=fetch))
+    # One download per URL; a failing one does not stop the others
+    assert sorted(fetched) == sorted(
+        [*images, "https://img/missing.png", "https://img/boom.png"]
+    )
+    assert result.mirrored == 3
+    assert result.failed == {
+        "https://img/missing.png": "404",
+        "https://img/boom.png": "boom",
+    }
+
+    urls = dict(db_session.execute(select(Token.symbol, Token.logo_url)).all())
+    assert urls["a"] == urls["a2"] == store_logo(images["https://img/a.png"], tmp_path)
+    assert urls["c"] == "https://img/missing.png"
+    assert urls["d"] == "/static/images/coin-logo.png"
+
+
+def test_immutable_static_files(tmp_path):
+    url = store_logo(_png(), tmp_path)
+    (tmp_path / "other.txt").write_text("hi")
+    app = FastAPI()
+    app.mount(
+        "/static",
+        ImmutableStaticFiles(
+            directory=tmp_path, immutable=(LOGO_DIR,), max_age=IMMUTABLE_MAX_AGE
+        ),
+    )
+    client = TestClient(app)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == (
+        f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    )
+    assert "cache-control" not in client.get("/static/other.txt").headers
@@ -6,31 +6,28 @@ Qrypto - Token API - Streamlit App UI
 
 """
 
-import os
-from pathlib import Path
 from time import sleep
+from typing import Optional
 from urllib.parse import urljoin
-from uuid import uuid4
 
 import streamlit as st
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
 
-from qrypt.core.db import get_db
-from qrypt.tokens.models import BlockchainPlatform, Token
-from qrypt.tokens.services.coingecko.ops.admin import pull_tokens
+from qrypt.core.config import UIConfig
+from qrypt.core.jobs import JOB_CANCELLED, JOB_FAILED, JOB_PENDING, JOB_RUNNING
+from qrypt.core.log import configure_logging
+from qrypt.tokens.logo_urls import thumbnail_url
+from qrypt.ui.client import APIError, TokenClient, page_count
 
 st.set_page_config(page_title="🪙 Qrypt Coin Explorer", layout="centered")
 
-BASE_URL = "http://127.0.0.1:8000"
-STATIC_DIR = "./staticserve"
-LOGO_UPLOAD_DIR = f"{STATIC_DIR}/logos"  # ensure this folder exists and is served
-LOGO_STATIC_DIR = "/static/logos"
-
-
-if not Path(STATIC_DIR).exists():
-    os.makedirs(STATIC_DIR, exist_ok=True)
-    st.warning(f"ℹ️ STATIC_DIR '{STATIC_DIR}' created.")
+ui_config = UIConfig()
+configure_logging()
+BASE_URL = ui_config.api_url
+LOGO_TYPES = ["png", "jpg", "jpeg", "webp", "gif"]
+SEARCH_PAGE_SIZE = 20
+SYNC_JOB = "coingecko-sync"
+LOGOS_JOB = "logo-mirror"
+JOB_POLL_SECONDS = 1
 
 
 def delayed_rerun(delay: float = 0.3) -> None:
@@ -38,59 +35,158 @@ def delayed_rerun(delay: float = 0.3) -> None:
     st.rerun()
 
 
-def list_tokens(db: Session):
-    """List all tokens in the database."""
-    return db.query(Token).order_by(Token.symbol.desc()).all()
+def logo_src(url: str, size: int) -> str:
+    """The URL of a logo thumbnail (about `size` pixels)"""
+    return urljoin(BASE_URL, thumbnail_url(url, size))
 
 
-def add_token(db: Session, symbol, name, logo_url):
-    """Add a new token to the database."""
-    token = Token(symbol=symbol, name=name, logo_url=logo_url)
-    db.add(token)
-    db.commit()
-    db.refresh(token)
-    return token
+@st.cache_resource
+def get_client() -> TokenClient:
+    """The API client, shared by every session of the UI process"""
+    return TokenClient.from_config(ui_config)
 
 
-def update_token(db: Session, token_id, symbol, name, logo_url):
-    """Update an existing token in the database."""
-    token = db.query(Token).filter(Token.id == token_id).first()
-    if token:
-        token.symbol = symbol
-        token.name = name
-        token.logo_url = logo_url
-        db.commit()
-        db.refresh(token)
-    return token
+api = get_client()
 
 
-def delete_token(db: Session, token_id):
-    """Delete a token from the database."""
-    token = db.query(Token).filter(Token.id == token_id).first()
-    if token:
-        db.delete(token)
-        db.commit()
+def upload_logo(logo_file) -> Optional[str]:
+    """Store an uploaded logo in the API (as thumbnails), returns its URL"""
+    if not logo_file:
+        return None
+    try:
+        return api.upload_logo(logo_file.read(), logo_file.type)
+    except APIError as e:
+        st.error(f"Could not use the logo: {e.detail}")
+        return None
+
 
+def show_total() -> None:
+    """Show the number of tokens"""
+    st.markdown(f"ℹ️ **Total Tokens:** {api.count()}")
 
-def get_token(db: Session, token_id):
-    """Get a token by ID."""
-    return db.query(Token).filter(Token.id == token_id).first()
+
+def show_results(results, action: str) -> bool:
+    """Show the errors of a batch write, returns whether all succeeded"""
+    for result in results:
+        if not result.ok:
+            st.error(f"Could not {action} token: {result.detail or result.status}")
+    return all(result.ok for result in results)
 
 
 # Build the UI
 st.title("🪙 Crypto Token Explorer")
 
-session = next(get_db())
+# Everything below reads through the API: stop early when it is down
+try:
+    api.count()
+except APIError as e:
+    st.error(f"The token API is unavailable at {BASE_URL}: {e.detail}")
+    st.stop()
 
 
-def sync_tokens() -> None:
+def current_job(name: str) -> Optional[dict]:
+    """The latest job of a name, run by the API (None if none ran)"""
     try:
-        added, skipped = pull_tokens()
-        st.success(f"Successfully pulled {len(added)} tokens from CoinGecko.")
-        if skipped:
-            st.warning(f"Skipped {len(skipped)} tokens that already exist.")
-    except Exception as e:
-        st.error(f"Error pulling tokens: {e}")
+        return api.job(name)
+    except APIError as e:
+        st.error(f"Could not get the {name} job: {e.detail}")
+        return None
+
+
+def job_running(job: Optional[dict]) -> bool:
+    return job is not None and job["state"] in (JOB_PENDING, JOB_RUNNING)
+
+
+def start_job(name: str) -> None:
+    """Start a background job in the API (unless one of the name is running)"""
+    try:
+        _, started = api.start_job(name)
+    except APIError as e:
+        st.error(f"Could not start the {name} job: {e.detail}")
+        return
+    if not started:
+        st.info("Already running.")
+    st.session_state[f"watch_{name}"] = True
+
+
+def _duration(seconds) -> str:
+    if seconds is None:
+        return "–"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def show_sync_result(job) -> None:
+    """Outcome of a finished sync"""
+    if job["state"] == JOB_FAILED:
+        st.error(f"Error pulling tokens: {job['error']}")
+    elif job["state"] == JOB_CANCELLED:
+        st.warning("Sync cancelled, nothing was changed.")
+    else:
+        st.success(
+            f"Successfully pulled {job['result']['added']} tokens from CoinGecko."
+        )
+        if job["result"]["skipped"]:
+            st.warning(f"Skipped {job['result']['skipped']} tokens that already exist.")
+
+
+def show_logos_result(job) -> None:
+    """Outcome of a finished logo mirror"""
+    if job["state"] == JOB_FAILED:
+        st.error(f"Error mirroring logos: {job['error']}")
+    elif job["state"] == JOB_CANCELLED:
+        st.warning("Logo mirror cancelled, no token was changed.")
+    else:
+        st.success(f"Mirrored the logos of {job['result']['mirrored']} tokens.")
+        if job["result"]["failed"]:
+            st.warning(f"{job['result']['failed']} logos could not be mirrored.")
+
+
+JOB_RESULTS = {SYNC_JOB: show_sync_result, LOGOS_JOB: show_logos_result}
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(name: str, unit: str = "tokens") -> None:
+    """Poll a background job (reruns on its own, not the whole page)"""
+    status = current_job(name)
+    if status is None:
+        return
+    running = job_running(status)
+
+    if running:
+        total, done = status["total"], status["done"]
+        st.progress(
+            min(done / total, 1.0) if total else 0.0,
+            text=f"{status['phase'] or 'starting'}: {done} / {total or '?'} {unit}",
+        )
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rows/s", status["rows_per_second"] or "–")
+        col2.metric("ETA", _duration(status["eta_seconds"]))
+        col3.metric("Elapsed", _duration(status["elapsed_seconds"]))
+        if st.button(
+            "✋ Cancel",
+            key=f"cancel_{name}",
+            disabled=status["cancel_requested"],
+            use_container_width=True,
+        ):
+            try:
+                api.cancel_job(name)
+            except APIError as e:
+                st.error(f"Could not cancel the {name} job: {e.detail}")
+    else:
+        JOB_RESULTS[name](status)
+
+    if status["phases"]:
+        st.caption(
+            " · ".join(
+                f"{phase} {secs:.1f}s" for phase, secs in status["phases"].items()
+            )
+        )
+
+    # The job just finished: refresh the whole page (counts, lists)
+    if not running and st.session_state.pop(f"watch_{name}", False):
+        api.invalidate()
+        st.rerun(scope="app")
 
 
 tabs = ["📋 View All", "➕ Add Token", "✏️ Update/Delete", "🔍 Search", "🛠️ Admin Panel"]
@@ -117,23 +213,22 @@ if tab_selector == "📋 View All":
     st.subheader("💰 All Tokens")
 
     PER_PAGE = 3
-    tokens = list_tokens(session)
+    total_tokens = api.count()
 
-    if not tokens:
-        st.info("No tokens found in the database. Attempting to sync...")
-        sync_tokens()
-        st.success("Tokens pulled successfully.")
-        delayed_rerun()
+    if not total_tokens:
+        st.info("No tokens found in the database. Syncing in the background...")
+        if current_job(SYNC_JOB) is None:
+            start_job(SYNC_JOB)
+        job_progress(SYNC_JOB)
+        st.stop()
 
-    total_tokens = len(tokens)
-
-    total_pages = (total_tokens - 1) // PER_PAGE + 1
+    total_pages = page_count(total_tokens, PER_PAGE)
 
     page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1)
 
     start = (page - 1) * PER_PAGE
     end = start + PER_PAGE
-    paginated_tokens = tokens[start:end]
+    paginated_tokens, _ = api.page(page, PER_PAGE)
 
     st.write(
         f"Showing tokens {start + 1} to {min(end, total_tokens)} of {total_tokens}"
@@ -143,7 +238,7 @@ if tab_selector == "📋 View All":
     st.header("ℹ️ **Token Details** ")
 
     if st.session_state.get("detail_token_id"):
-        token = get_token(session, st.session_state["detail_token_id"])
+        token = api.get_token(st.session_state["detail_token_id"])
         if token:
             if st.session_state.get("detail_token_id") == token.id:
                 with st.expander(f"🔍 View Details for {token.symbol}"):
@@ -151,10 +246,10 @@ if tab_selector == "📋 View All":
                     st.write(f"**Symbol:** {token.symbol}")
                     st.write(f"**logo**: {token.logo_url}")
                     if token.logo_url:
-                        st.image(urljoin(BASE_URL, token.logo_url), width=80)
+                        st.image(logo_src(token.logo_url, 128), width=80)
                     st.write(f"**Platforms:**")
-                    for platform in token.platforms:
-                        st.write(f"- {platform.name} ({platform.address})")
+                    for platform, address in token.platforms.items():
+                        st.write(f"- {platform} ({address})")
                     st.write(f"**Last Updated:** {token.last_updated}")
         else:
             st.error("Token not found.")
@@ -168,42 +263,37 @@ if tab_selector == "📋 View All":
         col1, col2, col3, col4 = st.columns([2, 1, 1, 1])  # token info, update, delete
 
         with col1:
-            st.markdown(f"**{t.symbol}** – {t.name}")
-            if t.logo_url:
-                st.image(urljoin(BASE_URL, t.logo_url), width=50)
+            st.markdown(f"**{t['symbol']}** – {t['name']}")
+            if t["logo_url"]:
+                st.image(logo_src(t["logo_url"], 64), width=50)
 
         with col2:
-            if st.button("📝 Update", key=f"view_update_{t.id}"):
-                st.session_state["update_selected_token"] = t.id
+            if st.button("📝 Update", key=f"view_update_{t['id']}"):
+                st.session_state["update_selected_token"] = t["id"]
                 st.session_state["next_active_tab"] = "✏️ Update/Delete"
                 delayed_rerun()
 
         with col3:
-            if st.button("🗑️ Delete", key=f"view_delete_{t.id}", type="primary"):
-                session.delete(t)
-                session.commit()
-                st.success(f"Deleted {t.symbol}")
-                delayed_rerun()
+            if st.button("🗑️ Delete", key=f"view_delete_{t['id']}", type="primary"):
+                if show_results(api.delete_tokens([t["id"]]), "delete"):
+                    st.success(f"Deleted {t['symbol']}")
+                    delayed_rerun()
 
         with col4:
-            if st.button(f"🔍 Detail", key=f"view_btn_{t.id}"):
-                st.session_state["detail_token_id"] = t.id
+            if st.button(f"🔍 Detail", key=f"view_btn_{t['id']}"):
+                st.session_state["detail_token_id"] = t["id"]
                 delayed_rerun()
         st.divider()
 
 elif tab_selector == "➕ Add Token":
     st.subheader("Add New Token")
 
-    tokens = list_tokens(session)
-    total_tokens = len(tokens)
-    st.markdown(f"""
-    ℹ️ **Total Tokens:** {total_tokens}
-    """)
+    show_total()
 
     with st.form("add_token_form"):
         symbol = st.text_input("Symbol")
         name = st.text_input("Name")
-        logo_file = st.file_uploader("Upload Logo", type=["png", "jpg", "jpeg"])
+        logo_file = st.file_uploader("Upload Logo", type=LOGO_TYPES)
 
         # Platform input (single for now)
         platform_name = st.text_input("Platform Name (e.g., Ethereum)")
@@ -213,46 +303,42 @@ elif tab_selector == "➕ Add Token":
 
         if submitted:
             # Save logo file if uploaded
-            logo_url = None
-            if logo_file:
-                ext = os.path.splitext(logo_file.name)[1]
-                logo_filename = f"{uuid4().hex}{ext}"
-                logo_path = os.path.join(LOGO_UPLOAD_DIR, logo_filename)
-                with open(logo_path, "wb") as f:
-                    f.write(logo_file.read())
-                logo_url = urljoin(BASE_URL, f"{LOGO_STATIC_DIR}/{logo_filename}")
-
-            # Create platform and token objects
-            platform = BlockchainPlatform(name=platform_name, address=platform_address)
-            token = Token(
-                symbol=symbol, name=name, logo_url=logo_url, platforms=[platform]
+            logo_url = upload_logo(logo_file)
+
+            platforms = {}
+            if platform_name and platform_address:
+                platforms[platform_name] = platform_address
+
+            (result,) = api.create_tokens(
+                [
+                    {
+                        "symbol": symbol,
+                        "name": name,
+                        "logo_url": logo_url,
+                        "platforms": platforms,
+                    }
+                ],
             )
-
-            session.add(token)
-            try:
-                session.commit()
-                session.refresh(token)
-                st.session_state["detail_token_id"] = token.id
-            except IntegrityError as e:
-                st.error(f"Token with symbol '{symbol}' already exists!")
-                st.error(e)
-                session.rollback()
-            else:
+            if result.ok:
+                st.session_state["detail_token_id"] = result.id
                 st.success(f"Token '{symbol}' added!")
                 delayed_rerun()
+            else:
+                st.error(f"Could not add token '{symbol}': {result.detail}")
 
-    token = get_token(session, st.session_state.get("detail_token_id"))
+    detail_token_id = st.session_state.get("detail_token_id")
+    token = api.get_token(detail_token_id) if detail_token_id is not None else None
     if token:
-        if st.session_state.get("detail_token_id") == token.id:
+        if detail_token_id == token.id:
             with st.expander(f"🔍 ** {token.symbol} **"):
                 st.write(f"**Name:** {token.name}")
                 st.write(f"**Symbol:** {token.symbol}")
                 st.write(f"**logo**: {token.logo_url}")
                 if token.logo_url:
-                    st.image(urljoin(BASE_URL, token.logo_url), width=80)
+                    st.image(logo_src(token.logo_url, 128), width=80)
                 st.write(f"**Platforms:**")
-                for platform in token.platforms:
-                    st.write(f"- {platform.name} ({platform.address})")
+                for platform, address in token.platforms.items():
+                    st.write(f"- {platform} ({address})")
                 st.write(f"**Last Updated:** {token.last_updated}")
 
 
@@ -261,43 +347,48 @@ elif tab_selector == "✏️ Update/Delete":
     token = None
     selected_id = st.session_state.pop("update_selected_token", None)
     if selected_id is not None:
-        token = session.query(Token).filter(Token.id == selected_id).first()
+        token = api.get_token(selected_id)
 
     st.subheader("Update or Delete Token")
 
-    tokens = list_tokens(session)
-    total_tokens = len(tokens)
-    st.markdown(f"""
-    ℹ️ **Total Tokens:** {total_tokens}
-    """)
+    show_total()
 
-    tokens = list_tokens(session)
-    token_names = [f"{t.id} - {t.symbol}" for t in tokens]
+    filter_text = st.text_input("Filter by symbol or name")
+    options = api.options(filter_text)
+    if token and token.id not in options:
+        options = {token.id: f"{token.id} - {token.symbol} ({token.name})", **options}
 
-    if tokens:
-        selected = st.selectbox("Select token to update/delete", token_names)
-        selected_id = int(selected.split(" - ")[0])
-        token = session.query(Token).filter(Token.id == selected_id).first()
+    if options:
+        ids = list(options)
+        selected_id = st.selectbox(
+            "Select token to update/delete",
+            ids,
+            index=ids.index(token.id) if token else 0,
+            format_func=options.get,
+        )
+        token = api.get_token(selected_id)
+        if token is None:
+            # Deleted since the options were listed
+            st.error("Token not found.")
+            st.stop()
 
-        if token:
-            st.subheader(f"Editing: {token.symbol}")
-            new_symbol = st.text_input("Symbol", token.symbol)
-            new_name = st.text_input("Name", token.name)
-            new_logo_url = token.logo_url or ""
+        st.subheader(f"Editing: {token.symbol}")
+        new_symbol = st.text_input("Symbol", token.symbol)
+        new_name = st.text_input("Name", token.name)
 
         col1, col2 = st.columns([1, 2])
 
         with col1:
             st.markdown("**Current Logo**")
             if token.logo_url:
-                st.image(urljoin(BASE_URL, token.logo_url), width=100)
+                st.image(logo_src(token.logo_url, 128), width=100)
             else:
                 st.info("No logo uploaded.")
 
         with col2:
             st.markdown("**Upload New Logo (optional)**")
             logo_file = st.file_uploader(
-                label="", type=["png", "jpg", "jpeg"], key=f"upload_{token.id}"
+                label="", type=LOGO_TYPES, key=f"upload_{token.id}"
             )
 
         if st.button(
@@ -307,19 +398,17 @@ elif tab_selector == "✏️ Update/Delete":
             key="update_button",
             disabled=False,
         ):
-            if logo_file:
-                ext = os.path.splitext(logo_file.name)[1]
-                filename = f"{uuid4().hex}{ext}"
-                logo_path = os.path.join(LOGO_UPLOAD_DIR, filename)
-                with open(logo_path, "wb") as f:
-                    f.write(logo_file.read())
-                token.logo_url = f"{LOGO_STATIC_DIR}/{filename}"
-
-            token.symbol = new_symbol
-            token.name = new_name
-            session.commit()
-            st.success("Success")
-            delayed_rerun()
+            changes = {"id": token.id, "symbol": new_symbol, "name": new_name}
+            logo_url = upload_logo(logo_file)
+            if logo_url:
+                changes["logo_url"] = logo_url
+
+            (result,) = api.update_tokens([changes])
+            if result.ok:
+                st.success("Success")
+                delayed_rerun()
+            else:
+                st.error(f"Could not update token: {result.detail}")
 
         if st.button(
             "Delete",
@@ -329,10 +418,9 @@ elif tab_selector == "✏️ Update/Delete":
             help="Danger action",
             disabled=False,
         ):
-            session.delete(token)
-            session.commit()
-            st.warning("Token deleted.")
-            delayed_rerun()
+            if show_results(api.delete_tokens([token.id]), "delete"):
+                st.warning("Token deleted.")
+                delayed_rerun()
 
     else:
         st.info("No tokens found.")
@@ -340,45 +428,42 @@ elif tab_selector == "✏️ Update/Delete":
 elif tab_selector == "🔍 Search":
     st.subheader("Search Tokens by Name")
 
-    tokens = list_tokens(session)
-    total_tokens = len(tokens)
-    st.markdown(f"""
-    ℹ️ **Total Tokens:** {total_tokens}
-    """)
+    show_total()
 
     query = st.text_input("Enter name to search for")
 
     if query:
-        like_pattern = f"%{query}%"
-        results = (
-            session.query(Token)
-            .filter(Token.name.ilike(like_pattern))
-            .order_by(Token.name.desc())
-            .all()
-        )
+        found = api.count(query)
+
+        st.write(f"Found {found} result(s):")
 
-        st.write(f"Found {len(results)} result(s):")
+        page = 1
+        total_pages = page_count(found, SEARCH_PAGE_SIZE)
+        if total_pages > 1:
+            page = st.number_input(
+                "Page", min_value=1, max_value=total_pages, value=1, key="search_page"
+            )
+        results, _ = api.page(page, SEARCH_PAGE_SIZE, query)
 
         for t in results:
             col1, col2, col3 = st.columns([3, 1, 1])  # info, update, delete
 
             with col1:
-                st.markdown(f"**{t.symbol}** – {t.name}")
-                if t.logo_url:
-                    st.image(urljoin(BASE_URL, t.logo_url), width=50)
+                st.markdown(f"**{t['symbol']}** – {t['name']}")
+                if t["logo_url"]:
+                    st.image(logo_src(t["logo_url"], 64), width=50)
 
             with col2:
-                if st.button("📝 Update", key=f"update_{t.id}"):
-                    st.session_state["update_selected_token"] = t.id
+                if st.button("📝 Update", key=f"update_{t['id']}"):
+                    st.session_state["update_selected_token"] = t["id"]
                     st.session_state["next_active_tab"] = "✏️ Update/Delete"
                     delayed_rerun()  # redirect to Update tab
 
             with col3:
-                if st.button("🗑️ Delete", key=f"delete_{t.id}", type="primary"):
-                    session.delete(t)
-                    session.commit()
-                    st.success(f"Deleted token: {t.symbol}")
-                    delayed_rerun()
+                if st.button("🗑️ Delete", key=f"delete_{t['id']}", type="primary"):
+                    if show_results(api.delete_tokens([t["id"]]), "delete"):
+                        st.success(f"Deleted token: {t['symbol']}")
+                        delayed_rerun()
 
             st.divider()
     else:
@@ -387,18 +472,32 @@ elif tab_selector == "🔍 Search":
 elif tab_selector == "🛠️ Admin Panel":
     st.subheader("🛠️ Admin Panel")
 
-    tokens = list_tokens(session)
-    total_tokens = len(tokens)
-    st.markdown(f"""
-    ℹ️ **Total Tokens:** {total_tokens}
-    """)
+    show_total()
 
     st.markdown("Perform administrative actions below:")
 
-    if st.button("🔄 Pull Tokens from CoinGecko", use_container_width=True):
-        sync_tokens()
-        st.success("Tokens pulled successfully.")
-        delayed_rerun(15)
+    if not ui_config.admin_api_key:
+        st.info("Set KE_UI_ADMIN_API_KEY to run the admin jobs through the API.")
+
+    if st.button(
+        "🔄 Pull Tokens from CoinGecko",
+        use_container_width=True,
+        disabled=job_running(current_job(SYNC_JOB)),
+    ):
+        start_job(SYNC_JOB)
+        st.rerun()
+
+    job_progress(SYNC_JOB)
+
+    if st.button(
+        "🖼️ Mirror Remote Logos",
+        use_container_width=True,
+        disabled=job_running(current_job(LOGOS_JOB)),
+    ):
+        start_job(LOGOS_JOB)
+        st.rerun()
+
+    job_progress(LOGOS_JOB, "logos")
 
     st.divider()
 
@@ -416,10 +515,7 @@ elif tab_selector == "🛠️ Admin Panel":
         type="primary",
         disabled=True,
     ):
-        session.query(Token).delete()
-        session.commit()
-        st.success("All tokens deleted.")
-        delayed_rerun()
+        st.markdown("COMING SOON")
     st.divider()
 
     st.markdown("### Other Admin Actions")
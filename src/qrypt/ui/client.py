@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Streamlit App UI - API Client
+
+This module is the UI's access to the token catalog: the REST API, through
+one pooled (keep-alive) HTTP client per UI process, rather than a database
+session per browser session - the UI scales out without multiplying
+database connections.
+
+GET responses are cached in the process: reused for a TTL, then revalidated
+with their ETag. ETags carry the catalog version, so an unchanged catalog
+costs a 304 (from the API's memory, no database work) and a changed one
+invalidates every entry. Writes made through the client drop the cache.
+
+Background jobs (the CoinGecko sync, the logo mirroring) and logo uploads
+run in the API too: the UI starts and polls them, with the admin key.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+import httpx
+
+from qrypt.core.config import UIConfig
+from qrypt.tokens.services.coingecko.schema import TokenOut
+
+TOKENS_PATH: str = "/api/v1/tokens"
+JOBS_PATH: str = f"{TOKENS_PATH}/jobs"
+ADMIN_KEY_HEADER: str = "X-Admin-Key"
+TOTAL_COUNT_HEADER: str = "x-total-count"
+DEFAULT_PAGE_SIZE: int = 3
+MAX_OPTIONS: int = 50
+# Fields of the token rows shown in lists
+ROW_FIELDS: str = "id,symbol,name,logo_url"
+
+
+class APIError(Exception):
+    """The API could not be reached, or refused a request"""
+
+    def __init__(self, detail: str, status_code: Optional[int] = None) -> None:
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+@dataclass(slots=True)
+class ItemResult:
+    """The outcome of one item of a batch write"""
+
+    index: int
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+    token: Optional[TokenOut] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("found", "created", "updated", "deleted")
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """A GET response, fresh until `expires` (monotonic seconds)"""
+
+    data: Any
+    headers: dict[str, str]
+    etag: Optional[str]
+    expires: float
+
+
+def page_count(total: int, per_page: int = DEFAULT_PAGE_SIZE) -> int:
+    """Number of pages for a total (at least 1)"""
+    return max((total - 1) // per_page + 1, 1)
+
+
+class TokenClient:
+    """Token API client with a TTL + ETag response cache (thread safe)"""
+
+    def __init__(
+        self,
+        base_url: str = "",
+        timeout: float = 10,
+        max_connections: int = 10,
+        ttl: float = 30,
+        max_entries: int = 1024,
+        admin_key: Optional[str] = None,
+        http: Optional[httpx.Client] = None,
+    ) -> None:
+        self._http = http or httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._admin = {ADMIN_KEY_HEADER: admin_key} if admin_key else {}
+        self._cache: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[UIConfig] = None) -> "TokenClient":
+        config = config or UIConfig()
+        return cls(
+            config.api_url,
+            timeout=config.api_timeout,
+            max_connections=config.api_max_connections,
+            ttl=config.cache_ttl,
+            max_entries=config.cache_max_entries,
+            admin_key=config.admin_api_key,
+        )
+
+    def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        try:
+            return self._http.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise APIError(f"API unavailable: {e}") from e
+
+    @staticmethod
+    def _check(response: httpx.Response) -> None:
+        if response.is_success:
+            return
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise APIError(str(detail), response.status_code)
+
+    def _get(self, path: str, params: Optional[dict] = None) -> CachedResponse:
+        """GET a JSON response, from the cache while fresh"""
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        key = (path, tuple(sorted(params.items())))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached.expires > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        headers = {"If-None-Match": cached.etag} if cached and cached.etag else {}
+        response = self._request("GET", path, params=params, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            cached.expires = time.monotonic() + self.ttl
+            with self._lock:
+                self.revalidations += 1
+            return cached
+
+        self._check(response)
+        entry = CachedResponse(
+            data=response.json(),
+            headers=dict(response.headers),
+            etag=response.headers.get("etag"),
+            expires=time.monotonic() + self.ttl,
+        )
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return entry
+
+    def invalidate(self) -> None:
+        """Drop every cached response (after a write)"""
+        with self._lock:
+            self._cache.clear()
+
+    def page(
+        self,
+        page: int = 1,
+        per_page: int = DEFAULT_PAGE_SIZE,
+        name: Optional[str] = None,
+    ) -> tuple[list[dict[str, Any]], int]:
+        """One page of token rows (whose name contains `name`), and the total"""
+        response = self._get(
+            f"{TOKENS_PATH}/",
+            {
+                "offset": (max(page, 1) - 1) * per_page,
+                "limit": per_page,
+                "q": name or None,
+                "fields": ROW_FIELDS,
+            },
+        )
+        total = int(response.headers.get(TOTAL_COUNT_HEADER, len(response.data)))
+        return response.data, total
+
+    def count(self, name: Optional[str] = None) -> int:
+        """Number of tokens (whose name contains `name`)"""
+        return self.page(1, 1, name)[1]
+
+    def options(self, text: str = "", limit: int = MAX_OPTIONS) -> dict[int, str]:
+        """Labels of tokens matching a symbol / name prefix, by id (for pickers)"""
+        if text:
+            rows = self._get(
+                f"{TOKENS_PATH}/autocomplete", {"q": text, "limit": limit}
+            ).data
+        else:
+            rows = self.page(1, limit)[0]
+        return {
+            row["id"]: f"{row['id']} - {row['symbol']} ({row['name']})" for row in rows
+        }
+
+    def get_token(self, token_id: Optional[int]) -> Optional[TokenOut]:
+        """A token (None if there is no such token, or no id)"""
+        if token_id is None:
+            return None
+        try:
+            return TokenOut(**self._get(f"{TOKENS_PATH}/{token_id}").data)
+        except APIError as e:
+            # 422: not a token id
+            if e.status_code in (404, 422):
+                return None
+            raise
+
+    def _write(self, method: str, path: str, body: dict) -> list[ItemResult]:
+        response = self._request(method, path, json=body)
+        self.invalidate()
+        self._check(response)
+        return [
+            ItemResult(
+                index=item["index"],
+                status=item["status"],
+                id=item.get("id"),
+                detail=item.get("detail"),
+                token=TokenOut(**item["token"]) if item.get("token") else None,
+            )
+            for item in response.json()["results"]
+        ]
+
+    def create_tokens(self, items: list[dict[str, Any]]) -> list[ItemResult]:
+        return self._write("POST", f"{TOKENS_PATH}/batch", {"items": items})
+
+    def update_tokens(self, items: list[dict[str, Any]]) -> list[ItemResult]:
+        return self._write("PUT", f"{TOKENS_PATH}/batch", {"items": items})
+
+    def delete_tokens(self, ids: list[int]) -> list[ItemResult]:
+        return self._write("POST", f"{TOKENS_PATH}/batch/delete", {"ids": ids})
+
+    def upload_logo(self, data: bytes, content_type: Optional[str] = None) -> str:
+        """Store a logo image in the API, for a token's logo URL"""
+        headers = {"Content-Type": content_type} if content_type else {}
+        response = self._request(
+            "POST", f"{TOKENS_PATH}/logos", content=data, headers=headers
+        )
+        self._check(response)
+        return response.json()["logo_url"]
+
+    def start_job(self, name: str) -> tuple[dict[str, Any], bool]:
+        """Start a background job (admin): its progress, and if it started"""
+        response = self._request("POST", f"{JOBS_PATH}/{name}", headers=self._admin)
+        self._check(response)
+        body = response.json()
+        return body["job"], body["started"]
+
+    def job(self, name: str) -> Optional[dict[str, Any]]:
+        """The progress of the latest job of a name (admin; None if none ran)"""
+        response = self._request("GET", f"{JOBS_PATH}/{name}", headers=self._admin)
+        if response.status_code == 404:
+            return None
+        self._check(response)
+        job = response.json()
+        if job["result"] is not None:
+            # A finished job may have changed the catalog
+            self.invalidate()
+        return job
+
+    def cancel_job(self, name: str) -> None:
+        """Cancel the running job of a name (admin)"""
+        response = self._request("DELETE", f"{JOBS_PATH}/{name}", headers=self._admin)
+        self._check(response)
+
+    def stats(self) -> dict:
+        """Cache counters"""
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        self._http.close()
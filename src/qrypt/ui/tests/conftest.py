@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Streamlit App UI - Test Fixtures
+"""
+
+# The UI talks to the token API: reuse its in-memory database test client
+from qrypt.tokens.tests.conftest import (  # noqa: F401
+    api_env,
+    client,
+    db_engine,
+)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Qrypto - Streamlit App UI - API Client - Tests
+"""
+
+import time
+
+import pytest
+
+from qrypt.tokens.jobs import JOB_TARGETS, LOGOS_JOB
+from qrypt.tokens.tests.conftest import ADMIN
+from qrypt.ui.client import APIError, TokenClient, page_count
+
+TOKENS = [
+    {"symbol": "btc", "name": "Bitcoin", "platforms": {}},
+    {"symbol": "eth", "name": "Ethereum", "platforms": {}},
+    {"symbol": "weth", "name": "Wrapped Ethereum", "platforms": {"base": "0x1"}},
+]
+
+
+@pytest.fixture
+def api(client):
+    return TokenClient(ttl=60, http=client)
+
+
+def test_pages_counts_and_writes(api):
+    results = api.create_tokens(TOKENS)
+    assert all(result.ok for result in results)
+    ids = [result.id for result in results]
+
+    rows, total = api.page(1, 2)
+    assert total == 3
+    assert [row["symbol"] for row in rows] == ["btc", "eth"]
+    assert set(rows[0]) == {"id", "symbol", "name", "logo_url"}
+    assert api.page(2, 2)[0][0]["symbol"] == "weth"
+
+    assert api.count("ethereum") == 2
+    assert [row["name"] for row in api.page(1, 1, "ethereum")[0]] == ["Ethereum"]
+    assert api.options()[ids[0]] == f"{ids[0]} - btc (Bitcoin)"
+    assert api.get_token(ids[2]).platforms == {"base": "0x1"}
+    assert api.get_token(10_000) is None
+    assert api.get_token(None) is None
+    # Not a token id (422)
+    assert api.get_token("None") is None
+
+    (result,) = api.update_tokens([{"id": ids[0], "name": "Bitcoin Core"}])
+    assert result.ok
+    # Writes drop the cache
+    assert api.get_token(ids[0]).name == "Bitcoin Core"
+    (result,) = api.delete_tokens([ids[1]])
+    assert result.ok and api.count() == 2
+    (result,) = api.delete_tokens([ids[1]])
+    assert result.status == "not_found"
+
+
+def test_cache_ttl_and_revalidation(api, client):
+    api.create_tokens(TOKENS[:1])
+    assert api.count() == 1
+    assert api.count() == 1
+    assert api.stats()["hits"] == 1
+
+    # Expired entries are revalidated with their ETag (304)
+    expired = TokenClient(ttl=0, http=client)
+    assert expired.count() == expired.count() == 1
+    assert expired.stats() == {
+        "entries": 1,
+        "hits": 0,
+        "revalidations": 1,
+        "misses": 1,
+    }
+
+
+def test_jobs_and_logo_uploads(client, api_env, monkeypatch):
+    monkeypatch.setitem(JOB_TARGETS, LOGOS_JOB, lambda job: {"urls": 0})
+    admin = TokenClient(admin_key=ADMIN["X-Admin-Key"], http=client)
+
+    with pytest.raises(APIError) as e:
+        TokenClient(http=client).start_job(LOGOS_JOB)
+    assert e.value.status_code == 403
+    assert admin.job(LOGOS_JOB) is None
+
+    job, started = admin.start_job(LOGOS_JOB)
+    assert started and job["name"] == LOGOS_JOB
+    deadline = time.monotonic() + 5
+    while (job := admin.job(LOGOS_JOB))["result"] is None:
+        assert time.monotonic() < deadline, job
+        time.sleep(0.01)
+    assert job["result"] == {"urls": 0}
+
+    with pytest.raises(APIError) as e:
+        admin.upload_logo(b"nope", "image/png")
+    assert e.value.status_code == 400
+
+
+def test_page_count():
+    assert page_count(0, 3) == 1
+    assert page_count(3, 3) == 1
+    assert page_count(4, 3) == 2
@@ -10,8 +10,16 @@ echo DONE
 
 # printenv
 
-echo Pulling tokens
-uv run pull_tokens
+# Bootstrap the catalog from a local snapshot (see `export_catalog`) when
+# there is one, rather than pulling it from the CoinGecko API
+KE_CATALOG_SNAPSHOT=${KE_CATALOG_SNAPSHOT:-./localcache/catalog.json.gz}
+if [ -f "$KE_CATALOG_SNAPSHOT" ]; then
+    echo Loading tokens from $KE_CATALOG_SNAPSHOT
+    uv run import_catalog "$KE_CATALOG_SNAPSHOT" || uv run pull_tokens
+else
+    echo Pulling tokens
+    uv run pull_tokens
+fi
 echo DONE
 
 uvicorn qrypt.main:app --host 0.0.0.0 --port 8000 &